@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import SpeedTest, Device, WiFiNetwork, TrafficSample
+from .models import SpeedTest, Device, KnownDevice, WiFiNetwork, TrafficSample, Job
 
 admin.site.register(SpeedTest)
 admin.site.register(Device)
+admin.site.register(KnownDevice)
 admin.site.register(WiFiNetwork)
 admin.site.register(TrafficSample)
+admin.site.register(Job)
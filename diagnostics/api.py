@@ -0,0 +1,178 @@
+"""API JSON de solo lectura para el historial (speed tests, tráfico, dispositivos, redes).
+
+GET /api/<recurso>/ con:
+  - ``limit`` (1..5000, 100 por defecto) y ``cursor``: paginación por clave
+    (created_at, id; last_seen, id en ``devices``, que es el inventario). ``next`` trae el cursor de la página siguiente; cada
+    página es una consulta sobre el índice, sin OFFSET.
+  - ``order=asc|desc`` (desc por defecto).
+  - ``fields=a,b``: columnas a devolver (el campo de tiempo e id siempre van).
+  - ``start``/``end`` (AAAA-MM-DD) o ``days``: rango de fechas.
+  - filtros por recurso: ``ip``, ``mac``, ``key``, ``bssid``, ``ssid``, ``scan_run``.
+  - ``bucket=minute|hour|day``: agrega en el servidor por intervalo (count y
+    media/mín/máx de las columnas numéricas); el cursor avanza por intervalo.
+  - ``format=columnar``: ``{"fields": [...], "data": {campo: [valores]}}``
+    en lugar de una lista de objetos.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Trunc
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from . import rollups
+from .exports import keyset_page
+from .models import KnownDevice, SpeedTest, TrafficSample, WiFiNetwork
+
+MAX_LIMIT = 5000
+DEFAULT_LIMIT = 100
+
+# recurso -> (modelo, campos, campos numéricos para bucket, filtros permitidos)
+RESOURCES = {
+    'speedtests': (SpeedTest, ('download_mbps', 'upload_mbps', 'ping_ms'),
+                   ('download_mbps', 'upload_mbps', 'ping_ms'), ()),
+    'traffic': (TrafficSample, ('ip', 'download_mbps', 'upload_mbps'),
+                ('download_mbps', 'upload_mbps'), ('ip',)),
+    'devices': (KnownDevice, ('key', 'mac', 'ip', 'hostname', 'first_seen', 'present'),
+                (), ('key', 'ip', 'mac')),
+    'networks': (WiFiNetwork, ('ssid', 'bssid', 'signal', 'channel', 'security', 'scan_run'),
+                 ('signal',), ('ssid', 'bssid', 'channel', 'scan_run')),
+}
+# Campo de tiempo de la paginación, el rango de fechas y los buckets (created_at si no figura)
+TIME_FIELDS = {'devices': 'last_seen'}
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def encode_cursor(t: datetime, pk) -> str:
+    raw = json.dumps([t.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        t, pk = json.loads(raw)
+        # pk es la clave primaria (0 en las páginas por bucket); cualquier otra cosa
+        # llegaría al filtro y rompería la consulta
+        if not isinstance(t, str) or not isinstance(pk, int) or isinstance(pk, bool):
+            raise TypeError
+        when = datetime.fromisoformat(t)
+        if when.tzinfo is None:
+            raise ValueError
+        return when, pk
+    except (ValueError, TypeError):
+        raise ValueError('cursor inválido')
+
+
+def _parse(request, resource):
+    model, fields, numeric, filters = RESOURCES[resource]
+    params = request.GET
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('limit debe ser numérico')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit debe estar entre 1 y {MAX_LIMIT}')
+    order = params.get('order', 'desc')
+    if order not in ('asc', 'desc'):
+        raise ValueError('order debe ser asc o desc')
+    selected = [f for f in (params.get('fields') or '').split(',') if f]
+    unknown = [f for f in selected if f not in fields]
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(unknown)}")
+    bucket = params.get('bucket') or None
+    if bucket is not None and bucket not in rollups.GRANULARITIES:
+        raise ValueError('bucket debe ser minute, hour o day')
+
+    time_field = TIME_FIELDS.get(resource, 'created_at')
+    qs = model.objects.all()
+    if any(params.get(k) for k in ('start', 'end', 'days')):
+        start, end, _ = rollups.parse_range({k: params.get(k) for k in ('start', 'end', 'days')})
+        qs = qs.filter(**{f'{time_field}__gte': start, f'{time_field}__lt': end})
+    for name in filters:
+        values = params.getlist(name)
+        if values:
+            qs = qs.filter(**{f'{name}__in': values})
+    cursor = decode_cursor(params['cursor']) if params.get('cursor') else None
+    return {
+        'qs': qs, 'time_field': time_field, 'limit': limit, 'descending': order == 'desc', 'cursor': cursor,
+        'fields': selected or list(fields), 'numeric': numeric, 'bucket': bucket,
+    }
+
+
+def _rows_page(opts):
+    # FK como id crudo (scan_run_id) para no hacer joins
+    columns = [f'{f}_id' if f == 'scan_run' else f for f in opts['fields']]
+    time_field = opts['time_field']
+    rows = keyset_page(opts['qs'], opts['cursor'], opts['limit'] + 1, time_field=time_field,
+                       fields=columns, descending=opts['descending'])
+    more = len(rows) > opts['limit']
+    rows = rows[:opts['limit']]
+    for r in rows:
+        if 'scan_run_id' in r:
+            r['scan_run'] = r.pop('scan_run_id')
+    next_cursor = encode_cursor(rows[-1][time_field], rows[-1]['id']) if more else None
+    return [time_field, 'id', *opts['fields']], rows, next_cursor
+
+
+def _bucket_page(opts):
+    """Página de intervalos agregados; el cursor es (inicio del intervalo, 0)."""
+    tz = timezone.get_current_timezone()
+    qs = opts['qs']
+    time_field = opts['time_field']
+    if opts['cursor'] is not None:
+        last_bucket = opts['cursor'][0]
+        if opts['descending']:
+            qs = qs.filter(**{f'{time_field}__lt': last_bucket})
+        else:
+            # Todo lo que cae en el último intervalo ya se devolvió
+            qs = qs.filter(**{f'{time_field}__gte': rollups.next_bucket(last_bucket, opts['bucket'])})
+    aggregates = {'count': Count('id')}
+    for f in opts['numeric']:
+        if f in opts['fields']:
+            aggregates[f'{f}_avg'] = Avg(f)
+            aggregates[f'{f}_min'] = Min(f)
+            aggregates[f'{f}_max'] = Max(f)
+    order = '-bucket' if opts['descending'] else 'bucket'
+    rows = list(
+        qs.annotate(bucket=Trunc(time_field, opts['bucket'], tzinfo=tz))
+        .values('bucket').annotate(**aggregates).order_by(order)[:opts['limit'] + 1]
+    )
+    more = len(rows) > opts['limit']
+    rows = rows[:opts['limit']]
+    next_cursor = encode_cursor(rows[-1]['bucket'], 0) if more else None
+    return ['bucket', *aggregates], rows, next_cursor
+
+
+@require_GET
+def resource_list(request, resource):
+    if resource not in RESOURCES:
+        return _error(f'Recurso desconocido: {resource}', status=404)
+    try:
+        opts = _parse(request, resource)
+    except ValueError as e:
+        return _error(str(e))
+    page = _bucket_page if opts['bucket'] else _rows_page
+    columns, rows, next_cursor = page(opts)
+    body = {'resource': resource, 'count': len(rows), 'next': next_cursor}
+    if request.GET.get('format') == 'columnar':
+        body['fields'] = columns
+        body['data'] = {c: [r.get(c) for r in rows] for c in columns}
+    else:
+        body['results'] = rows
+    return JsonResponse(body)
+
+
+@require_GET
+def api_index(request):
+    """Recursos disponibles y sus campos."""
+    return JsonResponse({
+        name: {'fields': list(fields), 'filters': list(filters), 'bucket_fields': list(numeric)}
+        for name, (_model, fields, numeric, filters) in RESOURCES.items()
+    })
@@ -1,5 +1,94 @@
+import atexit
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+# Servidores que atienden peticiones (argv[0] de su proceso)
+_SERVERS = ('gunicorn', 'uvicorn', 'daphne', 'hypercorn', 'waitress', 'uwsgi', 'mod_wsgi')
+
+
+def _is_server_process():
+    """True en el proceso que atiende peticiones (no en migrate, test, shell, pytest, celery...)."""
+    argv = sys.argv
+    if not argv:
+        return True  # embebido (mod_wsgi sin argv)
+    if os.path.basename(argv[0]).startswith('manage'):
+        if len(argv) > 1 and argv[1] == 'runserver':
+            # Con autoreload, solo el proceso hijo sirve peticiones
+            return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+        return False
+    return any(name in argv[0] for name in _SERVERS)
+
+
+def _host_singleton(name):
+    """True si este proceso toma el lock de ``name`` en el equipo (uno entre todos los workers)."""
+    from .services import host_lock
+    return host_lock.acquire(name, getattr(settings, 'DIAGNOSTICS_LOCK_DIR', None))
+
 
 class DiagnosticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'diagnostics'
+
+    def ready(self):
+        from .services.scan_cache import get_scan_cache
+        get_scan_cache().configure(getattr(settings, 'DIAGNOSTICS_SCAN_CACHE', {}))
+        # Utilidades y privilegios se detectan una vez; wifi_analyzer registra sus backends
+        from .services import capabilities, wifi_analyzer  # noqa: F401
+        capabilities.get_capabilities()
+        if getattr(settings, 'DIAGNOSTICS_NEIGHBOR_MONITOR', True) and _is_server_process():
+            from .services import neighbor_table
+            if neighbor_table.is_supported():
+                table = neighbor_table.get_neighbor_table()
+                table.start()
+                atexit.register(table.stop)
+        collector_opts = dict(getattr(settings, 'DIAGNOSTICS_TRAFFIC_COLLECTOR', {}))
+        if (collector_opts.pop('enabled', False) and _is_server_process()
+                and _host_singleton('traffic-collector')):
+            self._start_traffic_collector(**collector_opts)
+        rates_opts = dict(getattr(settings, 'DIAGNOSTICS_INTERFACE_RATES', {}))
+        if rates_opts.pop('enabled', False) and _is_server_process():
+            from .services.interface_rates import get_interface_rates
+            sampler = get_interface_rates(**rates_opts)
+            sampler.start()
+            atexit.register(sampler.stop)
+        self._configure_speedtest_servers(dict(getattr(settings, 'DIAGNOSTICS_SPEEDTEST_SERVERS', {})))
+        latency_opts = dict(getattr(settings, 'DIAGNOSTICS_LATENCY_MONITOR', {}))
+        if (latency_opts.pop('enabled', False) and _is_server_process()
+                and _host_singleton('latency-monitor')):
+            self._start_latency_monitor(**latency_opts)
+
+    def _start_traffic_collector(self, iface=None, flush_interval=60, top_n=10, processes=True):
+        from functools import partial
+        from . import jobs
+        from .services.process_attribution import get_process_traffic
+        from .services.traffic_collector import get_collector
+        collector = get_collector(iface=iface, flush_interval=flush_interval)
+        collector.on_flush = partial(jobs.store_traffic_samples, top_n=top_n)
+        if processes:
+            collector.on_packets = get_process_traffic().ingest
+        collector.start()
+        atexit.register(collector.stop)
+
+    def _start_latency_monitor(self, targets=None, period=10, count=5, window=360, method='auto'):
+        from .services.latency import default_targets, get_latency_monitor
+        # Sin destinos configurados no se sondea continuamente un servidor público
+        monitor = get_latency_monitor(period=period, window=window,
+                                      targets=targets or default_targets(public=False),
+                                      count=count, interval=0.2, method=method)
+        monitor.start()
+        atexit.register(monitor.stop)
+
+    def _configure_speedtest_servers(self, opts):
+        from .services.speedtest_servers import get_server_selection
+        selection = get_server_selection()
+        background = opts.pop('background', False)
+        selection.configure(**opts)
+        # El descubrimiento y la revalidación de fondo los hace un solo proceso por
+        # equipo; el resto lee la selección que ese proceso deja en disco
+        if background and _is_server_process() and _host_singleton('speedtest-servers'):
+            selection.start()
+            atexit.register(selection.stop)
@@ -0,0 +1,264 @@
+"""Gráficos PNG de speed tests con caché de renderizado.
+
+Renderizar con matplotlib cuesta cientos de ms, y los datos solo cambian
+cuando se guarda un SpeedTest nuevo. Cada PNG se guarda en la caché de
+Django ``DIAGNOSTICS_CHART_CACHE`` (memoria o disco según el backend) con una
+clave formada por el id del último SpeedTest y los parámetros normalizados
+del gráfico; la misma clave da el ETag, así que una revalidación del
+navegador se responde con 304 sin renderizar ni leer la caché.
+
+Al guardarse un SpeedTest, ``prerender_async()`` vuelve a renderizar en
+segundo plano el gráfico del dashboard y los pedidos recientemente.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from . import rollups
+from .models import MetricRollup, SpeedTest
+
+# Renderizado de gráficos en servidor (PNG)
+try:
+    import matplotlib
+    matplotlib.use('Agg')  # backend sin GUI
+    import matplotlib.pyplot as plt
+except Exception:
+    matplotlib = None
+    plt = None
+
+PIXEL_PNG = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\x0cIDAT\x08\x99c```\xf8\xff\x9f\x01\x00\x06\x05\x02\x15\x9d\x82\x8b\x0d\x00\x00\x00\x00IEND\xaeB`\x82"
+
+RANGE_PARAMS = ('days', 'start', 'end', 'granularity')
+# Versión del dibujo: cambiarla invalida los PNG guardados
+RENDER_VERSION = 1
+
+# Parámetros pedidos hace poco (JSON normalizado), para pre-renderizarlos
+_recent: 'OrderedDict[str, None]' = OrderedDict()
+_recent_lock = threading.Lock()
+_RECENT_MAX = 8
+
+
+# pyplot no es seguro entre hilos (peticiones + pre-renderizado)
+_render_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'DIAGNOSTICS_CHART_CACHE', 'default')]
+
+
+def _store(key: str, png: bytes) -> None:
+    _cache().set(key, png, timeout=getattr(settings, 'DIAGNOSTICS_CHART_CACHE_SECONDS', 86400))
+
+
+def chart_params(query) -> Dict[str, str]:
+    """Parámetros del gráfico normalizados; {} es el de los últimos 20 tests.
+
+    Valida el rango (ValueError si es inválido).
+    """
+    params = {k: query.get(k) for k in RANGE_PARAMS if query.get(k)}
+    if params:
+        rollups.parse_range(params)
+    return params
+
+
+def newest_speedtest():
+    """(id, created_at) del último SpeedTest, o (0, None)."""
+    row = SpeedTest.objects.order_by('-id').values_list('id', 'created_at').first()
+    return row or (0, None)
+
+
+def cache_key(params: Dict[str, str], newest_id: int) -> str:
+    key = {'v': RENDER_VERSION, 'newest': newest_id, 'params': params}
+    if params and not params.get('end'):
+        # Rango relativo a hoy: la ventana se desplaza una vez por día
+        key['day'] = timezone.localdate().isoformat()
+    raw = json.dumps(key, sort_keys=True)
+    return 'speedchart:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def etag_for(query) -> Optional[str]:
+    try:
+        params = chart_params(query)
+    except ValueError:
+        return None
+    return cache_key(params, newest_speedtest()[0]).split(':', 1)[1]
+
+
+def last_modified():
+    return newest_speedtest()[1]
+
+
+def _remember(params: Dict[str, str]) -> None:
+    raw = json.dumps(params, sort_keys=True)
+    with _recent_lock:
+        _recent[raw] = None
+        _recent.move_to_end(raw)
+        while len(_recent) > _RECENT_MAX:
+            _recent.popitem(last=False)
+
+
+def get_chart(query) -> bytes:
+    """PNG para los parámetros pedidos, desde la caché o renderizado en el momento."""
+    params = chart_params(query)
+    _remember(params)
+    key = cache_key(params, newest_speedtest()[0])
+    png = _cache().get(key)
+    if png is None:
+        png = render(params)
+        _store(key, png)
+    return png
+
+
+def prerender() -> int:
+    """Renderiza y guarda el gráfico del dashboard y los pedidos recientemente."""
+    with _recent_lock:
+        pending = [json.loads(raw) for raw in _recent]
+    if {} not in pending:
+        pending.insert(0, {})
+    newest_id = newest_speedtest()[0]
+    for params in pending:
+        key = cache_key(params, newest_id)
+        if _cache().get(key) is None:
+            _store(key, render(params))
+    return len(pending)
+
+
+def prerender_async() -> None:
+    def run():
+        from django.db import close_old_connections
+        try:
+            prerender()
+        except Exception as e:
+            print(f"Chart prerender error: {e}")
+        finally:
+            close_old_connections()
+    threading.Thread(target=run, name="chart-prerender", daemon=True).start()
+
+
+# --- Renderizado ---------------------------------------------------------
+def render(params: Dict[str, str]) -> bytes:
+    if not plt:
+        return PIXEL_PNG
+    with _render_lock:
+        if params:
+            return render_range(*rollups.parse_range(params))
+        return render_recent()
+
+
+def speed_series(start, end, granularity):
+    """Serie de speed tests por intervalo, con media y p95 de cada métrica."""
+    by_bucket = {}
+    for metric in rollups.SOURCES['speedtest'][1]:
+        for row in rollups.series('speedtest', metric, granularity, start, end):
+            entry = by_bucket.setdefault(row['bucket'], {'bucket': row['bucket'], 'count': row['count']})
+            entry[metric] = row['mean']
+            entry[metric + '_p95'] = row['p95']
+    return [by_bucket[b] for b in sorted(by_bucket)]
+
+
+def _png(fig) -> bytes:
+    buf = BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png", dpi=150)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def render_range(start, end, granularity) -> bytes:
+    """Serie de speed tests de un rango, desde los rollups."""
+    from matplotlib.gridspec import GridSpec
+    rows = speed_series(start, end, granularity)
+    fig = plt.figure(figsize=(9, 4))
+    gs = GridSpec(1, 2, width_ratios=[3, 2])
+    ax = fig.add_subplot(gs[0, 0])
+    if rows:
+        xs = [r['bucket'] for r in rows]
+        ax.plot(xs, [r['download_mbps'] for r in rows], "-", color="#0d6efd", label="Descarga media (Mbps)")
+        ax.plot(xs, [r['upload_mbps'] for r in rows], "-", color="#198754", label="Subida media (Mbps)")
+        ax.legend(loc="lower right")
+        fig.autofmt_xdate()
+    else:
+        ax.text(0.5, 0.5, "Sin datos", ha="center", va="center", fontsize=12)
+    ax.set_ylabel("Mbps")
+    ax.set_title(f"Speed Tests por {dict(MetricRollup.GRANULARITY_CHOICES)[granularity].lower()}")
+    ax.grid(True, linestyle=":", alpha=0.5)
+
+    ax2 = fig.add_subplot(gs[0, 1])
+    ax2.axis("off")
+    dl, ul, pg = (rollups.summary('speedtest', m, start, end, granularity=granularity)
+                  for m in ('download_mbps', 'upload_mbps', 'ping_ms'))
+    lines = [
+        f"Rango: {timezone.localtime(start):%d/%m/%y} → {timezone.localtime(end):%d/%m/%y}",
+        f"N = {dl['count']}",
+        f"Bajada: media {dl['mean']:.2f} | p50 {dl['p50']:.2f} | p95 {dl['p95']:.2f}",
+        f"Subida: media {ul['mean']:.2f} | p50 {ul['p50']:.2f} | p95 {ul['p95']:.2f}",
+        f"Ping:   media {pg['mean']:.2f} | p50 {pg['p50']:.2f} | p95 {pg['p95']:.2f}",
+    ]
+    ax2.text(0.02, 0.98, "\n".join(lines), va="top", ha="left", fontsize=10)
+    return _png(fig)
+
+
+def render_recent() -> bytes:
+    """Evolución de los últimos 20 speed tests + resumen de promedios/medianas."""
+    last_tests = list(SpeedTest.objects.order_by("-created_at")[:20])
+    last_tests.reverse()
+
+    if not last_tests:
+        fig, ax = plt.subplots(figsize=(6, 3))
+        ax.text(0.5, 0.5, "Sin datos", ha="center", va="center", fontsize=12)
+        ax.axis("off")
+        return _png(fig)
+
+    xs = list(range(1, len(last_tests) + 1))
+    dls = [float(getattr(s, "download_mbps", 0) or 0) for s in last_tests]
+    uls = [float(getattr(s, "upload_mbps", 0) or 0) for s in last_tests]
+    pings = [float(getattr(s, "ping_ms", 0) or 0) for s in last_tests]
+
+    import statistics as stats
+    def smean(v):
+        try:
+            return stats.mean(v)
+        except Exception:
+            return 0.0
+    def smedian(v):
+        try:
+            return stats.median(v)
+        except Exception:
+            return 0.0
+
+    dl_mean, dl_med = smean(dls), smedian(dls)
+    ul_mean, ul_med = smean(uls), smedian(uls)
+    pg_mean, pg_med = smean(pings), smedian(pings)
+
+    from matplotlib.gridspec import GridSpec
+    fig = plt.figure(figsize=(9, 4))
+    gs = GridSpec(1, 2, width_ratios=[3, 2])
+    ax = fig.add_subplot(gs[0, 0])
+    ax.plot(xs, dls, "-o", color="#0d6efd", label="Descarga (Mbps)")
+    ax.plot(xs, uls, "-o", color="#198754", label="Subida (Mbps)")
+    ax.set_xlabel("Muestras recientes")
+    ax.set_ylabel("Mbps")
+    ax.set_title(f"Evolución últimos {len(xs)} Speed Tests")
+    ax.grid(True, linestyle=":", alpha=0.5)
+    ax.legend(loc="lower right")
+
+    ax2 = fig.add_subplot(gs[0, 1])
+    ax2.axis("off")
+    start = last_tests[0].created_at
+    end = last_tests[-1].created_at
+    lines = [
+        f"Rango: {start:%d/%m %H:%M} → {end:%d/%m %H:%M}",
+        f"N = {len(xs)}",
+        f"Bajada: media {dl_mean:.2f} | mediana {dl_med:.2f}",
+        f"Subida: media {ul_mean:.2f} | mediana {ul_med:.2f}",
+        f"Ping:   media {pg_mean:.2f} | mediana {pg_med:.2f}",
+    ]
+    ax2.text(0.02, 0.98, "\n".join(lines), va="top", ha="left", fontsize=11)
+    return _png(fig)
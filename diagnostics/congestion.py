@@ -0,0 +1,45 @@
+"""Congestión de canales WiFi a partir de los escaneos guardados.
+
+No lanza un escaneo nuevo: lee (escaneo, canal, señal) de ``WiFiNetwork`` y
+delega el cálculo vectorizado a ``services/channel_scoring``. Sirve para el
+último escaneo (``for_run``) o para todos los de un rango (``for_range``),
+donde el puntaje de cada canal es el promedio entre escaneos.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .models import ScanRun, WiFiNetwork
+from .services.channel_scoring import score_channels
+
+DEFAULT_OPTIONS = {'width_5ghz': 80, 'avoid_dfs': False}
+
+
+def get_options() -> Dict:
+    opts = dict(DEFAULT_OPTIONS)
+    opts.update(getattr(settings, 'DIAGNOSTICS_CHANNEL_SCORING', {}))
+    return opts
+
+
+def _score(qs) -> Dict:
+    rows = np.array(list(qs.values_list('scan_run_id', 'channel', 'signal')), dtype=np.int64).reshape(-1, 3)
+    return score_channels(rows[:, 1], rows[:, 2], scan_ids=rows[:, 0], **get_options())
+
+
+def for_run(run: Optional[ScanRun] = None) -> Optional[Dict]:
+    """Análisis de un escaneo WiFi (por defecto el último); None si no hay ninguno."""
+    run = run or ScanRun.latest_of('wifi')
+    if run is None:
+        return None
+    result = _score(run.networks.all())
+    result['scan_run'] = run.id
+    return result
+
+
+def for_range(start, end) -> Dict:
+    """Promedio sobre todos los escaneos WiFi entre ``start`` y ``end``."""
+    qs = WiFiNetwork.objects.filter(scan_run__isnull=False, created_at__gte=start, created_at__lt=end)
+    result = _score(qs)
+    result.update({'start': start.isoformat(), 'end': end.isoformat()})
+    return result
@@ -0,0 +1,185 @@
+"""Exportación del reporte en streaming (CSV / NDJSON, opcionalmente gzip).
+
+Las filas se leen por tandas con paginación por clave (``created_at``, ``id``,
+ver ``keyset_page``, que también usa la API JSON)
+en lugar de OFFSET o de cargar el queryset entero, y cada tanda se escribe y
+se entrega al cliente antes de leer la siguiente: la memoria usada es la de
+una tanda, sin importar si la exportación tiene 100 filas o 10 millones.
+"""
+import csv
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+
+from . import rollups
+from .models import MetricRollup, SpeedTest, TrafficSample
+
+BATCH_SIZE = 2000
+
+# tipo -> (modelo, columnas exportadas)
+EXPORT_TYPES = {
+    'speedtest': (SpeedTest, ('download_mbps', 'upload_mbps', 'ping_ms')),
+    'traffic': (TrafficSample, ('ip', 'download_mbps', 'upload_mbps')),
+}
+ROLLUP_COLUMNS = ('bucket', 'source', 'metric', 'ip', 'count', 'mean', 'min', 'max', 'p50', 'p95', 'p99')
+
+
+def keyset_page(qs, after: Optional[Tuple] = None, limit: int = BATCH_SIZE,
+                time_field: str = 'created_at', fields: Sequence[str] = (),
+                descending: bool = True) -> List[dict]:
+    """Una página de ``qs`` ordenada por (``time_field``, id), después de la clave ``after``.
+
+    La continuación es un WHERE sobre el índice en lugar de un OFFSET, así
+    que leer la página N cuesta lo mismo que la primera.
+    """
+    order = (f'-{time_field}', '-id') if descending else (time_field, 'id')
+    cols = list(dict.fromkeys([time_field, 'id', *fields]))
+    if after is not None:
+        t, pk = after
+        if descending:
+            qs = qs.filter(Q(**{f'{time_field}__lt': t}) | Q(**{time_field: t, 'id__lt': pk}))
+        else:
+            qs = qs.filter(Q(**{f'{time_field}__gt': t}) | Q(**{time_field: t, 'id__gt': pk}))
+    return list(qs.order_by(*order).values(*cols)[:limit])
+
+
+def keyset_batches(qs, time_field: str = 'created_at', fields: Sequence[str] = (),
+                   batch_size: int = BATCH_SIZE, descending: bool = True,
+                   after: Optional[Tuple] = None) -> Iterator[List[dict]]:
+    """Recorre ``qs`` entero por tandas de ``keyset_page``."""
+    while True:
+        rows = keyset_page(qs, after, batch_size, time_field, fields, descending)
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1][time_field], rows[-1]['id'])
+
+
+def parse_filters(params) -> Dict:
+    """Filtros de exportación: rango (start/end/days), tipos, IPs y granularidad.
+
+    Sin start/end/days se exporta todo el historial. Lanza ValueError.
+    """
+    def _list(name):
+        values = []
+        for raw in params.getlist(name) if hasattr(params, 'getlist') else [params.get(name) or '']:
+            values.extend(v.strip() for v in raw.split(',') if v.strip())
+        return values
+
+    start = end = None
+    granularity = params.get('granularity') or None
+    if granularity or any(params.get(k) for k in ('start', 'end', 'days')):
+        start, end, resolved = rollups.parse_range(params)
+        if granularity:
+            granularity = resolved
+    types = _list('type') or list(EXPORT_TYPES)
+    unknown = [t for t in types if t not in EXPORT_TYPES]
+    if unknown:
+        raise ValueError(f"Tipo desconocido: {', '.join(unknown)}")
+    return {'start': start, 'end': end, 'types': types, 'ips': _list('ip'), 'granularity': granularity}
+
+
+def _raw_records(filters) -> Iterator[List[dict]]:
+    """Tandas de dicts {'type', 'created_at', ...columnas} de las filas crudas."""
+    for kind in filters['types']:
+        model, columns = EXPORT_TYPES[kind]
+        qs = model.objects.all()
+        if filters['start'] is not None:
+            qs = qs.filter(created_at__gte=filters['start'], created_at__lt=filters['end'])
+        if filters['ips']:
+            if kind != 'traffic':
+                continue
+            qs = qs.filter(ip__in=filters['ips'])
+        for rows in keyset_batches(qs, fields=columns):
+            yield [{'type': kind, **{k: r[k] for k in ('created_at', *columns)}} for r in rows]
+
+
+def _rollup_records(filters) -> Iterator[List[dict]]:
+    for kind in filters['types']:
+        qs = MetricRollup.objects.filter(
+            source=kind, granularity=filters['granularity'],
+            bucket__gte=rollups.truncate(filters['start'], filters['granularity']),
+            bucket__lt=filters['end'],
+            ip__in=filters['ips'] if filters['ips'] else [''],
+        )
+        fields = ('source', 'metric', 'ip', 'count', 'total', 'min_value', 'max_value', 'histogram')
+        for rows in keyset_batches(qs, time_field='bucket', fields=fields, descending=False):
+            out = []
+            for r in rows:
+                agg = rollups.Aggregate()
+                agg.merge(r['count'], r['total'], r['min_value'], r['max_value'], r['histogram'])
+                out.append({'bucket': r['bucket'], 'source': r['source'], 'metric': r['metric'],
+                            'ip': r['ip'], **agg.as_dict()})
+            yield out
+
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_chunks(batches: Iterable[List[dict]], rollup: bool) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    if rollup:
+        yield writer.writerow(ROLLUP_COLUMNS)
+        for batch in batches:
+            yield ''.join(writer.writerow([
+                r['bucket'].isoformat(), r['source'], r['metric'], r['ip'], r['count'], r['mean'],
+                r['min'], r['max'], r['p50'], r['p95'], r['p99']]) for r in batch)
+        return
+    # Mismo formato que el CSV original del reporte
+    yield writer.writerow(['created_at', 'type', 'metric1', 'metric2', 'metric3'])
+    for batch in batches:
+        lines = []
+        for r in batch:
+            if r['type'] == 'speedtest':
+                values = [r['download_mbps'], r['upload_mbps'], r['ping_ms']]
+            else:
+                values = [r['ip'], r['download_mbps'], r['upload_mbps']]
+            lines.append(writer.writerow([r['created_at'].isoformat(), r['type'], *values]))
+        yield ''.join(lines)
+
+
+def _ndjson_chunks(batches: Iterable[List[dict]]) -> Iterator[str]:
+    for batch in batches:
+        lines = []
+        for r in batch:
+            r = dict(r)
+            for k in ('created_at', 'bucket'):
+                if k in r:
+                    r[k] = r[k].isoformat()
+            lines.append(json.dumps(r, ensure_ascii=False))
+        yield '\n'.join(lines) + '\n'
+
+
+def _gzip(chunks: Iterable[str]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: formato gzip
+    for chunk in chunks:
+        data = z.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield z.flush()
+
+
+def export_response(params, fmt: str) -> StreamingHttpResponse:
+    """StreamingHttpResponse con el reporte filtrado en ``fmt`` ('csv' o 'ndjson')."""
+    filters = parse_filters(params)
+    rollup = filters['granularity'] is not None
+    batches = _rollup_records(filters) if rollup else _raw_records(filters)
+    chunks = _csv_chunks(batches, rollup) if fmt == 'csv' else _ndjson_chunks(batches)
+    content_type = 'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    filename = f"reporte{'-' + filters['granularity'] if rollup else ''}.{fmt}"
+    if params.get('gzip') in ('1', 'true', 'yes'):
+        chunks = _gzip(chunks)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    resp = StreamingHttpResponse(chunks, content_type=content_type)
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
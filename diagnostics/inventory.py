@@ -0,0 +1,112 @@
+"""Inventario de dispositivos (``KnownDevice``) actualizado por diff.
+
+Cada escaneo se compara con el inventario y solo se escriben los cambios:
+
+- equipos nuevos: ``bulk_create``;
+- equipos que volvieron o cambiaron de IP/hostname: ``bulk_update``;
+- equipos que siguen igual: un único UPDATE de ``last_seen`` para todos;
+- equipos que faltan: se marcan ausentes y se cierra su intervalo de
+  presencia (``bulk_update``).
+
+Así las escrituras crecen con la cantidad de cambios y no con la de equipos,
+y el historial (primera/última vez, intervalos de presencia) no se pierde.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import KnownDevice
+
+# Intervalos de presencia que se conservan por equipo (los más recientes)
+PRESENCE_LIMIT = 100
+
+_UPDATE_FIELDS = ['key', 'mac', 'ip', 'hostname', 'last_seen', 'present', 'presence']
+
+
+def device_key(device: Dict) -> str:
+    """MAC en minúsculas o, si no hay, la IP."""
+    return ((device.get('mac') or '').lower() or device.get('ip') or '')[:64]
+
+
+def apply_scan(devices: Iterable[Dict], now=None) -> Dict[str, List[str]]:
+    """Aplica un escaneo al inventario y devuelve las claves agregadas, cambiadas y ausentes.
+
+    ``added`` incluye los equipos nuevos y los que vuelven tras estar ausentes.
+    """
+    now = now or timezone.now()
+    ts = int(now.timestamp())
+    scanned = {}
+    for d in devices:
+        key = device_key(d)
+        if key:
+            scanned[key] = d
+    # Equipos que antes solo se conocían por IP y ahora traen MAC
+    by_ip = {d['ip'] for k, d in scanned.items() if d.get('mac') and d.get('ip') and d['ip'] not in scanned}
+
+    added: List[str] = []
+    changed: List[str] = []
+    removed: List[str] = []
+    create: List[KnownDevice] = []
+    update: List[KnownDevice] = []
+    touch: List[int] = []
+    with transaction.atomic():
+        known = {k.key: k for k in KnownDevice.objects.filter(Q(present=True) | Q(key__in=set(scanned) | by_ip))}
+        for key, d in scanned.items():
+            mac, ip = (d.get('mac') or '').lower(), d.get('ip') or ''
+            row = known.pop(key, None)
+            if row is None and ip in by_ip and ip in known and not known[ip].mac:
+                row = known.pop(ip)
+            if row is None:
+                create.append(KnownDevice(key=key, mac=mac, ip=ip, hostname=d.get('hostname') or '',
+                                          first_seen=now, last_seen=now, presence=[[ts, None]]))
+                added.append(key)
+                continue
+            dirty = row.key != key
+            values = {'key': key, 'mac': mac, 'ip': ip, 'hostname': d.get('hostname') or row.hostname}
+            if any(getattr(row, f) != v for f, v in values.items()):
+                for f, v in values.items():
+                    setattr(row, f, v)
+                changed.append(key)
+                dirty = True
+            if not row.present:
+                row.present = True
+                row.presence = (list(row.presence or []) + [[ts, None]])[-PRESENCE_LIMIT:]
+                added.append(key)
+                dirty = True
+            if dirty:
+                row.last_seen = now
+                update.append(row)
+            else:
+                touch.append(row.pk)
+        for row in known.values():
+            if not row.present:
+                continue
+            row.present = False
+            presence = [list(p) for p in row.presence or []]
+            if presence and presence[-1][1] is None:
+                presence[-1][1] = int(row.last_seen.timestamp())
+            row.presence = presence
+            update.append(row)
+            removed.append(row.key)
+
+        if create:
+            KnownDevice.objects.bulk_create(create)
+        if update:
+            KnownDevice.objects.bulk_update(update, _UPDATE_FIELDS)
+        if touch:
+            KnownDevice.objects.filter(pk__in=touch).update(last_seen=now)
+    return {'added': sorted(added), 'changed': sorted(set(changed) - set(added)), 'removed': sorted(removed)}
+
+
+def presence_seconds(row: KnownDevice) -> int:
+    """Segundos de presencia registrados en el historial (el intervalo abierto llega a ``last_seen``)."""
+    last = int(row.last_seen.timestamp())
+    return sum((end if end is not None else last) - start for start, end in row.presence or [])
+
+
+def listing(limit: Optional[int] = 500):
+    """Inventario para mostrar: presentes primero, luego por última vez visto."""
+    qs = KnownDevice.objects.order_by('-present', '-last_seen')
+    return qs[:limit] if limit else qs
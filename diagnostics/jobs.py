@@ -0,0 +1,317 @@
+"""Motor de tareas en segundo plano.
+
+Las operaciones lentas (speed test, escaneo de dispositivos/WiFi, captura de
+tráfico) se ejecutan en un pool de hilos fuera del ciclo request/response.
+Cada ejecución queda persistida como un ``Job`` para poder consultar su estado
+y resultado desde el navegador o desde scripts.
+"""
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import charts, inventory, rollups, signal_store
+from .models import Job, ScanRun, SpeedTest, WiFiNetwork, TrafficSample
+
+JOB_HANDLERS: Dict[str, Callable[[dict], dict]] = {}
+# Validadores de parámetros por tipo: reciben el dict crudo y devuelven el
+# dict limpio, o lanzan ValueError
+PARAM_CLEANERS: Dict[str, Callable[[dict], dict]] = {}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Identifica al proceso que ejecuta la tarea, para detectar huérfanas
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"[:64]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def register(kind: str, clean: Optional[Callable[[dict], dict]] = None):
+    """Decorador para registrar el handler (y opcionalmente el validador) de un tipo de tarea."""
+    def deco(fn):
+        JOB_HANDLERS[kind] = fn
+        if clean is not None:
+            PARAM_CLEANERS[kind] = clean
+        return fn
+    return deco
+
+
+def clean_params(kind: str, raw: Optional[dict]) -> dict:
+    """Valida los parámetros de una tarea; los tipos sin validador no aceptan parámetros."""
+    cleaner = PARAM_CLEANERS.get(kind)
+    if cleaner is None:
+        return {}
+    return cleaner(dict(raw or {}))
+
+
+def _stale_after() -> timedelta:
+    return timedelta(seconds=int(getattr(settings, 'DIAGNOSTICS_JOB_STALE_SECONDS', 600)))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def is_orphan(job: Job) -> bool:
+    """True si la tarea sigue activa pero nadie la va a terminar.
+
+    Es huérfana si su proceso (en este mismo host) ya no existe, o si lleva
+    más de ``DIAGNOSTICS_JOB_STALE_SECONDS`` en cola o ejecutándose.
+    """
+    if job.status not in ACTIVE_STATUSES:
+        return False
+    host, _, pid = (job.worker or '').rpartition(':')
+    if host and host == WORKER_ID.rpartition(':')[0] and pid.isdigit():
+        if job.worker != WORKER_ID and not _pid_alive(int(pid)):
+            return True
+    since = job.started_at if job.status == 'running' else job.created_at
+    return since is not None and since < timezone.now() - _stale_after()
+
+
+def fail_orphans() -> int:
+    """Marca como fallidas las tareas huérfanas (reinicios, hilos colgados)."""
+    now = timezone.now()
+    orphans = [j.id for j in Job.objects.filter(status__in=ACTIVE_STATUSES) if is_orphan(j)]
+    if not orphans:
+        return 0
+    return (Job.objects.filter(id__in=orphans, status__in=ACTIVE_STATUSES)
+            .update(status='failed', error='Tarea interrumpida (reinicio o tiempo agotado)', finished_at=now))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(getattr(settings, 'DIAGNOSTICS_JOB_WORKERS', 2))
+            _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='diag-job')
+        return _executor
+
+
+def active_job(kind: str, params: Optional[dict] = None) -> Optional[Job]:
+    """Tarea en cola o en curso del mismo tipo y parámetros, si existe."""
+    params = params or {}
+    for job in Job.objects.filter(kind=kind, status__in=ACTIVE_STATUSES).order_by('-created_at'):
+        if job.params == params and not is_orphan(job):
+            return job
+    return None
+
+
+def last_done(kind: str) -> Optional[Job]:
+    """Última tarea terminada correctamente de ese tipo."""
+    return Job.objects.filter(kind=kind, status='done').order_by('-finished_at').first()
+
+
+def submit(kind: str, params: Optional[dict] = None, reuse: bool = True) -> Job:
+    """Encola una tarea y devuelve su ``Job``.
+
+    Con ``reuse`` se devuelve una tarea equivalente en cola/en curso, o una
+    terminada hace menos de ``DIAGNOSTICS_JOB_REUSE_SECONDS``, en lugar de
+    lanzar otra (varios usuarios comparten el mismo speed test en vez de
+    competir por el enlace). Con ``refresh`` en los parámetros solo se reusa
+    una tarea activa, no una ya terminada.
+    """
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Tipo de tarea desconocido: {kind}")
+    params = params or {}
+    fail_orphans()
+    if reuse:
+        job = active_job(kind, params)
+        if job is not None:
+            return job
+    if reuse and not params.get('refresh'):
+        window = int(getattr(settings, 'DIAGNOSTICS_JOB_REUSE_SECONDS', 30))
+        recent = (Job.objects
+                  .filter(kind=kind, status='done',
+                          finished_at__gte=timezone.now() - timedelta(seconds=window))
+                  .order_by('-finished_at'))
+        for job in recent:
+            if job.params == params:
+                return job
+    job = Job.objects.create(kind=kind, params=params, worker=WORKER_ID)
+    _get_executor().submit(_execute, job.id)
+    return job
+
+
+def _execute(job_id: int) -> None:
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_id)
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+        try:
+            job.result = JOB_HANDLERS[job.kind](job.params or {})
+            job.status = 'done'
+        except Exception as e:
+            traceback.print_exc()
+            job.status = 'failed'
+            job.error = str(e) or e.__class__.__name__
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    finally:
+        close_old_connections()
+
+
+# --- Handlers -----------------------------------------------------------
+
+@register('speedtest')
+def run_speedtest(params: dict) -> dict:
+    from .services.speed_test import get_speed_tester
+    # Tolerancia a entornos sin red: se guarda 0 y se informa el error
+    error = ''
+    result = {}
+    try:
+        result = get_speed_tester().run_test()
+        obj = SpeedTest.objects.create(
+            download_mbps=result.get('download', 0) or 0,
+            upload_mbps=result.get('upload', 0) or 0,
+            ping_ms=result.get('ping', 0) or 0,
+        )
+    except Exception as e:
+        obj = SpeedTest.objects.create(download_mbps=0, upload_mbps=0, ping_ms=0)
+        error = str(e)
+    rollups.record('speedtest', [obj])
+    # El gráfico del dashboard queda listo antes de que alguien lo pida
+    charts.prerender_async()
+    return {
+        'id': obj.id,
+        'download_mbps': obj.download_mbps,
+        'upload_mbps': obj.upload_mbps,
+        'ping_ms': obj.ping_ms,
+        'jitter_ms': result.get('jitter', 0),
+        'packet_loss_pct': result.get('packet_loss', 0),
+        'error': error,
+    }
+
+
+def _scan_run(kind: str, started_at, row_count: int) -> ScanRun:
+    finished = timezone.now()
+    return ScanRun.objects.create(
+        kind=kind, started_at=started_at, row_count=row_count,
+        duration_ms=int((finished - started_at).total_seconds() * 1000),
+    )
+
+
+def _store_scan(kind: str, model, started_at, rows: list) -> ScanRun:
+    """Guarda las filas de un escaneo junto con su ScanRun (conteo y duración precalculados)."""
+    with transaction.atomic():
+        run = _scan_run(kind, started_at, len(rows))
+        for row in rows:
+            row.scan_run = run
+        model.objects.bulk_create(rows)
+    return run
+
+
+def _clean_scan_params(raw: dict) -> dict:
+    """``refresh`` fuerza un escaneo nuevo aunque haya uno reciente en ``scan_cache``."""
+    refresh = raw.get('refresh', False)
+    if isinstance(refresh, str):
+        refresh = refresh.strip().lower() in ('1', 'true', 'yes', 'on', 'si', 'sí')
+    # Sin refresh el dict queda vacío, igual que antes (para reusar tareas activas)
+    return {'refresh': True} if refresh else {}
+
+
+@register('devices', clean=_clean_scan_params)
+def run_device_scan(params: dict) -> dict:
+    from .services.network_scanner import NetworkScanner, HostDiscovery
+    opts = dict(getattr(settings, 'DIAGNOSTICS_HOST_DISCOVERY', {}) or {})
+    discovery = HostDiscovery(**opts) if opts.pop('enabled', True) else None
+    started = timezone.now()
+    devices = NetworkScanner(discovery=discovery).get_connected_devices(force_refresh=params.get('refresh', False))
+    # El inventario se actualiza por diff: no se guarda una fila por equipo y escaneo
+    diff = inventory.apply_scan(devices)
+    run = _scan_run('devices', started, len(devices))
+    return {'devices': devices, 'scan_run': run.id, 'diff': diff}
+
+
+@register('wifi', clean=_clean_scan_params)
+def run_wifi_scan(params: dict) -> dict:
+    from .services.wifi_analyzer import WiFiAnalyzer, wifi_adapter_summary
+    refresh = params.get('refresh', False)
+    started = timezone.now()
+    nets = WiFiAnalyzer().get_available_networks(force_refresh=refresh)
+    # Serie de señal por BSSID para tendencias de largo plazo
+    signal_store.record(nets)
+    run = _store_scan('wifi', WiFiNetwork, started, [
+        WiFiNetwork(
+            ssid=n.get('ssid', ''), bssid=n.get('bssid', ''),
+            signal=int(n.get('signal', 0)), channel=int(n.get('channel', 0)),
+            security=n.get('security', ''),
+        ) for n in nets
+    ])
+    return {'networks': nets, 'resumen': wifi_adapter_summary(force_refresh=refresh), 'scan_run': run.id, 'diff': run.diff()}
+
+
+def _clean_traffic_params(raw: dict) -> dict:
+    try:
+        duration = float(raw.get('duration_sec', 2.0))
+    except (TypeError, ValueError):
+        raise ValueError('duration_sec debe ser numérico')
+    if not 0.5 <= duration <= 30:
+        raise ValueError('duration_sec debe estar entre 0.5 y 30')
+    return {'duration_sec': duration}
+
+
+def store_traffic_samples(samples: list, top_n: int = 10) -> int:
+    """Agrega una muestra de tráfico al historial (top N por IP), sin borrar las anteriores."""
+    rows = [
+        TrafficSample(
+            ip=s.get('ip', ''),
+            download_mbps=float(s.get('download_mbps', 0.0)),
+            upload_mbps=float(s.get('upload_mbps', 0.0)),
+        ) for s in samples[:top_n]
+    ]
+    TrafficSample.objects.bulk_create(rows)
+    rollups.record('traffic', rows)
+    return len(rows)
+
+
+@register('traffic', clean=_clean_traffic_params)
+def run_traffic_sample(params: dict) -> dict:
+    from .services.traffic_monitor import sample_bandwidth, as_mbps
+    duration = float(params.get('duration_sec', 2.0))
+    samples_list = as_mbps(sample_bandwidth(duration_sec=duration))
+    if samples_list:
+        store_traffic_samples(samples_list)
+    return {'samples': samples_list}
+
+
+def _clean_latency_params(raw: dict) -> dict:
+    targets = raw.get('targets') or []
+    if isinstance(targets, str):
+        targets = [t.strip() for t in targets.split(',')]
+    targets = [str(t).strip() for t in targets if str(t).strip()]
+    if len(targets) > 32:
+        raise ValueError('targets admite a lo sumo 32 destinos')
+    try:
+        count = int(raw.get('count', 20))
+    except (TypeError, ValueError):
+        raise ValueError('count debe ser entero')
+    if not 1 <= count <= 200:
+        raise ValueError('count debe estar entre 1 y 200')
+    method = raw.get('method', 'auto')
+    if method not in ('auto', 'icmp', 'tcp', 'udp'):
+        raise ValueError('method debe ser auto, icmp, tcp o udp')
+    return {'targets': targets, 'count': count, 'method': method}
+
+
+@register('latency', clean=_clean_latency_params)
+def run_latency_probe(params: dict) -> dict:
+    from .services.latency import LatencyProber
+    prober = LatencyProber(params.get('targets') or None, count=params.get('count', 20),
+                           method=params.get('method', 'auto'))
+    return {'targets': prober.probe()}
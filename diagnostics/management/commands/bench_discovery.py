@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from diagnostics.services.network_scanner import HostDiscovery
+
+
+class Command(BaseCommand):
+    help = ("Mide el barrido de HostDiscovery. Por defecto barre 127.0.0.0/22 (en Linux todo "
+            "127/8 responde por loopback) y 192.0.2.0/24 (TEST-NET-1: nadie responde, mide "
+            "el costo de los hosts silenciosos, que son la mayoría en una LAN real).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subnet', action='append', dest='subnets',
+                            help='CIDR a barrer (repetible). Por defecto 127.0.0.0/22 y 192.0.2.0/24.')
+        parser.add_argument('--timeout', type=float, default=1.0)
+        parser.add_argument('--concurrency', type=int, default=128)
+        parser.add_argument('--no-icmp', action='store_true', help='Solo sondas TCP/UDP.')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **opts):
+        subnets = opts['subnets'] or ['127.0.0.0/22', '192.0.2.0/24']
+        discovery = HostDiscovery(timeout=opts['timeout'], concurrency=opts['concurrency'],
+                                  icmp=not opts['no_icmp'])
+        for subnet in subnets:
+            for i in range(opts['repeat']):
+                start = time.perf_counter()
+                found = discovery.discover([subnet])
+                elapsed = time.perf_counter() - start
+                methods = {}
+                for d in found:
+                    methods[d['method']] = methods.get(d['method'], 0) + 1
+                self.stdout.write(f"#{i + 1} {subnet}: {len(found)} hosts en {elapsed:.2f}s {methods}")
@@ -0,0 +1,105 @@
+import os
+import random
+import socket
+import struct
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from diagnostics.services import pcap_ingest
+
+
+def _frame(src: str, dst: str, payload_len: int, sport: int, dport: int) -> bytes:
+    ip_len = 20 + 20 + payload_len
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, ip_len, 0, 0, 64, 6, 0,
+                     socket.inet_aton(src), socket.inet_aton(dst))
+    tcp = struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 0x50, 0x10, 65535, 0, 0)
+    return b"\x02" * 6 + b"\x04" * 6 + b"\x08\x00" + ip + tcp + b"\x00" * payload_len
+
+
+def synth_frames(n: int, local_ip: str, remotes: int, seed: int = 1):
+    rnd = random.Random(seed)
+    peers = [f"203.0.{i // 250}.{i % 250 + 1}" for i in range(remotes)]
+    t0 = 1_700_000_000.0
+    for i in range(n):
+        peer = rnd.choice(peers)
+        size = rnd.choice((40, 500, 1400))
+        if rnd.random() < 0.7:
+            yield t0 + i * 1e-5, _frame(peer, local_ip, size, 443, 50000 + i % 1000)
+        else:
+            yield t0 + i * 1e-5, _frame(local_ip, peer, size, 50000 + i % 1000, 443)
+
+
+def python_baseline(path: str, local_ips: set):
+    """Per-packet struct parsing, approximating the cost of the sniff callback."""
+    results = {}
+    with open(path, "rb") as fh:
+        data = fh.read()
+    pos = 24
+    while pos + 16 <= len(data):
+        _s, _u, incl, orig = struct.unpack_from("<IIII", data, pos)
+        pos += 16
+        frame = data[pos:pos + incl]
+        pos += incl
+        if frame[12:14] != b"\x08\x00":
+            continue
+        src = socket.inet_ntoa(frame[26:30])
+        dst = socket.inet_ntoa(frame[30:34])
+        if src in local_ips and dst not in local_ips:
+            r = results.setdefault(dst, {"bytes_in": 0.0, "bytes_out": 0.0})
+            r["bytes_out"] += orig
+        elif dst in local_ips and src not in local_ips:
+            r = results.setdefault(src, {"bytes_in": 0.0, "bytes_out": 0.0})
+            r["bytes_in"] += orig
+    return results
+
+
+class Command(BaseCommand):
+    help = "Mide el motor vectorizado de pcap_ingest contra un parseo por paquete en Python."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--packets', type=int, default=500_000)
+        parser.add_argument('--remotes', type=int, default=2000)
+        parser.add_argument('--pcap', help='Usar un pcap existente en lugar de generarlo.')
+        parser.add_argument('--local-ip', action='append', dest='local_ips')
+        parser.add_argument('--skip-baseline', action='store_true')
+
+    def handle(self, *args, **opts):
+        local_ips = set(opts['local_ips'] or ['192.168.1.10'])
+        path = opts['pcap']
+        tmp = None
+        if not path:
+            fd, tmp = tempfile.mkstemp(suffix='.pcap')
+            os.close(fd)
+            path = tmp
+            n = pcap_ingest.write_pcap(path, synth_frames(opts['packets'], next(iter(local_ips)), opts['remotes']))
+            self.stdout.write(f"pcap sintético: {n} paquetes, {os.path.getsize(path) / 1e6:.1f} MB")
+        try:
+            t = time.perf_counter()
+            block = pcap_ingest.read_pcap(path)
+            t_read = time.perf_counter() - t
+            t = time.perf_counter()
+            packets = pcap_ingest.parse_ipv4(block)
+            t_parse = time.perf_counter() - t
+            t = time.perf_counter()
+            agg = pcap_ingest.aggregate_by_remote(packets, local_ips)
+            t_agg = time.perf_counter() - t
+            total = t_read + t_parse + t_agg
+            self.stdout.write(
+                f"vectorizado: lectura {t_read:.3f}s, parseo {t_parse:.3f}s, agregado {t_agg:.3f}s "
+                f"-> {len(block) / total:,.0f} paquetes/s, {len(agg)} IPs remotas")
+            if not opts['skip_baseline']:
+                t = time.perf_counter()
+                base = python_baseline(path, local_ips)
+                t_base = time.perf_counter() - t
+                same = all(
+                    abs(base[ip]['bytes_in'] - agg[ip]['bytes_in']) < 1e-6
+                    and abs(base[ip]['bytes_out'] - agg[ip]['bytes_out']) < 1e-6
+                    for ip in base) and set(base) == set(agg)
+                self.stdout.write(
+                    f"por paquete: {t_base:.3f}s -> {len(block) / t_base:,.0f} paquetes/s "
+                    f"(x{t_base / total:.1f}); resultados iguales: {same}")
+        finally:
+            if tmp:
+                os.remove(tmp)
@@ -0,0 +1,113 @@
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from diagnostics import retention
+from diagnostics.models import TrafficSample
+
+ALIAS = 'bench_storage'
+
+
+def _timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = ("Mide las consultas habituales sobre TrafficSample con y sin los índices, "
+            "en una base SQLite temporal (no toca la base del proyecto).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--ips', type=int, default=500)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--keep', action='store_true', help='No borrar la base temporal al terminar.')
+
+    def handle(self, *args, **opts):
+        fd, path = tempfile.mkstemp(suffix='.sqlite3', prefix='bench_storage_')
+        os.close(fd)
+        cfg = dict(connections.databases['default'])
+        cfg.update({'ENGINE': 'django.db.backends.sqlite3', 'NAME': path})
+        connections.databases[ALIAS] = cfg
+        try:
+            call_command('migrate', 'diagnostics', database=ALIAS, verbosity=0)
+            # Se carga sin índices y se mide antes de crearlos
+            with connections[ALIAS].schema_editor() as editor:
+                for index in TrafficSample._meta.indexes:
+                    editor.remove_index(TrafficSample, index)
+            self._fill(opts['rows'], opts['ips'], opts['days'])
+            self._run_queries()
+        finally:
+            connections[ALIAS].close()
+            del connections.databases[ALIAS]
+            if opts['keep']:
+                self.stdout.write(f"base temporal: {path}")
+            else:
+                os.remove(path)
+
+    def _fill(self, rows, ips, days):
+        table = TrafficSample._meta.db_table
+        now = timezone.now()
+        span = days * 86400
+        rnd = random.Random(1)
+        peers = [f"10.{i // 250}.{i % 250}.1" for i in range(ips)]
+        start = time.perf_counter()
+        with connections[ALIAS].cursor() as cur:
+            cur.execute("PRAGMA journal_mode=OFF")
+            cur.execute("PRAGMA synchronous=OFF")
+            chunk = 100_000
+            for offset in range(0, rows, chunk):
+                batch = []
+                for i in range(offset, min(rows, offset + chunk)):
+                    # Filas en orden de inserción, como en producción
+                    ts = now - timedelta(seconds=span * (1 - i / rows))
+                    batch.append((ts.strftime('%Y-%m-%d %H:%M:%S.%f'), rnd.choice(peers), rnd.random() * 100, rnd.random() * 10))
+                cur.executemany(
+                    f"INSERT INTO {table} (created_at, ip, download_mbps, upload_mbps) VALUES (%s, %s, %s, %s)",
+                    batch)
+        self.stdout.write(f"{rows:,} filas de TrafficSample insertadas en {time.perf_counter() - start:.1f}s")
+
+    def _queries(self):
+        qs = TrafficSample.objects.using(ALIAS)
+        now = timezone.now()
+        newest = qs.order_by('-created_at').values_list('created_at', flat=True).first()
+        policy = dict(retention.get_policy(), raw_days=30)
+        expired = dict(retention.expired_querysets(now, policy))['TrafficSample'].using(ALIAS)
+        return [
+            ("últimas 10 (order_by -created_at)", lambda: list(qs.order_by('-created_at')[:10])),
+            ("±5 min alrededor de la última", lambda: qs.filter(
+                created_at__gte=newest - timedelta(minutes=5),
+                created_at__lte=newest + timedelta(minutes=5)).count()),
+            ("historial de una IP (50)", lambda: list(qs.filter(ip='10.0.7.1').order_by('-created_at')[:50])),
+            ("filas de hoy (rango)", lambda: qs.filter(created_at__gte=now - timedelta(hours=24)).count()),
+            ("tanda de poda (5000 pks)", lambda: list(expired.order_by().values_list('pk', flat=True)[:5000])),
+        ]
+
+    def _run_queries(self):
+        indexes = TrafficSample._meta.indexes
+        conn = connections[ALIAS]
+        results = {}
+        for label, fn in self._queries():
+            results[label] = [_timed(fn)]
+        start = time.perf_counter()
+        with conn.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(TrafficSample, index)
+        self.stdout.write(f"índices creados en {time.perf_counter() - start:.1f}s")
+        for label, fn in self._queries():
+            results[label].append(_timed(fn))
+        self.stdout.write(f"{'consulta':40} {'sin índices':>12} {'con índices':>12}")
+        for label, (before, after) in results.items():
+            self.stdout.write(f"{label:40} {before * 1000:10.1f}ms {after * 1000:10.1f}ms")
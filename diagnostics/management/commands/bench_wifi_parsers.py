@@ -0,0 +1,179 @@
+import glob
+import os
+import random
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand
+
+from diagnostics.services import wifi_parsers
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'testdata', 'wifi')
+CHANNELS = [1, 6, 11, 2, 3, 4, 5, 7, 8, 9, 10, 13, 36, 40, 44, 48, 52, 100, 116, 149, 153, 157, 161]
+
+
+def corpus_files():
+    """(formato, ruta) de cada salida grabada; el formato es el prefijo del nombre."""
+    paths = sorted(glob.glob(os.path.join(CORPUS_DIR, '*.txt')))
+    return [(os.path.basename(p).split('_')[0].split('.')[0], p) for p in paths]
+
+
+def read_corpus(path):
+    with open(path, encoding='utf-8', newline='') as fh:
+        return fh.read()
+
+
+def _networks(n, seed):
+    rnd = random.Random(seed)
+    nets = []
+    for i in range(n):
+        nets.append({
+            'ssid': rnd.choice(['', f'Red_{i // 3}', f'Depto {i // 4}: {i % 7}', f'Oficina\\{i}']),
+            'bssid': ':'.join(f'{b:02x}' for b in (0x02, i >> 16 & 255, i >> 8 & 255, i & 255,
+                                                  rnd.randrange(256), rnd.randrange(256))),
+            'channel': rnd.choice(CHANNELS),
+            'percent': rnd.randint(5, 100),
+            'dbm': rnd.randint(-92, -30),
+            'security': rnd.choice(['WPA2', 'WPA3', 'WPA1 WPA2', '']),
+        })
+    return nets
+
+
+def synth_output(fmt, n, seed=1):
+    """Salida de ``fmt`` con ``n`` BSSIDs, como la de un entorno denso (edificios, eventos)."""
+    nets = _networks(n, seed)
+    if fmt == 'nmcli':
+        esc = lambda s: s.replace('\\', '\\\\').replace(':', '\\:')
+        return ''.join(f"{esc(x['ssid'])}:{esc(x['bssid'].upper())}:{x['channel']}:{x['percent']}:"
+                       f"{x['security'] or '--'}\n" for x in nets)
+    if fmt == 'netsh':
+        out = ['', 'Nombre de interfaz : Wi-Fi', f'Hay {n} redes visibles actualmente.', '']
+        for i, x in enumerate(nets):
+            out += [f"SSID {i + 1} : {x['ssid']}", '    Tipo de red             : Infraestructura',
+                    f"    Autenticación           : {x['security'] or 'Abierta'}",
+                    '    Cifrado                 : CCMP',
+                    f"    BSSID 1                 : {x['bssid']}",
+                    f"         Señal              : {x['percent']}%",
+                    '         Tipo de radio      : 802.11ax',
+                    f"         Canal              : {x['channel']}",
+                    '         Velocidades básicas (Mbps) : 1 2 5.5 11', '']
+        return '\r\n'.join(out)
+    if fmt == 'iwlist':
+        out = ['wlan0     Scan completed :']
+        for i, x in enumerate(nets):
+            freq = 2.407 + 0.005 * x['channel'] if x['channel'] <= 14 else 5.0 + 0.005 * x['channel']
+            out += [f"          Cell {i + 1:02d} - Address: {x['bssid'].upper()}",
+                    f"                    Channel:{x['channel']}",
+                    f"                    Frequency:{freq:.3f} GHz (Channel {x['channel']})",
+                    f"                    Quality={x['dbm'] + 110}/70  Signal level={x['dbm']} dBm  ",
+                    f"                    Encryption key:{'on' if x['security'] else 'off'}",
+                    f"                    ESSID:\"{x['ssid']}\"",
+                    '                    Bit Rates:6 Mb/s; 9 Mb/s; 12 Mb/s; 18 Mb/s; 24 Mb/s',
+                    '                    Mode:Master']
+            if 'WPA2' in x['security']:
+                out += ['                    IE: IEEE 802.11i/WPA2 Version 1',
+                        '                        Group Cipher : CCMP']
+        return '\n'.join(out) + '\n'
+    if fmt == 'airport':
+        out = ['                            SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)']
+        for x in nets:
+            sec = f"{x['security'].split()[-1]}(PSK/AES/AES)" if x['security'] else 'NONE'
+            out.append(f"{x['ssid'].replace(':', ''):>32} {x['bssid']} {x['dbm']:<4} {x['channel']:<7} Y  PY {sec}")
+        return '\n'.join(out) + '\n'
+    raise ValueError(f'Formato desconocido: {fmt}')
+
+
+def _normalize_text(s):
+    s = unicodedata.normalize('NFKD', s)
+    return ''.join(c for c in s if not unicodedata.combining(c)).lower()
+
+
+def legacy_netsh(result):
+    """Parseo línea por línea anterior (NFKD de cada línea), como referencia."""
+    networks, ssid, bssid, channel, signal = [], None, None, None, None
+    for raw in result.split('\n'):
+        line = raw.strip()
+        low = _normalize_text(line)
+        if low.startswith('ssid') or low.startswith('bssid'):
+            if bssid and channel is not None and signal is not None:
+                networks.append({'ssid': ssid, 'bssid': bssid, 'channel': channel, 'signal': signal})
+            if low.startswith('ssid'):
+                ssid, bssid, channel, signal = line.split(':', 1)[-1].strip(), None, None, None
+            else:
+                bssid = line.split(':', 1)[-1].strip()
+        elif low.startswith('channel') or low.startswith('canal'):
+            try:
+                channel = int(line.split(':', 1)[-1].strip())
+            except ValueError:
+                channel = None
+        elif low.startswith('signal') or low.startswith('senal'):
+            try:
+                signal = int(line.split(':', 1)[-1].strip().replace('%', ''))
+            except ValueError:
+                signal = None
+    if bssid and channel is not None and signal is not None:
+        networks.append({'ssid': ssid, 'bssid': bssid, 'channel': channel, 'signal': signal})
+    return networks
+
+
+def legacy_nmcli(out):
+    """``row.split(':')`` anterior: rompe los BSSID escapados como ``\\:``."""
+    networks = []
+    for row in out.split('\n'):
+        parts = row.split(':')
+        if len(parts) >= 4:
+            try:
+                networks.append({'ssid': parts[0], 'bssid': parts[1],
+                                 'channel': int(parts[2] or 0), 'signal': int(parts[3] or 0)})
+            except ValueError:
+                pass
+    return networks
+
+
+LEGACY = {'netsh': legacy_netsh, 'nmcli': legacy_nmcli}
+
+
+def _timed(fn, text, min_time=0.5):
+    runs, start = 0, time.perf_counter()
+    while True:
+        result = fn(text)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return result, elapsed / runs
+
+
+class Command(BaseCommand):
+    help = ("Mide el throughput de los parsers de wifi_parsers sobre el corpus grabado "
+            "(diagnostics/testdata/wifi) y sobre salidas densas sintéticas, contra el parseo anterior.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bssids', type=int, default=520, help='BSSIDs de las salidas sintéticas.')
+        parser.add_argument('--min-time', type=float, default=0.5, help='Segundos mínimos por medición.')
+        parser.add_argument('--write-corpus', action='store_true',
+                            help='Regenera los archivos <formato>_dense.txt del corpus.')
+
+    def handle(self, *args, **opts):
+        if opts['write_corpus']:
+            for fmt in wifi_parsers.PARSERS:
+                path = os.path.join(CORPUS_DIR, f'{fmt}_dense.txt')
+                with open(path, 'w', encoding='utf-8', newline='') as fh:
+                    fh.write(synth_output(fmt, opts['bssids']))
+                self.stdout.write(f'escrito {os.path.normpath(path)}')
+        cases = [(fmt, os.path.basename(path), read_corpus(path)) for fmt, path in corpus_files()]
+        cases += [(fmt, f'sintético {opts["bssids"]}', synth_output(fmt, opts['bssids'], seed=2))
+                  for fmt in wifi_parsers.PARSERS]
+        self.stdout.write(f"{'formato':8} {'entrada':22} {'KB':>7} {'BSSIDs':>7} {'µs/parseo':>10} "
+                          f"{'BSSIDs/s':>11} {'MB/s':>7} {'anterior':>10}")
+        for fmt, label, text in cases:
+            nets, per_run = _timed(wifi_parsers.PARSERS[fmt], text, opts['min_time'])
+            legacy = ''
+            if fmt in LEGACY:
+                old, old_run = _timed(LEGACY[fmt], text, opts['min_time'])
+                legacy = f'{old_run / per_run:7.1f}x'
+                if len(old) != len(nets):
+                    legacy += f' ({len(old)} redes)'
+            size = len(text.encode('utf-8'))
+            self.stdout.write(
+                f"{fmt:8} {label[:22]:22} {size / 1024:7.1f} {len(nets):7d} {per_run * 1e6:10.1f} "
+                f"{len(nets) / per_run:11,.0f} {size / per_run / 1e6:7.1f} {legacy:>10}")
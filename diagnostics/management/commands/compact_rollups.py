@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from diagnostics import rollups
+
+
+class Command(BaseCommand):
+    help = ("Recalcula los rollups (minuto/hora/día) desde las filas crudas de "
+            "SpeedTest y TrafficSample. Sin --days reconstruye todo el historial.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=sorted(rollups.SOURCES), action='append', dest='sources',
+                            help='Fuente a compactar (repetible). Por defecto todas.')
+        parser.add_argument('--days', type=int, help='Solo los últimos N días.')
+        parser.add_argument('--chunk-days', type=int, default=1, help='Días por transacción.')
+
+    def handle(self, *args, **opts):
+        start = timezone.now() - timedelta(days=opts['days']) if opts['days'] else None
+        for source in opts['sources'] or sorted(rollups.SOURCES):
+            n = rollups.rebuild(source, start=start, days_per_chunk=opts['chunk_days'])
+            self.stdout.write(f"{source}: {n} filas crudas procesadas")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from diagnostics import retention
+
+
+class Command(BaseCommand):
+    help = ("Aplica la política de retención (DIAGNOSTICS_RETENTION): borra por tandas "
+            "las filas crudas y los rollups vencidos.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--raw-days', type=int, help='Sobrescribe raw_days de la política.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta lo que se borraría.')
+
+    def handle(self, *args, **opts):
+        policy = retention.get_policy()
+        if opts['raw_days'] is not None:
+            policy['raw_days'] = opts['raw_days']
+        counts = retention.prune(policy=policy, batch_size=opts['batch_size'], dry_run=opts['dry_run'])
+        verb = 'a borrar' if opts['dry_run'] else 'borradas'
+        for label, n in counts.items():
+            self.stdout.write(f"{label}: {n} filas {verb}")
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from diagnostics.services.throughput import ThroughputClient
+
+
+class Command(BaseCommand):
+    help = ("Mide el throughput de la LAN/WiFi contra los endpoints /throughput/ de un servidor "
+            "de esta app, con varias conexiones en paralelo (no usa internet).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base del servidor.')
+        parser.add_argument('--streams', type=int, default=4, help='Conexiones en paralelo.')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Duración de cada sentido.')
+        parser.add_argument('--interval', type=float, default=1.0, help='Segundos por muestra.')
+        parser.add_argument('--direction', choices=['download', 'upload', 'both'], default='both')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON.')
+
+    def handle(self, *args, **opts):
+        client = ThroughputClient(opts['url'], streams=opts['streams'], duration=opts['seconds'],
+                                  interval=opts['interval'])
+        directions = ['download', 'upload'] if opts['direction'] == 'both' else [opts['direction']]
+        results = {d: client.run(d) for d in directions}
+        if opts['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False))
+            return
+        for d, r in results.items():
+            label = 'Descarga' if d == 'download' else 'Subida'
+            self.stdout.write(f"{label}: {r['steady_mbps']:.2f} Mbps en régimen "
+                              f"(total {r['mbps']:.2f} Mbps, rampa {r['ramp_up_seconds']} s, "
+                              f"{r['streams']} conexiones)")
+            self.stdout.write('  por intervalo: ' + ' '.join(f'{v:.1f}' for v in r['per_second']))
+            self.stdout.write('  por conexión: ' + ' '.join(f'{v:.1f}' for v in r['per_stream_mbps']))
+            for err in r['errors']:
+                self.stderr.write(f'  {err}')
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0003_job_worker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minuto'), ('hour', 'Hora'), ('day', 'Día')], max_length=8)),
+                ('bucket', models.DateTimeField()),
+                ('source', models.CharField(max_length=16)),
+                ('metric', models.CharField(max_length=32)),
+                ('ip', models.CharField(blank=True, default='', max_length=64)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('min_value', models.FloatField(default=0)),
+                ('max_value', models.FloatField(default=0)),
+                ('histogram', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'metric', 'granularity', 'ip', 'bucket'), name='uniq_metric_rollup')],
+            },
+        ),
+    ]
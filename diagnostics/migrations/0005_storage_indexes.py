@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0004_metricrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['created_at'], name='device_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['mac', 'created_at'], name='device_mac_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['ip', 'created_at'], name='device_ip_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['kind', 'status', 'created_at'], name='job_kind_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metricrollup',
+            index=models.Index(fields=['source', 'metric', 'granularity', 'bucket'], name='rollup_range_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='metricrollup',
+            index=models.Index(fields=['granularity', 'bucket'], name='rollup_gran_bucket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='speedtest',
+            index=models.Index(fields=['created_at'], name='speedtest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficsample',
+            index=models.Index(fields=['created_at'], name='traffic_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trafficsample',
+            index=models.Index(fields=['ip', 'created_at'], name='traffic_ip_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wifinetwork',
+            index=models.Index(fields=['created_at'], name='wifi_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wifinetwork',
+            index=models.Index(fields=['bssid', 'created_at'], name='wifi_bssid_created_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:36
+
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_scan_runs(apps, schema_editor):
+    """Agrupa las filas existentes en ScanRun: una tanda termina tras 5 min sin filas."""
+    ScanRun = apps.get_model('diagnostics', 'ScanRun')
+    for kind, model_name in (('devices', 'Device'), ('wifi', 'WiFiNetwork')):
+        model = apps.get_model('diagnostics', model_name)
+        batch, last = [], None
+
+        def flush():
+            if not batch:
+                return
+            run = ScanRun.objects.create(kind=kind, started_at=batch[0][1], row_count=len(batch))
+            ScanRun.objects.filter(pk=run.pk).update(created_at=batch[-1][1])
+            model.objects.filter(pk__in=[pk for pk, _ in batch]).update(scan_run=run)
+            batch.clear()
+
+        for pk, created_at in model.objects.order_by('created_at', 'id').values_list('id', 'created_at').iterator():
+            if last is not None and created_at - last > timedelta(minutes=5):
+                flush()
+            batch.append((pk, created_at))
+            last = created_at
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0005_storage_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('kind', models.CharField(choices=[('devices', 'Dispositivos'), ('wifi', 'Redes WiFi')], max_length=16)),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'created_at'], name='scanrun_kind_created_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='scan_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='devices', to='diagnostics.scanrun'),
+        ),
+        migrations.AddField(
+            model_name='wifinetwork',
+            name='scan_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='networks', to='diagnostics.scanrun'),
+        ),
+        migrations.RunPython(backfill_scan_runs, migrations.RunPython.noop),
+    ]
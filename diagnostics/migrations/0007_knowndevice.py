@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:04
+
+from django.db import migrations, models
+
+
+def backfill_inventory(apps, schema_editor):
+    """Arma el inventario desde las filas de escaneo existentes (un intervalo por equipo)."""
+    Device = apps.get_model('diagnostics', 'Device')
+    ScanRun = apps.get_model('diagnostics', 'ScanRun')
+    KnownDevice = apps.get_model('diagnostics', 'KnownDevice')
+    latest = ScanRun.objects.filter(kind='devices').order_by('-created_at', '-id').first()
+    current = set()
+    if latest is not None:
+        current = {(mac.lower() or ip)[:64]
+                   for mac, ip in Device.objects.filter(scan_run=latest).values_list('mac', 'ip')}
+    seen = {}
+    rows = Device.objects.order_by('created_at', 'id').values_list('mac', 'ip', 'hostname', 'created_at')
+    for mac, ip, hostname, created_at in rows.iterator():
+        key = (mac.lower() or ip)[:64]
+        if not key:
+            continue
+        entry = seen.setdefault(key, {'mac': mac.lower(), 'first_seen': created_at})
+        entry.update(ip=ip, hostname=hostname or entry.get('hostname', ''), last_seen=created_at)
+    KnownDevice.objects.bulk_create([
+        KnownDevice(key=key, present=key in current,
+                    presence=[[int(e['first_seen'].timestamp()),
+                               None if key in current else int(e['last_seen'].timestamp())]], **e)
+        for key, e in seen.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0006_scanrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnownDevice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('mac', models.CharField(blank=True, default='', max_length=64)),
+                ('ip', models.CharField(blank=True, default='', max_length=64)),
+                ('hostname', models.CharField(blank=True, default='', max_length=128)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+                ('present', models.BooleanField(default=True)),
+                ('presence', models.JSONField(blank=True, default=list)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['present', 'last_seen'], name='knowndevice_present_idx'), models.Index(fields=['ip'], name='knowndevice_ip_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_inventory, migrations.RunPython.noop),
+    ]
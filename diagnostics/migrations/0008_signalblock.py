@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0007_knowndevice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SignalBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bssid', models.CharField(max_length=64)),
+                ('ssid', models.CharField(blank=True, default='', max_length=128)),
+                ('start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('data', models.BinaryField(default=b'')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start'], name='signalblock_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('bssid', 'start'), name='uniq_signal_block')],
+            },
+        ),
+    ]
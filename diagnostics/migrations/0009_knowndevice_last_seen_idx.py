@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0008_signalblock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='knowndevice',
+            index=models.Index(fields=['last_seen', 'id'], name='knowndevice_last_seen_idx'),
+        ),
+    ]
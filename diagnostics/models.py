@@ -6,11 +6,50 @@ class SpeedTest(models.Model):
     upload_mbps = models.FloatField(default=0)
     ping_ms = models.FloatField(default=0)
 
+    class Meta:
+        indexes = [models.Index(fields=['created_at'], name='speedtest_created_idx')]
+
 class Device(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     ip = models.CharField(max_length=64)
     mac = models.CharField(max_length=64, blank=True, default="")
     hostname = models.CharField(max_length=128, blank=True, default="")
+    scan_run = models.ForeignKey('ScanRun', null=True, blank=True, on_delete=models.CASCADE,
+                                 related_name='devices')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='device_created_idx'),
+            models.Index(fields=['mac', 'created_at'], name='device_mac_created_idx'),
+            models.Index(fields=['ip', 'created_at'], name='device_ip_created_idx'),
+        ]
+
+class KnownDevice(models.Model):
+    """Inventario de dispositivos: una fila por equipo, actualizada por diff en cada escaneo.
+
+    ``key`` es la MAC (o la IP si no hay MAC). ``presence`` guarda los
+    intervalos de presencia como ``[[inicio, fin], ...]`` en segundos epoch;
+    el intervalo abierto tiene ``fin`` None y se extiende hasta ``last_seen``.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    mac = models.CharField(max_length=64, blank=True, default="")
+    ip = models.CharField(max_length=64, blank=True, default="")
+    hostname = models.CharField(max_length=128, blank=True, default="")
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+    present = models.BooleanField(default=True)
+    presence = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['present', 'last_seen'], name='knowndevice_present_idx'),
+            models.Index(fields=['ip'], name='knowndevice_ip_idx'),
+            # Paginación por clave de /api/devices/
+            models.Index(fields=['last_seen', 'id'], name='knowndevice_last_seen_idx'),
+        ]
+
+    def __str__(self):
+        return self.hostname or self.key
 
 class WiFiNetwork(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -19,9 +58,161 @@ class WiFiNetwork(models.Model):
     signal = models.IntegerField(default=0)
     channel = models.IntegerField(default=0)
     security = models.CharField(max_length=128, blank=True, default="")
+    scan_run = models.ForeignKey('ScanRun', null=True, blank=True, on_delete=models.CASCADE,
+                                 related_name='networks')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='wifi_created_idx'),
+            models.Index(fields=['bssid', 'created_at'], name='wifi_bssid_created_idx'),
+        ]
+
+class SignalBlock(models.Model):
+    """Serie de señal de un BSSID en una ventana fija, empaquetada en binario.
+
+    ``data`` son ``count`` muestras de 4 bytes (ver ``signal_store.SAMPLE``):
+    segundos desde ``start``, señal y canal. Una fila por BSSID y ventana en
+    lugar de una por red y escaneo.
+    """
+    bssid = models.CharField(max_length=64)
+    ssid = models.CharField(max_length=128, blank=True, default="")
+    start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    data = models.BinaryField(default=b'')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bssid', 'start'], name='uniq_signal_block'),
+        ]
+        indexes = [models.Index(fields=['start'], name='signalblock_start_idx')]
 
 class TrafficSample(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     ip = models.CharField(max_length=64)
     download_mbps = models.FloatField(default=0)
     upload_mbps = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='traffic_created_idx'),
+            models.Index(fields=['ip', 'created_at'], name='traffic_ip_created_idx'),
+        ]
+
+class ScanRun(models.Model):
+    """Una ejecución de escaneo (dispositivos o WiFi), con su resumen precalculado."""
+    KIND_CHOICES = [
+        ('devices', 'Dispositivos'),
+        ('wifi', 'Redes WiFi'),
+    ]
+    created_at = models.DateTimeField(auto_now_add=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    started_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'created_at'], name='scanrun_kind_created_idx')]
+
+    @classmethod
+    def latest_of(cls, kind):
+        return cls.objects.filter(kind=kind).order_by('-created_at', '-id').first()
+
+    def rows(self):
+        # Los escaneos de dispositivos no guardan filas: su historial es el inventario
+        return self.networks.all()
+
+    def previous(self):
+        return (ScanRun.objects.filter(kind=self.kind, created_at__lt=self.created_at)
+                .order_by('-created_at', '-id').first())
+
+    def _keys(self):
+        return {n.bssid or n.ssid for n in self.networks.all()}
+
+    def diff(self, other=None):
+        """Altas y bajas respecto de ``other`` (por defecto, el escaneo anterior).
+
+        Las redes se comparan por BSSID (o SSID). Los escaneos de dispositivos
+        no guardan filas por equipo: su diff lo da ``inventory.apply_scan``.
+        """
+        other = other if other is not None else self.previous()
+        now = self._keys()
+        before = other._keys() if other is not None else set()
+        return {'added': sorted(now - before), 'removed': sorted(before - now)}
+
+
+class Job(models.Model):
+    """Tarea en segundo plano (speed test, escaneos, captura de tráfico)."""
+    STATUS_CHOICES = [
+        ('queued', 'En cola'),
+        ('running', 'En ejecución'),
+        ('done', 'Completada'),
+        ('failed', 'Fallida'),
+    ]
+    created_at = models.DateTimeField(auto_now_add=True)
+    kind = models.CharField(max_length=32)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='queued')
+    params = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # host:pid del proceso que la encoló, para detectar tareas huérfanas
+    worker = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'status', 'created_at'], name='job_kind_status_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'result': self.result,
+            'error': self.error,
+        }
+
+class MetricRollup(models.Model):
+    """Agregado de una métrica por intervalo (minuto/hora/día), mantenido por diagnostics/rollups.py.
+
+    ``ip`` vacío agrega todas las IPs; ``histogram`` es un histograma
+    logarítmico ({índice: cantidad}) para percentiles aproximados.
+    """
+    GRANULARITY_CHOICES = [
+        ('minute', 'Minuto'),
+        ('hour', 'Hora'),
+        ('day', 'Día'),
+    ]
+    granularity = models.CharField(max_length=8, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    source = models.CharField(max_length=16)
+    metric = models.CharField(max_length=32)
+    ip = models.CharField(max_length=64, blank=True, default="")
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0)
+    min_value = models.FloatField(default=0)
+    max_value = models.FloatField(default=0)
+    histogram = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'metric', 'granularity', 'ip', 'bucket'],
+                                    name='uniq_metric_rollup'),
+        ]
+        indexes = [
+            # Rangos sin filtrar por IP (top_ips, retención)
+            models.Index(fields=['source', 'metric', 'granularity', 'bucket'], name='rollup_range_idx'),
+            models.Index(fields=['granularity', 'bucket'], name='rollup_gran_bucket_idx'),
+        ]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
@@ -0,0 +1,85 @@
+"""Política de retención: mantiene acotado el tamaño de las tablas.
+
+Las filas crudas (speed tests, escaneos, tráfico, tareas) se guardan
+``raw_days``; los rollups se guardan más tiempo según su granularidad
+(``DIAGNOSTICS_RETENTION``) y los bloques de señal WiFi ``signal_days``. Un
+valor None conserva para siempre.
+
+El borrado se hace por tandas de ``batch_size`` claves primarias tomadas del
+índice de ``created_at``, cada una en su propia transacción, para no
+bloquear la base ni cargar millones de filas en memoria.
+"""
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import signal_store
+from .rollups import truncate
+from .models import Device, Job, MetricRollup, ScanRun, SpeedTest, TrafficSample, WiFiNetwork
+
+DEFAULT_RETENTION = {
+    'raw_days': 30,
+    'jobs_days': 7,
+    'minute_days': 7,
+    'hour_days': 180,
+    'day_days': None,
+    'signal_days': 90,
+}
+
+# ScanRun va al final: sus filas hijas vencen con el mismo corte (y un escaneo sin
+# filas dejaría un row_count falso y un diff contra la nada)
+RAW_MODELS = (SpeedTest, Device, WiFiNetwork, TrafficSample, ScanRun)
+
+
+def get_policy() -> Dict[str, Optional[int]]:
+    policy = dict(DEFAULT_RETENTION)
+    policy.update(getattr(settings, 'DIAGNOSTICS_RETENTION', {}) or {})
+    return policy
+
+
+def _delete_in_batches(qs, batch_size: int) -> int:
+    deleted = 0
+    model = qs.model
+    while True:
+        ids = list(qs.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            n, _ = model.objects.filter(pk__in=ids).delete()
+        deleted += n
+        if len(ids) < batch_size:
+            return deleted
+
+
+def expired_querysets(now=None, policy=None):
+    """(etiqueta, queryset) de lo que la política permite borrar."""
+    now = now or timezone.now()
+    policy = policy or get_policy()
+    out = []
+    if policy.get('raw_days') is not None:
+        # Días locales completos: así compact_rollups nunca recalcula un día a medio podar
+        cutoff = truncate(now - timedelta(days=policy['raw_days']), 'day')
+        for model in RAW_MODELS:
+            out.append((model.__name__, model.objects.filter(created_at__lt=cutoff)))
+    if policy.get('jobs_days') is not None:
+        cutoff = now - timedelta(days=policy['jobs_days'])
+        out.append(('Job', Job.objects.filter(created_at__lt=cutoff, status__in=('done', 'failed'))))
+    if policy.get('signal_days') is not None:
+        out.append(('SignalBlock', signal_store.expired(now, policy['signal_days'])))
+    for granularity in ('minute', 'hour', 'day'):
+        days = policy.get(f'{granularity}_days')
+        if days is not None:
+            out.append((f'MetricRollup[{granularity}]', MetricRollup.objects.filter(
+                granularity=granularity, bucket__lt=now - timedelta(days=days))))
+    return out
+
+
+def prune(now=None, policy=None, batch_size: int = 5000, dry_run: bool = False) -> Dict[str, int]:
+    """Borra lo vencido según la política; devuelve filas borradas (o a borrar) por tabla."""
+    counts = {}
+    for label, qs in expired_querysets(now, policy):
+        counts[label] = qs.count() if dry_run else _delete_in_batches(qs, batch_size)
+    return counts
@@ -0,0 +1,288 @@
+"""Rollups de series temporales (SpeedTest, TrafficSample).
+
+Cada fila nueva suma su valor a los intervalos de minuto, hora y día que le
+corresponden (``MetricRollup``): cantidad, suma, mínimo, máximo y un
+histograma logarítmico con el que se estiman percentiles con ~2% de error
+relativo. Los reportes leen estos agregados en lugar de las filas crudas, así
+que un rango de un año son ~365 filas por métrica a nivel día.
+
+``record()`` se llama al insertar (jobs.py); ``rebuild()`` recalcula un rango
+desde las filas crudas (comando ``compact_rollups``).
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, time as dtime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MetricRollup, SpeedTest, TrafficSample
+
+# fuente -> (modelo, métricas, campo de IP o None)
+SOURCES = {
+    'speedtest': (SpeedTest, ('download_mbps', 'upload_mbps', 'ping_ms'), None),
+    'traffic': (TrafficSample, ('download_mbps', 'upload_mbps'), 'ip'),
+}
+GRANULARITIES = ('minute', 'hour', 'day')
+
+# Histograma logarítmico: el índice i cubre (GAMMA^(i-1), GAMMA^i]
+_GAMMA = 1.04
+_LOG_GAMMA = math.log(_GAMMA)
+_ZERO = 'z'  # valores <= 0 (p. ej. speed tests fallidos)
+
+
+def _hist_key(value: float) -> str:
+    if value <= 0:
+        return _ZERO
+    return str(math.ceil(math.log(value) / _LOG_GAMMA))
+
+
+def _hist_value(key: str) -> float:
+    if key == _ZERO:
+        return 0.0
+    i = int(key)
+    # Punto medio del intervalo en escala relativa
+    return 2 * _GAMMA ** i / (_GAMMA + 1)
+
+
+def _hist_order(key: str) -> float:
+    return -math.inf if key == _ZERO else int(key)
+
+
+def truncate(dt: datetime, granularity: str) -> datetime:
+    """Inicio del intervalo que contiene ``dt``, en la zona horaria local."""
+    local = timezone.localtime(dt)
+    if granularity == 'minute':
+        local = local.replace(second=0, microsecond=0)
+    elif granularity == 'hour':
+        local = local.replace(minute=0, second=0, microsecond=0)
+    elif granularity == 'day':
+        local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        raise ValueError(f'Granularidad desconocida: {granularity}')
+    return local
+
+
+def next_bucket(bucket: datetime, granularity: str) -> datetime:
+    """Inicio del intervalo siguiente a ``bucket`` (respeta los cambios de horario)."""
+    step = {'minute': timedelta(minutes=1), 'hour': timedelta(hours=1),
+            'day': timedelta(days=1, hours=2)}[granularity]
+    return truncate(bucket + step, granularity)
+
+
+def pick_granularity(start: datetime, end: datetime) -> str:
+    """Granularidad razonable para graficar un rango (a lo sumo ~1500 puntos)."""
+    span = end - start
+    if span <= timedelta(hours=24):
+        return 'minute'
+    if span <= timedelta(days=60):
+        return 'hour'
+    return 'day'
+
+
+def parse_range(params, now: Optional[datetime] = None) -> Tuple[datetime, datetime, str]:
+    """Rango y granularidad de ``days=N`` o ``start=AAAA-MM-DD&end=AAAA-MM-DD`` y ``granularity=``.
+
+    ``params`` es un dict (o QueryDict). Lanza ValueError si no son válidos.
+    """
+    tz = timezone.get_current_timezone()
+    end = now or timezone.now()
+    try:
+        if params.get('end'):
+            end_day = datetime.strptime(params['end'], '%Y-%m-%d').date()
+            end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), dtime.min), tz)
+        if params.get('start'):
+            start_day = datetime.strptime(params['start'], '%Y-%m-%d').date()
+            start = timezone.make_aware(datetime.combine(start_day, dtime.min), tz)
+        else:
+            days = int(params.get('days') or 30)
+    except ValueError:
+        raise ValueError('Fechas inválidas (AAAA-MM-DD) o days no numérico')
+    if not params.get('start'):
+        if not 1 <= days <= 3660:
+            raise ValueError('days debe estar entre 1 y 3660')
+        start = end - timedelta(days=days)
+    if start >= end:
+        raise ValueError('El inicio debe ser anterior al fin')
+    granularity = params.get('granularity') or 'auto'
+    if granularity == 'auto':
+        granularity = pick_granularity(start, end)
+    elif granularity not in GRANULARITIES:
+        raise ValueError(f'Granularidad desconocida: {granularity}')
+    return start, end, granularity
+
+
+class Aggregate:
+    """Cantidad, suma, mínimo, máximo e histograma de un conjunto de valores."""
+
+    __slots__ = ('count', 'total', 'min_value', 'max_value', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min_value = math.inf
+        self.max_value = -math.inf
+        self.histogram: Dict[str, int] = defaultdict(int)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min_value = min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+        self.histogram[_hist_key(value)] += 1
+
+    def merge(self, count, total, min_value, max_value, histogram) -> None:
+        if not count:
+            return
+        self.count += count
+        self.total += total
+        self.min_value = min(self.min_value, min_value)
+        self.max_value = max(self.max_value, max_value)
+        for k, n in histogram.items():
+            self.histogram[k] += n
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.histogram, key=_hist_order):
+            seen += self.histogram[key]
+            if seen > rank:
+                return min(max(_hist_value(key), self.min_value), self.max_value)
+        return self.max_value
+
+    def as_dict(self) -> dict:
+        if not self.count:
+            return {'count': 0, 'mean': 0.0, 'min': 0.0, 'max': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3),
+            'min': round(self.min_value, 3),
+            'max': round(self.max_value, 3),
+            'p50': round(self.quantile(0.50), 3),
+            'p95': round(self.quantile(0.95), 3),
+            'p99': round(self.quantile(0.99), 3),
+        }
+
+
+def _aggregate(source: str, rows: Iterable) -> Dict[Tuple[str, str, str, datetime], Aggregate]:
+    """Agrupa filas crudas por (métrica, granularidad, ip, intervalo)."""
+    _model, metrics, ip_field = SOURCES[source]
+    aggs: Dict[Tuple[str, str, str, datetime], Aggregate] = defaultdict(Aggregate)
+    for row in rows:
+        ips = ('',) if ip_field is None else ('', getattr(row, ip_field) or '')
+        buckets = [(g, truncate(row.created_at, g)) for g in GRANULARITIES]
+        for metric in metrics:
+            value = float(getattr(row, metric) or 0)
+            for g, bucket in buckets:
+                for ip in ips:
+                    aggs[(metric, g, ip, bucket)].add(value)
+    return aggs
+
+
+def _apply(source: str, aggs: Dict[Tuple[str, str, str, datetime], Aggregate]) -> int:
+    """Suma los agregados a las filas de MetricRollup existentes (o las crea)."""
+    if not aggs:
+        return 0
+    with transaction.atomic():
+        buckets = {k[3] for k in aggs}
+        existing = {
+            (r.metric, r.granularity, r.ip, r.bucket): r
+            for r in MetricRollup.objects.select_for_update().filter(
+                source=source, bucket__in=buckets,
+                metric__in={k[0] for k in aggs}, ip__in={k[2] for k in aggs})
+        }
+        to_update, to_create = [], []
+        for (metric, g, ip, bucket), agg in aggs.items():
+            row = existing.get((metric, g, ip, bucket))
+            if row is None:
+                to_create.append(MetricRollup(
+                    source=source, metric=metric, granularity=g, ip=ip, bucket=bucket,
+                    count=agg.count, total=agg.total, min_value=agg.min_value,
+                    max_value=agg.max_value, histogram=dict(agg.histogram)))
+                continue
+            agg.merge(row.count, row.total, row.min_value, row.max_value, row.histogram)
+            row.count, row.total = agg.count, agg.total
+            row.min_value, row.max_value = agg.min_value, agg.max_value
+            row.histogram = dict(agg.histogram)
+            to_update.append(row)
+        MetricRollup.objects.bulk_create(to_create, batch_size=500)
+        MetricRollup.objects.bulk_update(
+            to_update, ['count', 'total', 'min_value', 'max_value', 'histogram'], batch_size=500)
+    return len(aggs)
+
+
+def record(source: str, rows: Iterable) -> int:
+    """Incorpora filas recién insertadas a los rollups; devuelve cuántos intervalos tocó."""
+    return _apply(source, _aggregate(source, rows))
+
+
+def rebuild(source: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+            days_per_chunk: int = 1) -> int:
+    """Recalcula los rollups de ``source`` desde las filas crudas, por tandas de días.
+
+    El rango se alinea a días locales completos para no mezclar intervalos
+    parciales. Devuelve la cantidad de filas crudas procesadas.
+    """
+    model = SOURCES[source][0]
+    first = model.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if first is None:
+        return 0
+    start = truncate(max(start or first, first), 'day')
+    end = end or timezone.now()
+    processed = 0
+    while start <= end:
+        # +2h y truncar: los días con cambio de horario no duran 24 h
+        stop = truncate(start + timedelta(days=days_per_chunk, hours=2), 'day')
+        with transaction.atomic():
+            MetricRollup.objects.filter(source=source, bucket__gte=start, bucket__lt=stop).delete()
+            rows = list(model.objects.filter(created_at__gte=start, created_at__lt=stop))
+            _apply(source, _aggregate(source, rows))
+        processed += len(rows)
+        start = stop
+    return processed
+
+
+def _rollup_rows(source: str, metric: str, granularity: str, start: datetime,
+                 end: datetime, ip: str = ''):
+    return MetricRollup.objects.filter(
+        source=source, metric=metric, granularity=granularity, ip=ip,
+        bucket__gte=truncate(start, granularity), bucket__lt=end,
+    ).order_by('bucket').values_list('bucket', 'count', 'total', 'min_value', 'max_value', 'histogram')
+
+
+def series(source: str, metric: str, granularity: str, start: datetime,
+           end: datetime, ip: str = '') -> List[dict]:
+    """Serie de ``metric`` por intervalo: bucket, count, mean, min, max, p50, p95, p99."""
+    out = []
+    for bucket, *values in _rollup_rows(source, metric, granularity, start, end, ip):
+        agg = Aggregate()
+        agg.merge(*values)
+        out.append({'bucket': bucket, **agg.as_dict()})
+    return out
+
+
+def summary(source: str, metric: str, start: datetime, end: datetime,
+            ip: str = '', granularity: Optional[str] = None) -> dict:
+    """Estadísticas de todo el rango combinando los intervalos (sin leer filas crudas)."""
+    agg = Aggregate()
+    for _bucket, *values in _rollup_rows(source, metric, granularity or pick_granularity(start, end),
+                                         start, end, ip):
+        agg.merge(*values)
+    return agg.as_dict()
+
+
+def top_ips(start: datetime, end: datetime, granularity: str = 'day',
+            metric: str = 'download_mbps', limit: int = 10) -> List[dict]:
+    """IPs con mayor media de ``metric`` en el rango, desde los rollups de tráfico."""
+    per_ip: Dict[str, Aggregate] = defaultdict(Aggregate)
+    rows = MetricRollup.objects.filter(
+        source='traffic', metric=metric, granularity=granularity,
+        bucket__gte=truncate(start, granularity), bucket__lt=end,
+    ).exclude(ip='').values_list('ip', 'count', 'total', 'min_value', 'max_value', 'histogram')
+    for ip, *values in rows:
+        per_ip[ip].merge(*values)
+    ranked = sorted(per_ip.items(), key=lambda kv: kv[1].total / kv[1].count, reverse=True)
+    return [{'ip': ip, **agg.as_dict()} for ip, agg in ranked[:limit]]
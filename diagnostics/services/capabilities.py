@@ -0,0 +1,216 @@
+"""Capacidades de la plataforma y registro de backends de escaneo.
+
+Al arrancar se detecta una sola vez qué utilidades hay instaladas (nmcli,
+iwlist, netsh, airport...) y con qué privilegios corre el proceso. Los
+servicios registran sus backends con ``@backend(tipo, nombre, ...)`` y
+``dispatch`` elige entre ellos sin volver a buscar binarios:
+
+- solo los del SO actual cuyas utilidades existen;
+- primero el último que funcionó, luego por prioridad (los que necesitan
+  privilegios que el proceso no tiene van al final);
+- un backend que falla (excepción) se saltea durante ``retry_after``
+  segundos, en lugar de relanzar el mismo proceso fallido en cada escaneo.
+"""
+import os
+import platform
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+AIRPORT_BIN = "/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport"
+
+# nombre -> comando que se busca en el PATH (o ruta absoluta)
+TOOLS = {
+    "netsh": "netsh",
+    "ipconfig": "ipconfig",
+    "arp": "arp",
+    "nmcli": "nmcli",
+    "iwlist": "iwlist",
+    "iw": "iw",
+    "iwgetid": "iwgetid",
+    "ip": "ip",
+    "ifconfig": "ifconfig",
+    "airport": AIRPORT_BIN,
+}
+
+# Bit de CAP_NET_ADMIN en CapEff (/proc/self/status): permite lanzar escaneos WiFi
+_CAP_NET_ADMIN = 12
+
+
+def _is_admin(os_name: str) -> bool:
+    if os_name == "Windows":
+        try:
+            import ctypes
+            return bool(ctypes.windll.shell32.IsUserAnAdmin())
+        except Exception:
+            return False
+    return hasattr(os, "geteuid") and os.geteuid() == 0
+
+
+def _has_net_admin(os_name: str, admin: bool) -> bool:
+    if admin or os_name != "Linux":
+        return admin
+    try:
+        with open("/proc/self/status", encoding="ascii", errors="ignore") as fh:
+            for line in fh:
+                if line.startswith("CapEff:"):
+                    return bool(int(line.split()[1], 16) >> _CAP_NET_ADMIN & 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return False
+
+
+class Capabilities:
+    """Resultado de ``probe``: SO, utilidades disponibles y privilegios."""
+
+    def __init__(self, os_name: str, tools: Dict[str, Optional[str]], admin: bool, net_admin: bool):
+        self.os_name = os_name
+        self.tools = tools
+        self.admin = admin
+        self.net_admin = net_admin
+        self.probed_at = time.time()
+
+    def has(self, *tools: str) -> bool:
+        return all(self.tools.get(t) for t in tools)
+
+    def path(self, tool: str) -> str:
+        """Ruta detectada de ``tool`` (o su nombre si no se detectó)."""
+        return self.tools.get(tool) or TOOLS.get(tool, tool)
+
+    @property
+    def privileged(self) -> bool:
+        return self.net_admin
+
+    def as_dict(self) -> Dict:
+        return {
+            "os": self.os_name,
+            "tools": {k: v for k, v in self.tools.items() if v},
+            "missing": sorted(k for k, v in self.tools.items() if not v),
+            "admin": self.admin,
+            "net_admin": self.net_admin,
+        }
+
+
+def probe(os_name: Optional[str] = None, which: Callable[[str], Optional[str]] = shutil.which) -> Capabilities:
+    os_name = os_name or platform.system()
+    admin = _is_admin(os_name)
+    return Capabilities(os_name, {name: which(cmd) for name, cmd in TOOLS.items()},
+                        admin, _has_net_admin(os_name, admin))
+
+
+class Backend:
+    def __init__(self, kind: str, name: str, fn: Callable, os_name: str,
+                 tools: Sequence[str] = (), privileged: bool = False, priority: int = 0):
+        self.kind = kind
+        self.name = name
+        self.fn = fn
+        self.os_name = os_name
+        self.tools = tuple(tools)
+        self.privileged = privileged
+        self.priority = priority
+
+    def available(self, caps: Capabilities) -> bool:
+        return self.os_name == caps.os_name and caps.has(*self.tools)
+
+
+class BackendRegistry:
+    def __init__(self, retry_after: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.retry_after = retry_after
+        self._clock = clock
+        self._backends: Dict[str, List[Backend]] = {}
+        self.last_working: Dict[str, str] = {}
+        self._failed: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, name: str, fn: Callable, os_name: str, **opts) -> Backend:
+        b = Backend(kind, name, fn, os_name, **opts)
+        with self._lock:
+            others = [x for x in self._backends.get(kind, []) if x.name != name]
+            self._backends[kind] = others + [b]
+        return b
+
+    def candidates(self, kind: str, caps: Capabilities) -> List[Backend]:
+        """Backends utilizables ahora, en el orden en que se van a probar."""
+        now = self._clock()
+        with self._lock:
+            last = self.last_working.get(kind)
+            pool = [b for b in self._backends.get(kind, [])
+                    if b.available(caps) and not self._failing(kind, b.name, now)]
+        return sorted(pool, key=lambda b: (b.name != last, b.privileged and not caps.privileged, b.priority))
+
+    def _failing(self, kind: str, name: str, now: float) -> bool:
+        failed = self._failed.get((kind, name))
+        return failed is not None and now - failed[0] < self.retry_after
+
+    def dispatch(self, kind: str, caps: Capabilities, *args, **kwargs) -> Tuple[Any, Optional[str]]:
+        """``(resultado, backend)`` del primer backend con un resultado no vacío.
+
+        Si todos devuelven vacío se entrega el último resultado (vacío) y
+        ``backend`` es None.
+        """
+        result = None
+        for b in self.candidates(kind, caps):
+            try:
+                result = b.fn(caps, *args, **kwargs)
+            except Exception as e:
+                with self._lock:
+                    self._failed[(kind, b.name)] = (self._clock(), str(e) or e.__class__.__name__)
+                print(f"{kind} backend {b.name} error: {e}")
+                continue
+            if result:
+                with self._lock:
+                    self.last_working[kind] = b.name
+                    self._failed.pop((kind, b.name), None)
+                return result, b.name
+        return result, None
+
+    def reset(self) -> None:
+        """Olvida los fallos y el último backend que funcionó (p. ej. tras re-detectar)."""
+        with self._lock:
+            self.last_working.clear()
+            self._failed.clear()
+
+    def status(self, caps: Capabilities) -> Dict[str, Dict]:
+        now = self._clock()
+        with self._lock:
+            out = {}
+            for kind, backends in self._backends.items():
+                out[kind] = {
+                    "last_working": self.last_working.get(kind),
+                    "available": [b.name for b in backends if b.available(caps)],
+                    "failing": {b.name: self._failed[(kind, b.name)][1] for b in backends
+                                if self._failing(kind, b.name, now)},
+                }
+            return out
+
+
+registry = BackendRegistry()
+
+
+def backend(kind: str, name: str, os_name: str, tools: Sequence[str] = (),
+            privileged: bool = False, priority: int = 0):
+    """Decorador para registrar un backend ``fn(caps, ...)`` de ``kind``."""
+    def deco(fn):
+        registry.register(kind, name, fn, os_name, tools=tools, privileged=privileged, priority=priority)
+        return fn
+    return deco
+
+
+_caps: Optional[Capabilities] = None
+_caps_lock = threading.Lock()
+
+
+def get_capabilities(refresh: bool = False) -> Capabilities:
+    """Capacidades detectadas al arrancar (``refresh`` vuelve a detectar)."""
+    global _caps
+    with _caps_lock:
+        if _caps is None or refresh:
+            _caps = probe()
+            if refresh:
+                registry.reset()
+        return _caps
+
+
+def dispatch(kind: str, *args, **kwargs) -> Tuple[Any, Optional[str]]:
+    return registry.dispatch(kind, get_capabilities(), *args, **kwargs)
@@ -0,0 +1,133 @@
+"""Puntaje de congestión e interferencia por canal WiFi, vectorizado con NumPy.
+
+Cada red observada ocupa un tramo del espectro: 20 MHz alrededor de su canal
+en 2.4 GHz y el bloque alineado de ``width_5ghz`` MHz (40/80/160) que contiene
+su canal en 5 GHz. Para cada canal candidato se calcula la fracción de su
+tramo que se superpone con cada red:
+
+- ``congestion``: suma de superposición × peso de la señal (0 a -95 dBm o
+  menos, 1 a -50 dBm o más): cuántas redes "completas" compiten por el aire.
+- ``interference_dbm``: potencia recibida sumada (mW) × superposición, en dBm.
+- ``networks``: cantidad de redes con alguna superposición.
+
+Con muchos escaneos, cada métrica se calcula por escaneo y se promedia
+(``congestion_peak`` es el peor escaneo). Como la superposición depende solo
+del canal, las observaciones se suman por (escaneo, canal) con ``bincount`` y
+se multiplican por una tabla canal × candidato: sin bucles de Python por red.
+"""
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+CHANNELS_24 = np.arange(1, 15)
+CHANNELS_5 = np.array([36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128,
+                       132, 136, 140, 144, 149, 153, 157, 161, 165])
+# Canales de 2.4 GHz sin superposición entre sí: solo se recomiendan estos
+RECOMMENDED_24 = (1, 6, 11)
+DFS_5 = (52, 144)  # rango de canales con DFS (radar)
+NOISE_FLOOR_DBM = -95.0
+STRONG_DBM = -50.0
+
+
+def signal_to_dbm(signal) -> np.ndarray:
+    """Señal guardada -> dBm: < 0 ya es dBm (iwlist/airport), > 0 es % (netsh/nmcli).
+
+    0 (o vacío) es el valor por defecto cuando el escáner no informó señal: se
+    toma como el piso de ruido, así la red cuenta pero no pesa en la congestión.
+    """
+    s = np.asarray(signal, dtype=np.float64)
+    dbm = np.where(s < 0, s, np.clip(s, 0, 100) / 2.0 - 100.0)
+    return np.where((s == 0) | np.isnan(s), NOISE_FLOOR_DBM, dbm)
+
+
+def center_mhz(channel) -> np.ndarray:
+    ch = np.asarray(channel, dtype=np.float64)
+    return np.where(ch == 14, 2484.0, np.where(ch <= 14, 2407.0 + 5 * ch, 5000.0 + 5 * ch))
+
+
+def spans(channel, width_5ghz: int = 80):
+    """(inicio, fin) en MHz del tramo ocupado por una red en ``channel``."""
+    ch = np.asarray(channel, dtype=np.float64)
+    center = center_mhz(ch)
+    is5 = ch > 14
+    # Bloques alineados de 5 GHz: 36-48, 52-64... (80 MHz) empiezan en 5170 + k*width
+    width5 = float(width_5ghz)
+    lo5 = 5170.0 + np.floor((center - 10.0 - 5170.0) / width5) * width5
+    lo = np.where(is5, lo5, center - 10.0)
+    hi = np.where(is5, lo5 + width5, center + 10.0)
+    # 5 GHz 149-165 (UNII-3) arranca en 5735
+    unii3 = is5 & (ch >= 149)
+    lo3 = 5735.0 + np.floor((center - 10.0 - 5735.0) / width5) * width5
+    lo = np.where(unii3, lo3, lo)
+    hi = np.where(unii3, lo3 + width5, hi)
+    return lo, hi
+
+
+def _overlap(lo_a, hi_a, lo_b, hi_b) -> np.ndarray:
+    """Fracción del tramo b cubierta por cada tramo a: matriz (len(a), len(b))."""
+    inter = np.minimum(hi_a[:, None], hi_b[None, :]) - np.maximum(lo_a[:, None], lo_b[None, :])
+    return np.clip(inter, 0.0, None) / (hi_b - lo_b)[None, :]
+
+
+def score_channels(channels, signals, scan_ids=None, width_5ghz: int = 80,
+                   avoid_dfs: bool = False) -> Dict:
+    """Puntajes por canal candidato y canal recomendado por banda.
+
+    ``channels``/``signals`` son las redes observadas y ``scan_ids`` el
+    escaneo al que pertenece cada una (None = un solo escaneo).
+    """
+    candidates = np.concatenate([CHANNELS_24, CHANNELS_5])
+    k = len(candidates)
+    ch = np.asarray(channels, dtype=np.int64)
+    valid = np.isin(ch, candidates)
+    idx = np.searchsorted(candidates, ch[valid])
+    dbm = signal_to_dbm(np.asarray(signals, dtype=np.float64)[valid])
+    if scan_ids is None:
+        scans = np.zeros(len(idx), dtype=np.int64)
+    else:
+        _, scans = np.unique(np.asarray(scan_ids)[valid], return_inverse=True)
+        scans = scans.reshape(-1)
+    n_scans = int(scans.max()) + 1 if len(scans) else 0
+
+    # La superposición solo depende del canal: tabla (canal de la red, candidato)
+    lo, hi = spans(candidates, width_5ghz)
+    overlap = _overlap(lo, hi, lo, hi)
+    weight = np.clip((dbm - NOISE_FLOOR_DBM) / (STRONG_DBM - NOISE_FLOOR_DBM), 0.0, 1.0)
+    congestion = peak = power = count = np.zeros(k)
+    if n_scans:
+        # Peso sumado por (escaneo, canal) y producto con la tabla: (escaneos, candidatos)
+        per_scan = np.bincount(scans * k + idx, weights=weight, minlength=n_scans * k).reshape(n_scans, k) @ overlap
+        congestion, peak = per_scan.mean(axis=0), per_scan.max(axis=0)
+        power = np.bincount(idx, weights=10.0 ** (dbm / 10.0), minlength=k) @ overlap / n_scans
+        count = np.bincount(idx, minlength=k) @ (overlap > 0) / n_scans
+    interference = 10.0 * np.log10(np.maximum(power, 10.0 ** (NOISE_FLOOR_DBM / 10.0)))
+
+    rows: List[Dict] = []
+    for i, c in enumerate(candidates.tolist()):
+        rows.append({
+            'channel': c,
+            'band': '2.4' if c <= 14 else '5',
+            'congestion': round(float(congestion[i]), 3),
+            'congestion_peak': round(float(peak[i]), 3),
+            'interference_dbm': round(float(interference[i]), 1),
+            'networks': round(float(count[i]), 2),
+            'dfs': DFS_5[0] <= c <= DFS_5[1],
+        })
+    return {
+        'scans': n_scans,
+        'observations': int(len(idx)),
+        'width_5ghz': width_5ghz,
+        'channels': rows,
+        'best': {'2.4': _best(rows, RECOMMENDED_24), '5': _best(rows, None, avoid_dfs)},
+    }
+
+
+def _best(rows: List[Dict], allowed: Optional[Iterable[int]], avoid_dfs: bool = False) -> Optional[int]:
+    band = '2.4' if allowed is not None else '5'
+    pool = [r for r in rows if r['band'] == band
+            and (allowed is None or r['channel'] in allowed)
+            and not (avoid_dfs and r['dfs'])]
+    if not pool:
+        return None
+    # Menor congestión; a igualdad, menor interferencia y canal más bajo
+    return min(pool, key=lambda r: (r['congestion'], r['interference_dbm'], r['channel']))['channel']
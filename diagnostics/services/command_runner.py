@@ -0,0 +1,60 @@
+"""Ejecución concurrente de comandos de diagnóstico.
+
+Cada comando corre en su propio hilo con su timeout y los resultados se
+entregan a medida que terminan: la latencia total es la del comando más
+lento, no la suma, y la página puede mostrar cada salida apenas está lista.
+"""
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# (título, argv)
+Command = Tuple[str, Sequence[str]]
+
+
+def run_command(title: str, argv: Sequence[str], timeout: float = 8.0) -> Dict:
+    """Corre ``argv`` y devuelve ``{title, cmd, output, ok, timed_out, elapsed_ms}``.
+
+    Los errores (binario inexistente, código distinto de 0, timeout) no se
+    lanzan: quedan en ``output`` como ``<error> ...``, igual que antes.
+    """
+    started = time.perf_counter()
+    ok, timed_out = False, False
+    try:
+        out = subprocess.check_output(list(argv), text=True, encoding='utf-8', errors='ignore',
+                                      timeout=timeout, stderr=subprocess.DEVNULL)
+        output, ok = out.strip(), True
+    except subprocess.TimeoutExpired:
+        output, timed_out = f"<error> sin respuesta en {timeout:g} s", True
+    except Exception as e:
+        output = f"<error> {e}"
+    return {
+        'title': title,
+        'cmd': ' '.join(argv),
+        'output': output,
+        'ok': ok,
+        'timed_out': timed_out,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def run_concurrently(commands: List[Command], timeout: float = 8.0) -> Iterator[Dict]:
+    """Resultados de ``commands`` en orden de finalización; cada uno lleva
+    ``index`` (su posición en ``commands``).
+
+    Si quien consume deja de iterar (cliente desconectado) se cancelan los
+    comandos que no arrancaron; los que ya corren terminan por su timeout.
+    """
+    if not commands:
+        return
+    pool = ThreadPoolExecutor(max_workers=len(commands), thread_name_prefix='diag-cmd')
+    try:
+        futures = {pool.submit(run_command, title, argv, timeout): i
+                   for i, (title, argv) in enumerate(commands)}
+        for fut in as_completed(futures):
+            result = fut.result()
+            result['index'] = futures[fut]
+            yield result
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
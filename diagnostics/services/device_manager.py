@@ -7,9 +7,18 @@ class DeviceManager:
     def __init__(self):
         pass
     
-    def get_network_usage(self) -> Dict[str, float]:
-        """Obtiene el uso actual de la red"""
-        net_io = psutil.net_io_counters()
+    def get_network_usage(self, pernic: bool = False) -> Dict:
+        """Obtiene el uso actual de la red (acumulado; por interfaz con ``pernic``).
+
+        Por interfaz los contadores van crudos (pueden dar la vuelta): las
+        tasas las calcula services/interface_rates.py.
+        """
+        if pernic:
+            return {nic: self._counters(c) for nic, c in psutil.net_io_counters(pernic=True, nowrap=False).items()}
+        return self._counters(psutil.net_io_counters())
+
+    @staticmethod
+    def _counters(net_io) -> Dict[str, float]:
         return {
             "bytes_sent": net_io.bytes_sent,
             "bytes_recv": net_io.bytes_recv,
@@ -17,21 +26,17 @@ class DeviceManager:
             "packets_recv": net_io.packets_recv
         }
     
-    def get_processes_network_usage(self) -> List[Dict]:
-        """Obtiene el uso de red por proceso"""
-        processes = []
-        
-        for proc in psutil.process_iter(['pid', 'name', 'memory_info']):
-            try:
-                io_counters = proc.io_counters()
-                if io_counters:
-                    processes.append({
-                        "pid": proc.info['pid'],
-                        "name": proc.info['name'],
-                        "read_bytes": io_counters.read_bytes,
-                        "write_bytes": io_counters.write_bytes
-                    })
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                pass
-        
-        return sorted(processes, key=lambda x: x['read_bytes'] + x['write_bytes'], reverse=True)[:10]
\ No newline at end of file
+    def get_processes_network_usage(self, top: int = 10, duration_sec: float = 2.0) -> List[Dict]:
+        """Procesos con más tráfico de red (bytes in/out atribuidos por socket).
+
+        Con el colector de tráfico en marcha se leen sus acumulados; si no, se
+        captura ``duration_sec`` segundos. Sin permisos de captura devuelve [].
+        """
+        from .process_attribution import get_process_traffic, sample
+        from .traffic_collector import get_collector
+        if get_collector().running and get_collector().on_packets is not None:
+            return get_process_traffic().top(top)
+        try:
+            return sample(duration_sec).top(top)
+        except OSError:
+            return []
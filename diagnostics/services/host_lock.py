@@ -0,0 +1,59 @@
+"""Un solo proceso por equipo para las tareas de fondo.
+
+Con varios workers (gunicorn, uvicorn) ``apps.ready`` corre en cada uno, pero
+lo que captura o mide la red del equipo tiene que correr una sola vez: si no,
+cada worker guarda las mismas muestras. ``acquire(name)`` toma un lock
+exclusivo y no bloqueante sobre ``<directorio>/<name>.lock`` y lo mantiene
+abierto mientras viva el proceso. El sistema operativo lo libera cuando el
+proceso termina, así que un worker que muere no deja el lock tomado.
+"""
+import os
+import tempfile
+import threading
+from typing import IO, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+    import msvcrt
+
+_held: Dict[str, IO] = {}
+_lock = threading.Lock()
+
+
+def _try_lock(fh: IO) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def acquire(name: str, directory: Optional[str] = None) -> bool:
+    """True si este proceso es (o pasa a ser) el dueño de ``name`` en el equipo."""
+    with _lock:
+        if name in _held:
+            return True
+        directory = str(directory or tempfile.gettempdir())
+        os.makedirs(directory, exist_ok=True)
+        fh = open(os.path.join(directory, f'{name}.lock'), 'a+')
+        if not _try_lock(fh):
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(os.getpid()))
+        fh.flush()
+        _held[name] = fh
+        return True
+
+
+def release(name: str) -> None:
+    with _lock:
+        fh = _held.pop(name, None)
+    if fh is not None:
+        fh.close()  # cerrar el descriptor libera el lock
@@ -0,0 +1,110 @@
+import math
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+UNKNOWN = "Unknown"
+
+
+def _reverse_lookup(ip: str) -> str:
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except Exception:
+        return ""
+
+
+class HostnameResolver:
+    """Resolución inversa (PTR) concurrente con caché TTL en memoria.
+
+    Los nombres resueltos se guardan ``ttl`` segundos; los fallos se guardan
+    como "Unknown" durante ``negative_ttl`` para no reintentar en cada escaneo.
+    ``lookup`` permite reemplazar la consulta (por defecto ``gethostbyaddr``).
+    """
+
+    def __init__(self, ttl: float = 3600.0, negative_ttl: float = 300.0,
+                 timeout: float = 2.0, max_workers: int = 16,
+                 lookup: Callable[[str], str] = _reverse_lookup):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.lookup = lookup
+        self._cache: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rdns")
+
+    def _lookup(self, ip: str) -> str:
+        try:
+            name = self.lookup(ip)
+        except Exception:
+            name = ""
+        name = name or UNKNOWN
+        expires = time.monotonic() + (self.negative_ttl if name == UNKNOWN else self.ttl)
+        with self._lock:
+            self._cache[ip] = (name, expires)
+            self._inflight.pop(ip, None)
+        return name
+
+    def cached(self, ip: str) -> Optional[str]:
+        """Nombre en caché si no expiró, o None."""
+        with self._lock:
+            entry = self._cache.get(ip)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def resolve(self, ip: str) -> str:
+        return self.resolve_many([ip]).get(ip, "")
+
+    def resolve_many(self, ips: Iterable[str]) -> Dict[str, str]:
+        """Resuelve un lote de IPs en paralelo; solo consulta las que no están en caché.
+
+        ``gethostbyaddr`` no admite timeout, así que el lote tiene un único
+        plazo: ``timeout`` por cada tanda de ``max_workers`` consultas (60 IPs
+        con 16 workers esperan hasta 4 × timeout). Las consultas que no
+        terminan a tiempo devuelven "" (desconocido todavía, distinto del
+        "Unknown" de un fallo real); siguen en curso y su resultado queda en
+        caché para el próximo escaneo. Una IP ya en vuelo no se consulta dos
+        veces, de modo que las consultas colgadas no acaparan los workers.
+        """
+        out: Dict[str, str] = {}
+        pending: Dict[Future, str] = {}
+        for ip in dict.fromkeys(ips):
+            if not ip:
+                continue
+            name = self.cached(ip)
+            if name is not None:
+                out[ip] = name
+                continue
+            with self._lock:
+                fut = self._inflight.get(ip)
+                if fut is None:
+                    fut = self._executor.submit(self._lookup, ip)
+                    self._inflight[ip] = fut
+            pending[fut] = ip
+        if pending:
+            waves = math.ceil(len(pending) / max(1, self.max_workers))
+            done, _ = wait(pending, timeout=self.timeout * waves)
+            for fut, ip in pending.items():
+                out[ip] = fut.result() if fut in done else ""
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+_default_resolver: Optional[HostnameResolver] = None
+_default_lock = threading.Lock()
+
+
+def get_resolver() -> HostnameResolver:
+    """Instancia compartida por proceso, para que la caché sobreviva entre escaneos."""
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            _default_resolver = HostnameResolver()
+        return _default_resolver
@@ -0,0 +1,188 @@
+"""Tasas por interfaz de red muestreadas en segundo plano.
+
+``InterfaceRates`` lee cada ``interval`` segundos (0.1 a 10) los contadores
+de bytes de cada NIC (``DeviceManager.get_network_usage(pernic=True)``), calcula
+la diferencia con la lectura anterior y guarda bytes/s en un buffer circular
+de tamaño fijo por interfaz. Los contadores de 32 bits que dan la vuelta se
+corrigen; un contador que vuelve atrás por otro motivo (reinicio de la
+interfaz) cuenta como 0 en ese intervalo.
+
+Cada muestra es una llamada a psutil y unas asignaciones en arrays ya
+reservados, así que puede quedar corriendo siempre en un equipo chico.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+MIN_INTERVAL = 0.1
+MAX_INTERVAL = 10.0
+_WRAP_32 = 2 ** 32
+_WRAP_64 = 2 ** 64
+
+
+def counter_delta(prev: int, cur: int) -> int:
+    """Diferencia entre lecturas de un contador que puede dar la vuelta (32 o 64 bits)."""
+    if cur >= prev:
+        return cur - prev
+    modulus = _WRAP_32 if prev < _WRAP_32 else _WRAP_64
+    delta = cur + modulus - prev
+    # Una "vuelta" de más de medio rango es en realidad un reinicio del contador
+    return delta if delta < modulus // 2 else 0
+
+
+class _Ring:
+    """Bytes/s recibidos y enviados de una interfaz, con su instante."""
+
+    __slots__ = ('t', 'rx', 'tx', 'pos', 'count')
+
+    def __init__(self, size: int):
+        self.t = np.zeros(size, dtype=np.float64)
+        self.rx = np.zeros(size, dtype=np.float64)
+        self.tx = np.zeros(size, dtype=np.float64)
+        self.pos = 0
+        self.count = 0
+
+    def add(self, t: float, rx: float, tx: float) -> None:
+        i = self.pos
+        self.t[i], self.rx[i], self.tx[i] = t, rx, tx
+        self.pos = (i + 1) % len(self.t)
+        self.count = min(self.count + 1, len(self.t))
+
+    def ordered(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        idx = (np.arange(self.count) + self.pos - self.count) % len(self.t)
+        return self.t[idx], self.rx[idx], self.tx[idx]
+
+
+def _pernic_counters() -> Dict[str, Tuple[int, int]]:
+    from .device_manager import DeviceManager
+    return {nic: (c['bytes_recv'], c['bytes_sent'])
+            for nic, c in DeviceManager().get_network_usage(pernic=True).items()}
+
+
+class InterfaceRates:
+    """Muestreador de tasas por NIC con historial en buffers circulares.
+
+    - ``sample()`` toma una lectura (lo llama el hilo; útil en tests).
+    - ``current()`` devuelve la última tasa de cada interfaz.
+    - ``history(seconds)`` devuelve las series de las interfaces.
+    """
+
+    def __init__(self, interval: float = 1.0, history: int = 600,
+                 counters: Callable[[], Dict[str, Tuple[int, int]]] = _pernic_counters,
+                 clock: Callable[[], float] = time.time):
+        if not MIN_INTERVAL <= interval <= MAX_INTERVAL:
+            raise ValueError(f'interval debe estar entre {MIN_INTERVAL} y {MAX_INTERVAL} segundos')
+        self.interval = float(interval)
+        self.size = max(2, int(history))
+        self._counters = counters
+        self._clock = clock
+        self._prev: Dict[str, Tuple[float, int, int]] = {}
+        self._rings: Dict[str, _Ring] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def sample(self) -> None:
+        counters = self._counters()
+        now = self._clock()
+        with self._lock:
+            for nic, (rx, tx) in counters.items():
+                prev = self._prev.get(nic)
+                self._prev[nic] = (now, rx, tx)
+                if prev is None or now <= prev[0]:
+                    continue
+                elapsed = now - prev[0]
+                ring = self._rings.get(nic)
+                if ring is None:
+                    ring = self._rings[nic] = _Ring(self.size)
+                ring.add(now, counter_delta(prev[1], rx) / elapsed, counter_delta(prev[2], tx) / elapsed)
+            # Interfaces que desaparecieron (USB, VPN): se descarta su lectura, no su historial
+            for nic in self._prev.keys() - counters.keys():
+                del self._prev[nic]
+            self.samples += 1
+
+    def current(self) -> Dict[str, Dict[str, float]]:
+        """Última tasa por interfaz, en bytes/s y Mbps."""
+        out = {}
+        with self._lock:
+            for nic, ring in self._rings.items():
+                if not ring.count:
+                    continue
+                i = (ring.pos - 1) % self.size
+                out[nic] = _rates(ring.t[i], ring.rx[i], ring.tx[i])
+        return out
+
+    def history(self, seconds: Optional[float] = None, nic: Optional[str] = None) -> Dict[str, Dict[str, list]]:
+        """Series ``{nic: {t, rx_mbps, tx_mbps}}`` de los últimos ``seconds`` (todo el buffer si None)."""
+        out = {}
+        with self._lock:
+            rings = {nic: self._rings[nic]} if nic in self._rings else ({} if nic else dict(self._rings))
+            data = {name: ring.ordered() for name, ring in rings.items()}
+        since = self._clock() - seconds if seconds else None
+        for name, (t, rx, tx) in data.items():
+            if since is not None:
+                keep = t >= since
+                t, rx, tx = t[keep], rx[keep], tx[keep]
+            out[name] = {
+                't': np.round(t, 3).tolist(),
+                'rx_mbps': np.round(rx * 8 / 1e6, 3).tolist(),
+                'tx_mbps': np.round(tx * 8 / 1e6, 3).tolist(),
+            }
+        return out
+
+    # --- Hilo -----------------------------------------------------------------
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="interface-rates", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        # Plazos fijos: el tiempo de cada lectura no se acumula como deriva
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Interface rates error: {e}")
+            deadline += self.interval
+            delay = deadline - time.monotonic()
+            if delay < 0:  # atrasado (equipo suspendido): se retoma desde ahora
+                deadline, delay = time.monotonic(), 0
+            self._stop.wait(delay)
+
+
+def _rates(t: float, rx: float, tx: float) -> Dict[str, float]:
+    return {
+        't': round(float(t), 3),
+        'rx_bps': round(float(rx), 1),
+        'tx_bps': round(float(tx), 1),
+        'rx_mbps': round(float(rx) * 8 / 1e6, 3),
+        'tx_mbps': round(float(tx) * 8 / 1e6, 3),
+    }
+
+
+_sampler: Optional[InterfaceRates] = None
+_sampler_lock = threading.Lock()
+
+
+def get_interface_rates(**kwargs) -> InterfaceRates:
+    """Muestreador compartido por el proceso; ``kwargs`` solo se aplican en la primera llamada."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = InterfaceRates(**kwargs)
+        return _sampler
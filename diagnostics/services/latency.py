@@ -0,0 +1,334 @@
+"""Latencia, jitter y pérdida hacia varios destinos a la vez (asyncio).
+
+``LatencyProber`` envía ``count`` sondas a cada destino (gateway, DNS, hosts
+de la LAN...) cada ``interval`` segundos, todos en paralelo en un solo event
+loop, y resume cada destino con min/avg/p50/p95/p99, jitter (variación media
+entre RTT consecutivos, como RFC 3550) y porcentaje de pérdida.
+
+Método por sonda:
+
+- ``icmp``: echo por un único socket compartido (ping sin privilegios
+  SOCK_DGRAM o raw si corre como root);
+- ``tcp``: tiempo de conexión a un puerto (SYN-ACK o RST cuentan igual);
+- ``udp``: datagrama a un puerto cerrado y espera del "port unreachable".
+
+Con ``method="auto"`` se usa ICMP si el sistema lo permite y TCP si no. Un
+destino ``host:puerto`` siempre se mide con TCP a ese puerto.
+
+``LatencyMonitor`` repite rondas cortas en un hilo propio y guarda las
+últimas ``window`` muestras por destino, para tener jitter/pérdida
+continuos con poco costo.
+"""
+import asyncio
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .network_scanner import _UDP_PROBE_PORT, _icmp_echo, _open_icmp_socket
+
+DEFAULT_TCP_PORT = 443
+PUBLIC_TARGET = "8.8.8.8"
+
+
+# --- Destinos por defecto ----------------------------------------------------
+
+def default_gateway(route_path: str = "/proc/net/route") -> Optional[str]:
+    """Gateway IPv4 por defecto según la tabla de rutas del kernel (Linux)."""
+    try:
+        with open(route_path, encoding="ascii", errors="ignore") as fh:
+            next(fh, None)
+            for line in fh:
+                cols = line.split()
+                # destino 0.0.0.0 con la bandera RTF_GATEWAY (0x2)
+                if len(cols) >= 4 and cols[1] == "00000000" and int(cols[3], 16) & 0x2:
+                    return socket.inet_ntoa(struct.pack("<I", int(cols[2], 16)))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def dns_servers(resolv_path: str = "/etc/resolv.conf") -> List[str]:
+    servers = []
+    try:
+        with open(resolv_path, encoding="utf-8", errors="ignore") as fh:
+            for line in fh:
+                cols = line.split()
+                if len(cols) >= 2 and cols[0] == "nameserver" and "." in cols[1]:
+                    servers.append(cols[1])
+    except OSError:
+        pass
+    return servers
+
+
+def default_targets(public: bool = True) -> List[str]:
+    """Gateway, servidores DNS del sistema y (con ``public``) un destino público, sin repetir."""
+    targets = [t for t in [default_gateway(), *dns_servers(), PUBLIC_TARGET if public else None] if t]
+    return list(dict.fromkeys(targets))
+
+
+def parse_target(target: str) -> Tuple[str, Optional[int]]:
+    """``"host"`` -> (host, None); ``"host:443"`` -> (host, 443)."""
+    host, sep, port = target.rpartition(":")
+    if sep and port.isdigit() and host:
+        return host, int(port)
+    return target, None
+
+
+# --- Estadísticas ------------------------------------------------------------
+
+def summarize(rtts: Iterable[Optional[float]]) -> Dict:
+    """Resumen de una serie de RTT en ms (None = sonda perdida)."""
+    series = list(rtts)
+    got = np.array([r for r in series if r is not None], dtype=np.float64)
+    sent = len(series)
+    out: Dict = {
+        "sent": sent,
+        "received": int(got.size),
+        "loss_pct": round(100.0 * (sent - got.size) / sent, 1) if sent else 0.0,
+    }
+    if not got.size:
+        out.update(dict.fromkeys(("min", "avg", "p50", "p95", "p99", "max", "jitter"), None))
+        return out
+    p50, p95, p99 = np.percentile(got, [50, 95, 99])
+    out.update({
+        "min": round(float(got.min()), 2),
+        "avg": round(float(got.mean()), 2),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(got.max()), 2),
+        # Variación media entre respuestas consecutivas
+        "jitter": round(float(np.abs(np.diff(got)).mean()), 2) if got.size > 1 else 0.0,
+    })
+    return out
+
+
+# --- Sondas ------------------------------------------------------------------
+
+class _IcmpPinger:
+    """Un socket ICMP para todas las sondas; las respuestas se reparten por (IP, seq)."""
+
+    def __init__(self, sock: socket.socket, raw: bool):
+        self.sock = sock
+        self.raw = raw
+        self.ident = os.getpid() & 0xFFFF
+        self._seq = 0
+        self._waiting: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+
+    def close(self) -> None:
+        self._loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except OSError:
+                return
+            if self.raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8 or data[0] != 0:  # 0 = echo reply
+                continue
+            ident, seq = struct.unpack("!HH", data[4:8])
+            # Con SOCK_DGRAM el kernel reescribe el identificador
+            if self.raw and ident != self.ident:
+                continue
+            fut = self._waiting.pop((addr[0], seq), None)
+            if fut is not None and not fut.done():
+                fut.set_result(time.monotonic())
+
+    async def ping(self, ip: str, timeout: float) -> Optional[float]:
+        self._seq = (self._seq + 1) & 0xFFFF
+        key = (ip, self._seq)
+        fut = self._loop.create_future()
+        self._waiting[key] = fut
+        start = time.monotonic()
+        try:
+            self.sock.sendto(_icmp_echo(self.ident, self._seq), (ip, 0))
+            end = await asyncio.wait_for(fut, timeout)
+            return round((end - start) * 1000, 3)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self._waiting.pop(key, None)
+
+
+async def tcp_rtt(ip: str, port: int, timeout: float) -> Optional[float]:
+    """Tiempo hasta el SYN-ACK (o RST) en ms; None si no hubo respuesta."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    start = time.monotonic()
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+    except ConnectionRefusedError:
+        pass
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        sock.close()
+    return round((time.monotonic() - start) * 1000, 3)
+
+
+async def udp_rtt(ip: str, timeout: float, port: int = _UDP_PROBE_PORT) -> Optional[float]:
+    """Tiempo hasta el "port unreachable" de un puerto UDP cerrado, en ms."""
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    start = time.monotonic()
+    try:
+        sock.connect((ip, port))
+        sock.send(b"")
+        await asyncio.wait_for(loop.sock_recv(sock, 1), timeout)
+    except ConnectionRefusedError:
+        pass
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        sock.close()
+    return round((time.monotonic() - start) * 1000, 3)
+
+
+class LatencyProber:
+    def __init__(self, targets: Optional[Iterable[str]] = None, count: int = 20, interval: float = 0.05,
+                 timeout: float = 1.0, method: str = "auto", tcp_port: int = DEFAULT_TCP_PORT):
+        if method not in ("auto", "icmp", "tcp", "udp"):
+            raise ValueError(f"Método desconocido: {method}")
+        self.targets = list(targets) if targets else default_targets()
+        self.count = max(1, int(count))
+        self.interval = interval
+        self.timeout = timeout
+        self.method = method
+        self.tcp_port = tcp_port
+
+    def probe(self) -> Dict[str, Dict]:
+        """Versión síncrona de ``probe_async`` (crea su propio event loop)."""
+        return asyncio.run(self.probe_async())
+
+    async def probe_async(self) -> Dict[str, Dict]:
+        samples = await self.sample_async()
+        return {target: {"method": method, **summarize(rtts)} for target, (method, rtts) in samples.items()}
+
+    async def sample_async(self) -> Dict[str, Tuple[str, List[Optional[float]]]]:
+        """RTT crudos por destino: {destino: (método, [ms o None, ...])}."""
+        pinger = None
+        if self.method in ("auto", "icmp"):
+            sock, raw = _open_icmp_socket()
+            if sock is not None:
+                pinger = _IcmpPinger(sock, raw)
+        try:
+            results = await asyncio.gather(*(self._sample_target(t, pinger) for t in self.targets))
+        finally:
+            if pinger is not None:
+                pinger.close()
+        return dict(zip(self.targets, results))
+
+    def _method_for(self, port: Optional[int], pinger) -> str:
+        if port is not None:
+            return "tcp"
+        if self.method == "auto":
+            return "icmp" if pinger is not None else "tcp"
+        if self.method == "icmp" and pinger is None:
+            return "tcp"  # sin permisos para ICMP
+        return self.method
+
+    async def _sample_target(self, target: str, pinger) -> Tuple[str, List[Optional[float]]]:
+        host, port = parse_target(target)
+        method = self._method_for(port, pinger)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET)
+            ip = infos[0][4][0]
+        except (OSError, IndexError):
+            return method, [None] * self.count
+        if method == "icmp":
+            one = lambda: pinger.ping(ip, self.timeout)
+        elif method == "tcp":
+            one = lambda: tcp_rtt(ip, port or self.tcp_port, self.timeout)
+        else:
+            one = lambda: udp_rtt(ip, self.timeout)
+        # Las sondas salen cada ``interval`` sin esperar la respuesta anterior
+        tasks = []
+        for i in range(self.count):
+            if i:
+                await asyncio.sleep(self.interval)
+            tasks.append(asyncio.ensure_future(one()))
+        return method, list(await asyncio.gather(*tasks))
+
+
+class LatencyMonitor:
+    """Rondas periódicas de ``prober`` en segundo plano con ventana deslizante."""
+
+    def __init__(self, prober: LatencyProber, period: float = 10.0, window: int = 360):
+        self.prober = prober
+        self.period = period
+        self.window = window
+        self._samples: Dict[str, Deque[Optional[float]]] = {}
+        self._methods: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rounds = 0
+        self.last_round: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def record(self, samples: Dict[str, Tuple[str, List[Optional[float]]]]) -> None:
+        with self._lock:
+            for target, (method, rtts) in samples.items():
+                self._samples.setdefault(target, deque(maxlen=self.window)).extend(rtts)
+                self._methods[target] = method
+            self.rounds += 1
+            self.last_round = time.time()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Resumen de la ventana actual por destino."""
+        with self._lock:
+            data = {t: (self._methods.get(t), list(s)) for t, s in self._samples.items()}
+        return {t: {"method": m, **summarize(rtts)} for t, (m, rtts) in data.items()}
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="latency-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.record(loop.run_until_complete(self.prober.sample_async()))
+                except Exception as e:
+                    print(f"Latency monitor error: {e}")
+                self._stop.wait(self.period)
+        finally:
+            loop.close()
+
+
+_monitor: Optional[LatencyMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_latency_monitor(period: float = 10.0, window: int = 360, **prober_opts) -> LatencyMonitor:
+    """Monitor compartido por proceso; los argumentos solo aplican en la primera llamada."""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = LatencyMonitor(LatencyProber(**prober_opts), period=period, window=window)
+        return _monitor
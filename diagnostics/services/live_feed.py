@@ -0,0 +1,231 @@
+"""Canal de eventos en vivo (tasas de tráfico y altas/bajas de dispositivos).
+
+Un único productor por proceso alimenta a todos los clientes conectados:
+
+- un hilo lee cada ``interval`` segundos las tasas en memoria del colector de
+  tráfico (``traffic_collector``), sin lanzar capturas;
+- un listener de ``NeighborTable`` publica cada alta/baja de vecino.
+
+Cada cliente recibe una ``Subscription`` con una cola acotada: si un cliente
+lento se atrasa se descartan sus eventos más viejos, sin frenar al productor
+ni a los demás. El productor arranca con el primer suscriptor y se detiene
+cuando se va el último.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Fuente de tasas: () -> {ventana: [{ip, download_mbps, upload_mbps}]}, o None si no hay colector
+RatesSource = Callable[[], Optional[Dict[str, List[Dict]]]]
+
+
+def _collector_rates(top: int = 20) -> Optional[Dict[str, List[Dict]]]:
+    from .traffic_collector import get_collector
+    collector = get_collector()
+    if not collector.running:
+        return None
+    return collector.snapshot(top=top)
+
+
+class Subscription:
+    """Cola acotada de eventos de un cliente; se lee con ``get`` o ``aget``."""
+
+    def __init__(self, maxsize: int = 100, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._events: deque = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._loop = loop
+        self._wakeup = asyncio.Event() if loop is not None else None
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, event: Dict) -> None:
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+        self._wake()
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass  # el loop ya cerró (cliente desconectado)
+
+    def _pop_all(self) -> List[Dict]:
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+    def get(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Eventos pendientes; espera hasta ``timeout`` si no hay ninguno."""
+        with self._cond:
+            if not self._events and not self.closed:
+                self._cond.wait(timeout)
+            return self._pop_all()
+
+    async def aget(self, timeout: Optional[float] = None) -> List[Dict]:
+        """Como ``get`` pero sin bloquear el loop (requiere ``loop`` al crearla)."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            with self._cond:
+                if self._events or self.closed:
+                    return self._pop_all()
+                self._wakeup.clear()
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return []
+            try:
+                # Puede despertar por un aviso viejo: se vuelve a mirar la cola
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                return []
+
+
+class LiveFeed:
+    """Productor único que reparte eventos entre los suscriptores."""
+
+    def __init__(self, interval: float = 2.0, rates_source: RatesSource = _collector_rates,
+                 queue_size: int = 100, neighbor_table=None):
+        self.interval = interval
+        self.rates_source = rates_source
+        self.queue_size = queue_size
+        self._neighbor_table = neighbor_table
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        # Arranque y parada del productor: se decide con la lista vigente bajo este lock
+        self._lifecycle = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ids = itertools.count(1)
+        self.published = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscription:
+        sub = Subscription(self.queue_size, loop=loop)
+        with self._lock:
+            self._subscribers.append(sub)
+        self._sync()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        sub.close()
+        with self._lock:
+            try:
+                self._subscribers.remove(sub)
+            except ValueError:
+                return
+        self._sync()
+
+    def _sync(self) -> None:
+        """Deja el productor corriendo si hay suscriptores y detenido si no.
+
+        Se mira la lista recién con el lock tomado: un cliente que llega mientras
+        se va el último no queda con el productor detenido.
+        """
+        with self._lifecycle:
+            with self._lock:
+                wanted = bool(self._subscribers)
+            if wanted:
+                self._start()
+            else:
+                self._halt()
+
+    def publish(self, kind: str, data: Dict) -> Dict:
+        """Entrega ``{'id', 'type', 'ts', **data}`` a todos los suscriptores."""
+        event = {'id': next(self._ids), 'type': kind, 'ts': round(time.time(), 3), **data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.put(event)
+        self.published += 1
+        return event
+
+    # --- Fuentes ----------------------------------------------------------
+    def _on_neighbor(self, event: str, device: Dict) -> None:
+        self.publish('device', {'event': event, 'device': device})
+
+    def poll_traffic(self) -> Optional[Dict]:
+        """Publica las tasas actuales del colector por ventana (si está activo)."""
+        try:
+            windows = self.rates_source()
+        except Exception as e:
+            print(f"Live feed traffic error: {e}")
+            return None
+        if windows is None:
+            return None
+        return self.publish('traffic', {'windows': windows})
+
+    def _table(self):
+        if self._neighbor_table is None:
+            from . import neighbor_table
+            if not neighbor_table.is_supported():
+                return None
+            self._neighbor_table = neighbor_table.get_neighbor_table()
+        return self._neighbor_table
+
+    # --- Hilo productor -----------------------------------------------------
+    def start(self) -> None:
+        with self._lifecycle:
+            self._start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._lifecycle:
+            self._halt(timeout)
+
+    def _start(self) -> None:
+        if self.running:
+            if not self._stop.is_set():
+                return
+            self._thread.join()  # se estaba deteniendo (se fue el último cliente)
+        self._stop.clear()
+        table = self._table()
+        if table is not None:
+            table.add_listener(self._on_neighbor)
+        self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+        self._thread.start()
+
+    def _halt(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._neighbor_table is not None:
+            self._neighbor_table.remove_listener(self._on_neighbor)
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.poll_traffic()
+            self._stop.wait(self.interval)
+
+
+_feed: Optional[LiveFeed] = None
+_feed_lock = threading.Lock()
+
+
+def get_live_feed(**kwargs) -> LiveFeed:
+    """Canal compartido por proceso; ``kwargs`` solo aplican en la primera llamada."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = LiveFeed(**kwargs)
+        return _feed
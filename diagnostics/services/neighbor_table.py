@@ -0,0 +1,257 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+PROC_ARP = "/proc/net/arp"
+
+# ATF_COM: la entrada tiene dirección de enlace resuelta
+_ATF_COM = 0x02
+_EMPTY_MAC = "00:00:00:00:00:00"
+
+# Estados NUD que informa `ip monitor neigh`
+_NUD_STATES = {"REACHABLE", "STALE", "DELAY", "PROBE", "FAILED", "INCOMPLETE",
+               "PERMANENT", "NOARP", "NONE"}
+_GONE_STATES = {"FAILED", "INCOMPLETE"}
+_IPV4_RE = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
+
+NeighborListener = Callable[[str, Dict], None]
+
+
+def is_supported() -> bool:
+    return os.path.exists(PROC_ARP)
+
+
+def read_proc_arp(path: str = PROC_ARP) -> List[Dict]:
+    """Lee la tabla de vecinos IPv4 del kernel sin lanzar procesos."""
+    devices: List[Dict] = []
+    try:
+        with open(path, "r", encoding="ascii", errors="ignore") as fh:
+            next(fh, None)  # encabezado
+            for line in fh:
+                cols = line.split()
+                if len(cols) < 6:
+                    continue
+                ip, _hw_type, flags, mac, _mask, dev = cols[:6]
+                try:
+                    if not int(flags, 16) & _ATF_COM:
+                        continue
+                except ValueError:
+                    continue
+                if mac == _EMPTY_MAC:
+                    continue
+                devices.append({"ip": ip, "mac": mac, "hostname": "", "iface": dev})
+    except OSError as e:
+        print(f"Neighbor table read error: {e}")
+    return devices
+
+
+def parse_neigh_event(line: str) -> Optional[Dict]:
+    """Interpreta una línea de ``ip monitor neigh``.
+
+    Se procesa por tokens: prefijos ("Deleted", "miss"), la IP, ``dev X``,
+    ``lladdr Y`` y el estado al final; las banderas desconocidas
+    (``router``, ``extern_learn``, ``proxy``...) se ignoran.
+    Devuelve ``{"event": "add"|"remove", "ip", "mac", "iface", "state"}`` o None.
+    """
+    tokens = line.split()
+    if not tokens:
+        return None
+    deleted = False
+    ip = iface = mac = None
+    states = []
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok == "Deleted":
+            deleted = True
+        elif tok in ("dev", "lladdr") and i + 1 < len(tokens):
+            if tok == "dev":
+                iface = tokens[i + 1]
+            else:
+                mac = tokens[i + 1].lower()
+            i += 1
+        elif ip is None and _IPV4_RE.match(tok):
+            ip = tok
+        elif tok in _NUD_STATES:
+            states.append(tok)
+        i += 1
+    if ip is None or iface is None:
+        return None
+    gone = deleted or not mac or any(st in _GONE_STATES for st in states)
+    return {
+        "event": "remove" if gone else "add",
+        "ip": ip,
+        "mac": mac or "",
+        "iface": iface,
+        "state": " ".join(states),
+    }
+
+
+class NeighborTable:
+    """Tabla de dispositivos en memoria alimentada por el kernel.
+
+    - ``snapshot()`` recarga desde /proc/net/arp (instantáneo).
+    - ``start()`` se suscribe a ``ip monitor neigh`` y aplica altas/bajas de
+      forma incremental, resincronizando con /proc/net/arp cada
+      ``resync_interval`` segundos por si se perdió algún evento; si ``ip``
+      no está disponible, relee /proc/net/arp cada ``poll_interval``.
+    """
+
+    def __init__(self, proc_path: str = PROC_ARP, poll_interval: float = 5.0,
+                 resync_interval: float = 60.0):
+        self.proc_path = proc_path
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self._devices: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[NeighborListener] = []
+        self._thread: Optional[threading.Thread] = None
+        self._resync_thread: Optional[threading.Thread] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._stop = threading.Event()
+        self.version = 0
+        self.updated_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_listener(self, fn: NeighborListener) -> None:
+        """Registra ``fn(event, device)`` para cada alta ("add") o baja ("remove")."""
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn: NeighborListener) -> None:
+        try:
+            self._listeners.remove(fn)
+        except ValueError:
+            pass
+
+    def devices(self) -> List[Dict]:
+        with self._lock:
+            return [dict(d) for d in self._devices.values()]
+
+    def snapshot(self) -> List[Dict]:
+        """Sincroniza la tabla completa con /proc/net/arp y la devuelve."""
+        fresh = {d["ip"]: d for d in read_proc_arp(self.proc_path)}
+        with self._lock:
+            old = self._devices
+            added = [d for ip, d in fresh.items() if ip not in old or old[ip].get("mac") != d["mac"]]
+            removed = [d for ip, d in old.items() if ip not in fresh]
+            self._devices = fresh
+            self.updated_at = time.time()
+            if added or removed:
+                self.version += 1
+        for d in removed:
+            self._emit("remove", d)
+        for d in added:
+            self._emit("add", d)
+        return self.devices()
+
+    def apply_event(self, ev: Dict) -> bool:
+        """Aplica un evento de vecino; devuelve True si cambió la tabla."""
+        ip = ev["ip"]
+        with self._lock:
+            current = self._devices.get(ip)
+            if ev["event"] == "remove":
+                if current is None:
+                    return False
+                del self._devices[ip]
+                dev = current
+            else:
+                if current is not None and current.get("mac") == ev["mac"]:
+                    return False
+                dev = {"ip": ip, "mac": ev["mac"], "hostname": "", "iface": ev["iface"]}
+                self._devices[ip] = dev
+            self.version += 1
+            self.updated_at = time.time()
+        self._emit(ev["event"], dev)
+        return True
+
+    def _emit(self, event: str, device: Dict) -> None:
+        for fn in list(self._listeners):
+            try:
+                fn(event, dict(device))
+            except Exception as e:
+                print(f"Neighbor listener error: {e}")
+
+    # --- Modo streaming ---------------------------------------------------
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self.snapshot()
+        self._thread = threading.Thread(target=self._run, name="neighbor-monitor", daemon=True)
+        self._thread.start()
+        self._resync_thread = threading.Thread(target=self._resync_loop, name="neighbor-resync", daemon=True)
+        self._resync_thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        with self._lock:
+            proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
+        for thread in (self._thread, self._resync_thread):
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def _resync_loop(self) -> None:
+        while not self._stop.wait(self.resync_interval):
+            self.snapshot()
+
+    def _run(self) -> None:
+        ip_bin = shutil.which("ip")
+        while not self._stop.is_set():
+            if ip_bin:
+                try:
+                    self._follow_monitor(ip_bin)
+                except Exception as e:
+                    print(f"Neighbor monitor error: {e}")
+                if self._stop.is_set():
+                    break
+                # Resincronizar por si se perdieron eventos mientras no había monitor
+                self.snapshot()
+            else:
+                self.snapshot()
+            self._stop.wait(self.poll_interval)
+
+    def _follow_monitor(self, ip_bin: str) -> None:
+        proc = subprocess.Popen(
+            [ip_bin, "-4", "monitor", "neigh"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", errors="ignore", bufsize=1,
+        )
+        with self._lock:
+            self._proc = proc
+        if self._stop.is_set():
+            proc.terminate()
+        try:
+            for line in proc.stdout:
+                if self._stop.is_set():
+                    break
+                ev = parse_neigh_event(line)
+                if ev:
+                    self.apply_event(ev)
+        finally:
+            if proc.poll() is None:
+                proc.terminate()
+            proc.wait()
+            with self._lock:
+                self._proc = None
+
+
+_table: Optional[NeighborTable] = None
+_table_lock = threading.Lock()
+
+
+def get_neighbor_table() -> NeighborTable:
+    """Tabla compartida por proceso."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = NeighborTable()
+        return _table
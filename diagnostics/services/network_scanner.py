@@ -1,17 +1,335 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import struct
 import subprocess
 import platform
 import re
-from typing import List, Dict
+import time
+from typing import List, Dict, Iterable, Optional, Tuple
+
+import psutil
+
+from .hostname_resolver import HostnameResolver, get_resolver
+from .scan_cache import get_scan_cache
+from . import neighbor_table
+
+# Valores que las utilidades del sistema usan cuando no conocen el nombre
+_UNRESOLVED = ("", "?", "Unknown")
+
+
+def _merge_devices(base: List[Dict], extra: List[Dict]) -> List[Dict]:
+    """Une dos listas de dispositivos por IP, completando MAC/hostname faltantes"""
+    by_ip = {d["ip"]: d for d in base}
+    for d in extra:
+        cur = by_ip.get(d["ip"])
+        if cur is None:
+            by_ip[d["ip"]] = d
+            continue
+        for key in ("mac", "hostname"):
+            if not cur.get(key) and d.get(key):
+                cur[key] = d[key]
+    return list(by_ip.values())
+
+
+# --- Descubrimiento activo de hosts --------------------------------------
+
+# Puertos TCP habituales: un SYN-ACK o un RST prueban que el host existe
+DEFAULT_PROBE_PORTS = (80, 443, 22, 445)
+# Puerto UDP casi siempre cerrado: el "port unreachable" prueba que el host existe
+_UDP_PROBE_PORT = 33434
+
+
+# Interfaces de contenedores/VMs: no se barren salvo que ``per_subnet`` las pida
+VIRTUAL_IFACE_PREFIXES = ("docker", "br-", "veth", "virbr", "vmnet", "vboxnet", "lxcbr", "lxdbr",
+                          "podman", "cni")
+
+
+def local_subnets(min_prefix: int = 24, include_loopback: bool = False,
+                  configured: Iterable[str] = ()) -> List[ipaddress.IPv4Network]:
+    """Subredes IPv4 locales según ``psutil.net_if_addrs()``.
+
+    Las redes más grandes que ``/min_prefix`` se recortan al ``/min_prefix``
+    que contiene la dirección local (un /16 son 65.534 sondas). Si una red de
+    ``configured`` (las claves de ``per_subnet``) contiene la dirección de la
+    interfaz se barre esa red tal cual; las interfaces virtuales
+    (``VIRTUAL_IFACE_PREFIXES``) solo se barren en ese caso.
+    """
+    wanted = [ipaddress.ip_network(str(c), strict=False) for c in configured]
+    nets: List[ipaddress.IPv4Network] = []
+    for name, if_addrs in psutil.net_if_addrs().items():
+        virtual = name.startswith(VIRTUAL_IFACE_PREFIXES)
+        for addr in if_addrs:
+            if getattr(addr, 'family', None) != socket.AF_INET or not addr.address or not addr.netmask:
+                continue
+            try:
+                iface = ipaddress.IPv4Interface(f"{addr.address}/{addr.netmask}")
+            except ValueError:
+                continue
+            if iface.ip.is_link_local or (iface.ip.is_loopback and not include_loopback):
+                continue
+            match = next((w for w in wanted if w.version == 4 and iface.ip in w), None)
+            if match is not None:
+                net = match
+            elif virtual:
+                continue
+            else:
+                if iface.network.prefixlen < min_prefix:
+                    iface = ipaddress.IPv4Interface(f"{addr.address}/{min_prefix}")
+                net = iface.network
+            if net.prefixlen >= 31:
+                continue
+            if net not in nets:
+                nets.append(net)
+    return nets
+
+
+def _local_addresses() -> set:
+    out = set()
+    for if_addrs in psutil.net_if_addrs().values():
+        for addr in if_addrs:
+            if getattr(addr, 'family', None) == socket.AF_INET and addr.address:
+                out.add(addr.address)
+    return out
+
+
+def _icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_echo(ident: int, seq: int) -> bytes:
+    header = struct.pack("!BBHHH", 8, 0, 0, ident, seq)
+    payload = b"wifiscan"
+    csum = _icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", 8, 0, csum, ident, seq) + payload
+
+
+def _open_icmp_socket() -> Tuple[Optional[socket.socket], bool]:
+    """Socket ICMP si hay permisos: ping sin privilegios (SOCK_DGRAM) o raw (root)."""
+    for kind in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+        try:
+            sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+        except OSError:
+            continue
+        sock.setblocking(False)
+        return sock, kind == socket.SOCK_RAW
+    return None, False
+
+
+class HostDiscovery:
+    """Barrido concurrente de subredes sin utilidades externas.
+
+    Para cada subred se envía primero un ICMP echo a todos los hosts desde un
+    único socket (si hay permisos); los que no responden se sondean con
+    conexiones TCP a ``ports`` y un datagrama UDP, con a lo sumo
+    ``concurrency`` hosts en vuelo. Un RST o un "port unreachable" también
+    cuentan como host vivo. Al final se suman las entradas de la tabla ARP
+    dentro de la subred (hosts que respondieron a ARP pero filtran todo).
+
+    ``per_subnet`` permite ajustar ``timeout``/``concurrency`` por CIDR, p. ej.
+    ``{"10.0.0.0/22": {"timeout": 1.0, "concurrency": 64}}``.
+    """
+
+    def __init__(self, timeout: float = 1.0, concurrency: int = 128,
+                 ports: Iterable[int] = DEFAULT_PROBE_PORTS, icmp: bool = True,
+                 udp: bool = True, per_subnet: Optional[Dict[str, Dict]] = None):
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.ports = tuple(ports)
+        self.icmp = icmp
+        self.udp = udp
+        self.per_subnet = {str(ipaddress.ip_network(k, strict=False)): v for k, v in (per_subnet or {}).items()}
+
+    def discover(self, subnets: Optional[Iterable] = None) -> List[Dict]:
+        """Versión síncrona de ``discover_async`` (crea su propio event loop)."""
+        return asyncio.run(self.discover_async(subnets))
+
+    async def discover_async(self, subnets: Optional[Iterable] = None) -> List[Dict]:
+        nets = [ipaddress.ip_network(str(n), strict=False)
+                for n in (subnets or local_subnets(configured=self.per_subnet))]
+        own = _local_addresses()
+        results = await asyncio.gather(*(self._sweep(net, own) for net in nets))
+        found: Dict[str, Dict] = {}
+        for chunk in results:
+            for d in chunk:
+                found.setdefault(d["ip"], d)
+        return list(found.values())
+
+    async def _sweep(self, net: ipaddress.IPv4Network, own: set) -> List[Dict]:
+        opts = self.per_subnet.get(str(net), {})
+        timeout = float(opts.get("timeout", self.timeout))
+        concurrency = max(1, int(opts.get("concurrency", self.concurrency)))
+        hosts = [str(h) for h in net.hosts() if str(h) not in own]
+        alive: Dict[str, Dict] = {}
+
+        if self.icmp:
+            for ip, rtt in (await self._icmp_sweep(hosts, timeout, concurrency)).items():
+                alive[ip] = {"ip": ip, "mac": "", "hostname": "", "method": "icmp", "rtt_ms": rtt}
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def probe(ip: str):
+            async with sem:
+                hit = await self._probe_host(ip, timeout)
+            if hit is not None:
+                alive[ip] = {"ip": ip, "mac": "", "hostname": "", "method": hit[0], "rtt_ms": hit[1]}
+
+        await asyncio.gather(*(probe(ip) for ip in hosts if ip not in alive))
+
+        # Hosts que respondieron a ARP durante el barrido aunque filtren todo
+        if neighbor_table.is_supported():
+            for d in neighbor_table.read_proc_arp():
+                try:
+                    inside = ipaddress.ip_address(d["ip"]) in net
+                except ValueError:
+                    continue
+                if inside and d["ip"] not in own:
+                    entry = alive.setdefault(d["ip"], {"ip": d["ip"], "mac": "", "hostname": "",
+                                                       "method": "arp", "rtt_ms": None})
+                    entry["mac"] = d["mac"]
+        return list(alive.values())
+
+    async def _icmp_sweep(self, hosts: List[str], timeout: float, burst: int) -> Dict[str, float]:
+        sock, raw = _open_icmp_socket()
+        if sock is None:
+            return {}
+        loop = asyncio.get_running_loop()
+        ident = os.getpid() & 0xFFFF
+        sent: Dict[str, float] = {}
+        replies: Dict[str, float] = {}
+
+        def on_readable():
+            while True:
+                try:
+                    data, addr = sock.recvfrom(2048)
+                except (BlockingIOError, InterruptedError):
+                    return
+                except OSError:
+                    return
+                if raw:
+                    data = data[(data[0] & 0x0F) * 4:]
+                if len(data) < 8 or data[0] != 0:  # 0 = echo reply
+                    continue
+                # Con SOCK_DGRAM el kernel reescribe el identificador
+                if raw and struct.unpack("!H", data[4:6])[0] != ident:
+                    continue
+                ip = addr[0]
+                if ip in sent and ip not in replies:
+                    replies[ip] = round((time.monotonic() - sent[ip]) * 1000, 2)
+
+        loop.add_reader(sock.fileno(), on_readable)
+        try:
+            for i, ip in enumerate(hosts):
+                try:
+                    sock.sendto(_icmp_echo(ident, i & 0xFFFF), (ip, 0))
+                    sent[ip] = time.monotonic()
+                except BlockingIOError:
+                    await asyncio.sleep(0.005)
+                except OSError:
+                    pass
+                if i % burst == burst - 1:
+                    await asyncio.sleep(0.001)  # no desbordar el buffer de envío
+            await asyncio.sleep(timeout)
+        finally:
+            loop.remove_reader(sock.fileno())
+            sock.close()
+        return replies
+
+    async def _probe_host(self, ip: str, timeout: float) -> Optional[Tuple[str, float]]:
+        """Devuelve (método, rtt_ms) con la primera prueba concluyente, o None."""
+        start = time.monotonic()
+        tasks = [asyncio.ensure_future(self._tcp_probe(ip, port)) for port in self.ports]
+        if self.udp:
+            tasks.append(asyncio.ensure_future(self._udp_probe(ip)))
+        kinds = {t: ("tcp" if i < len(self.ports) else "udp") for i, t in enumerate(tasks)}
+        pending = set(tasks)
+        deadline = start + timeout
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if not t.cancelled() and t.exception() is None and t.result():
+                        return kinds[t], round((time.monotonic() - start) * 1000, 2)
+        finally:
+            for t in pending:
+                t.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return None
+
+    @staticmethod
+    async def _tcp_probe(ip: str, port: int) -> bool:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await loop.sock_connect(sock, (ip, port))
+            return True
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
+    @staticmethod
+    async def _udp_probe(ip: str) -> bool:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        try:
+            sock.connect((ip, _UDP_PROBE_PORT))
+            sock.send(b"")
+            await loop.sock_recv(sock, 1)
+            return True
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+        finally:
+            sock.close()
+
 
 class NetworkScanner:
     """Clase para escanear dispositivos en la red"""
     
-    def __init__(self):
+    def __init__(self, resolver: Optional[HostnameResolver] = None,
+                 discovery: Optional[HostDiscovery] = None):
         self.os_type = platform.system()
+        self.resolver = resolver or get_resolver()
+        # Barrido activo previo a leer la tabla ARP; None = solo tabla pasiva
+        self.discovery = discovery
     
-    def get_connected_devices(self) -> List[Dict]:
-        """Obtiene la lista de dispositivos conectados a la red"""
+    def get_connected_devices(self, force_refresh: bool = False,
+                              max_age: Optional[float] = None) -> List[Dict]:
+        """Obtiene la lista de dispositivos conectados a la red.
+
+        Reutiliza un escaneo reciente o en curso (``scan_cache``); con barrido
+        activo la clave es otra, porque el resultado incluye más hosts.
+        """
+        key = "devices:discovery" if self.discovery is not None else "devices"
+        return get_scan_cache().get(key, self._scan_devices, max_age=max_age, force=force_refresh)
+    
+    def _scan_devices(self) -> List[Dict]:
         devices = []
+        found: List[Dict] = []
+        
+        if self.discovery is not None:
+            # El barrido también llena la caché ARP que leen los escaneos por SO
+            try:
+                found = self.discovery.discover()
+            except Exception as e:
+                print(f"Host discovery error: {e}")
         
         try:
             if self.os_type == "Windows":
@@ -23,8 +341,39 @@ class NetworkScanner:
         except Exception as e:
             print(f"Error scanning devices: {e}")
         
+        devices = _merge_devices(devices, [
+            {"ip": d["ip"], "mac": d.get("mac", ""), "hostname": d.get("hostname", "")} for d in found
+        ])
+        self._resolve_hostnames(devices)
         return devices
     
+    def get_live_devices(self) -> Optional[List[Dict]]:
+        """Tabla de vecinos en memoria, sin lanzar procesos ni esperar DNS.
+
+        Devuelve None si el monitor de vecinos no está activo (otro SO o
+        DIAGNOSTICS_NEIGHBOR_MONITOR deshabilitado); los hostnames salen solo
+        de la caché.
+        """
+        if self.os_type != "Linux" or not neighbor_table.is_supported():
+            return None
+        table = neighbor_table.get_neighbor_table()
+        if not table.running:
+            return None
+        devices = table.devices()
+        for d in devices:
+            d["hostname"] = self.resolver.cached(d["ip"]) or ""
+        return devices
+    
+    def _resolve_hostnames(self, devices: List[Dict]) -> None:
+        """Completa los hostnames faltantes con una resolución en lote (concurrente y cacheada)"""
+        missing = [d["ip"] for d in devices if d.get("hostname", "") in _UNRESOLVED and d.get("ip")]
+        if not missing:
+            return
+        names = self.resolver.resolve_many(missing)
+        for d in devices:
+            if d.get("hostname", "") in _UNRESOLVED and d.get("ip") in names:
+                d["hostname"] = names[d["ip"]]
+    
     def _scan_windows(self) -> List[Dict]:
         """Escaneo para sistemas Windows"""
         devices = []
@@ -40,7 +389,7 @@ class NetworkScanner:
                 devices.append({
                     "ip": ip,
                     "mac": mac,
-                    "hostname": self._get_hostname(ip)
+                    "hostname": ""
                 })
         except Exception as e:
             print(f"Windows scan error: {e}")
@@ -50,31 +399,22 @@ class NetworkScanner:
     def _scan_linux(self) -> List[Dict]:
         """Escaneo para sistemas Linux"""
         devices = []
+        # Tabla de vecinos del kernel (/proc/net/arp): sin procesos ni parseo de
+        # texto. Es pasiva; el descubrimiento activo lo hace HostDiscovery
+        if neighbor_table.is_supported():
+            table = neighbor_table.get_neighbor_table()
+            return table.devices() if table.running else table.snapshot()
         try:
-            # Usar nmap si está disponible
-            try:
-                result = subprocess.check_output(["nmap", "-sn", "192.168.1.0/24"], text=True)
-                pattern = r"Nmap scan report for (.*?)\n.*?Host is up.*?\n.*?MAC Address: (.*?) \(.*?\)"
-                
-                for match in re.finditer(pattern, result, re.DOTALL):
-                    hostname, mac = match.groups()
-                    devices.append({
-                        "ip": hostname.split()[-1] if ' ' in hostname else hostname,
-                        "mac": mac.strip(),
-                        "hostname": hostname if '(' not in hostname else ""
-                    })
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                # Fallback to arp scan
-                result = subprocess.check_output(["arp", "-a"], text=True)
-                pattern = r"(\S+) \((\d+\.\d+\.\d+\.\d+)\) at ([0-9a-fA-F:]+) .*"
-                
-                for match in re.finditer(pattern, result):
-                    hostname, ip, mac = match.groups()
-                    devices.append({
-                        "ip": ip,
-                        "mac": mac,
-                        "hostname": hostname
-                    })
+            result = subprocess.check_output(["arp", "-a"], text=True)
+            pattern = r"(\S+) \((\d+\.\d+\.\d+\.\d+)\) at ([0-9a-fA-F:]+) .*"
+            
+            for match in re.finditer(pattern, result):
+                hostname, ip, mac = match.groups()
+                devices.append({
+                    "ip": ip,
+                    "mac": mac,
+                    "hostname": hostname
+                })
         except Exception as e:
             print(f"Linux scan error: {e}")
         
@@ -98,16 +438,3 @@ class NetworkScanner:
             print(f"macOS scan error: {e}")
         
         return devices
-    
-    def _get_hostname(self, ip: str) -> str:
-        """Intenta obtener el nombre de host de una IP"""
-        try:
-            result = subprocess.check_output(["nslookup", ip], text=True, timeout=2)
-            if "name" in result:
-                pattern = r"name = (.*?)\n"
-                match = re.search(pattern, result)
-                if match:
-                    return match.group(1)
-        except:
-            pass
-        return "Unknown"
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""Vectorized packet ingestion for traffic_monitor.
+
+Instead of dissecting every packet in Python (scapy), raw frames are gathered
+into one contiguous byte buffer plus an array of frame offsets, and the IPv4
+headers are decoded for the whole block at once with NumPy fancy indexing.
+Per-remote-IP totals are then a vectorized group-by (``np.unique`` +
+``np.bincount``). Output has the same shape as ``sample_bandwidth`` so it can
+be fed straight into ``as_mbps``.
+
+Sources:
+  - ``read_pcap``: classic libpcap files (offline benchmarks / replays).
+  - ``RawSocketCapture``: Linux AF_PACKET socket, frames copied into a block
+    buffer with ``recv_into`` (no per-packet objects).
+"""
+import ipaddress
+import socket
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Link-layer types (pcap LINKTYPE_*)
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+
+PACKET_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("src", "<u4"),
+    ("dst", "<u4"),
+    ("length", "<u4"),
+    ("proto", "u1"),
+    ("sport", "<u2"),
+    ("dport", "<u2"),
+])
+
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+
+
+class FrameBlock:
+    """A block of raw frames: one byte buffer + per-frame metadata arrays."""
+
+    __slots__ = ("buf", "offsets", "caplens", "wirelens", "ts", "linktype")
+
+    def __init__(self, buf: np.ndarray, offsets: np.ndarray, caplens: np.ndarray,
+                 wirelens: np.ndarray, ts: np.ndarray, linktype: int):
+        self.buf = buf
+        self.offsets = offsets
+        self.caplens = caplens
+        self.wirelens = wirelens
+        self.ts = ts
+        self.linktype = linktype
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+
+def read_pcap(path: str) -> FrameBlock:
+    """Load a libpcap file into a single FrameBlock.
+
+    Record headers are variable-length apart, so locating them is a tight
+    ``struct.unpack_from`` walk; everything after that is vectorized.
+    """
+    with open(path, "rb") as fh:
+        data = fh.read()
+    if len(data) < 24 or data[:4] not in _PCAP_MAGIC:
+        raise ValueError("Not a libpcap file (pcapng is not supported)")
+    endian, ts_scale = _PCAP_MAGIC[data[:4]]
+    linktype = struct.unpack_from(endian + "I", data, 20)[0] & 0x0FFFFFFF
+
+    # Only the record lengths are read in the loop; the other header fields
+    # are gathered afterwards in one vectorized pass
+    incl_at = struct.Struct(endian + "I").unpack_from
+    offsets: List[int] = []
+    append = offsets.append
+    pos, end = 24, len(data)
+    while pos + 16 <= end:
+        incl = incl_at(data, pos + 8)[0]
+        if pos + 16 + incl > end:
+            break
+        append(pos)
+        pos += 16 + incl
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    hdr_pos = np.array(offsets, dtype=np.int64)
+    dt = np.dtype(endian + "u4")
+    words = buf[hdr_pos[:, None] + np.arange(16)].copy().view(dt).reshape(-1, 4)
+    return FrameBlock(
+        buf=buf,
+        offsets=hdr_pos + 16,
+        caplens=words[:, 2].astype(np.int64),
+        wirelens=words[:, 3].astype(np.uint32),
+        ts=words[:, 0] + words[:, 1] * ts_scale,
+        linktype=linktype,
+    )
+
+
+def write_pcap(path: str, frames: Iterable[Tuple[float, bytes]], linktype: int = LINKTYPE_ETHERNET) -> int:
+    """Write ``(timestamp, frame)`` pairs as a libpcap file; returns the frame count."""
+    n = 0
+    with open(path, "wb") as fh:
+        fh.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, linktype))
+        for ts, frame in frames:
+            sec = int(ts)
+            fh.write(struct.pack("<IIII", sec, int(round((ts - sec) * 1e6)), len(frame), len(frame)))
+            fh.write(frame)
+            n += 1
+    return n
+
+
+def _u16(buf: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    return (buf[idx].astype(np.uint32) << 8) | buf[idx + 1]
+
+
+def _u32(buf: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    b = buf[idx[:, None] + np.arange(4)].astype(np.uint32)
+    return (b[:, 0] << 24) | (b[:, 1] << 16) | (b[:, 2] << 8) | b[:, 3]
+
+
+def parse_ipv4(block: FrameBlock) -> np.ndarray:
+    """Decode the IPv4 header of every frame in the block at once.
+
+    Returns a structured array (``PACKET_DTYPE``) with one row per IPv4
+    frame; addresses are host-order uint32, ``length`` is the on-wire frame
+    length (what scapy's ``len(pkt)`` reports). Ports are 0 for non-TCP/UDP
+    packets and for non-first fragments.
+    """
+    if len(block) == 0:
+        return np.zeros(0, dtype=PACKET_DTYPE)
+    buf, off, cap = block.buf, block.offsets, block.caplens
+    # Pad so that gathers past a truncated frame never go out of bounds
+    buf = np.concatenate([buf, np.zeros(64, dtype=np.uint8)])
+
+    lt = block.linktype
+    if lt == LINKTYPE_ETHERNET:
+        etype = _u16(buf, off + 12)
+        vlan = etype == ETH_P_8021Q
+        etype = np.where(vlan, _u16(buf, off + 16), etype)
+        l3 = off + np.where(vlan, 18, 14)
+        ok = etype == ETH_P_IP
+    elif lt == LINKTYPE_LINUX_SLL:
+        ok = _u16(buf, off + 14) == ETH_P_IP
+        l3 = off + 16
+    elif lt == LINKTYPE_LINUX_SLL2:
+        ok = _u16(buf, off) == ETH_P_IP
+        l3 = off + 20
+    elif lt == LINKTYPE_RAW:
+        ok = np.ones(len(off), dtype=bool)
+        l3 = off
+    else:
+        raise ValueError(f"Unsupported link type {lt}")
+
+    ok &= (l3 - off + 20) <= cap
+    ok &= (buf[l3] >> 4) == 4
+    idx = np.nonzero(ok)[0]
+    l3 = l3[idx]
+
+    out = np.zeros(len(idx), dtype=PACKET_DTYPE)
+    out["ts"] = block.ts[idx]
+    out["length"] = block.wirelens[idx]
+    out["proto"] = buf[l3 + 9]
+    out["src"] = _u32(buf, l3 + 12)
+    out["dst"] = _u32(buf, l3 + 16)
+
+    l4 = l3 + (buf[l3] & 0x0F).astype(np.int64) * 4
+    frag_off = _u16(buf, l3 + 6) & 0x1FFF
+    has_ports = ((out["proto"] == 6) | (out["proto"] == 17)) & (frag_off == 0)
+    has_ports &= (l4 - block.offsets[idx] + 4) <= block.caplens[idx]
+    p = np.nonzero(has_ports)[0]
+    out["sport"][p] = _u16(buf, l4[p])
+    out["dport"][p] = _u16(buf, l4[p] + 2)
+    return out
+
+
+def ip_to_int(ips: Iterable[str]) -> np.ndarray:
+    vals = []
+    for ip in ips:
+        try:
+            vals.append(int(ipaddress.IPv4Address(ip)))
+        except ValueError:
+            continue
+    return np.array(vals, dtype=np.uint32)
+
+
+def int_to_ip(value: int) -> str:
+    return str(ipaddress.IPv4Address(int(value)))
+
+
+def aggregate_by_remote(packets: np.ndarray, local_ips: Iterable[str],
+                        elapsed: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+    """Per-remote-IP byte totals, same format as ``sample_bandwidth``.
+
+    A packet counts as outbound when only its source is local and inbound
+    when only its destination is local; local<->local and transit traffic
+    is ignored, exactly like the scapy callback.
+    """
+    local = ip_to_int(local_ips)
+    src_local = np.isin(packets["src"], local)
+    dst_local = np.isin(packets["dst"], local)
+    out_mask = src_local & ~dst_local
+    in_mask = dst_local & ~src_local
+
+    remote = np.concatenate([packets["dst"][out_mask], packets["src"][in_mask]])
+    if remote.size == 0:
+        return {}
+    lengths = np.concatenate([packets["length"][out_mask], packets["length"][in_mask]]).astype(np.float64)
+    is_out = np.concatenate([np.ones(out_mask.sum(), dtype=bool), np.zeros(in_mask.sum(), dtype=bool)])
+
+    keys, inverse = np.unique(remote, return_inverse=True)
+    bytes_out = np.bincount(inverse, weights=np.where(is_out, lengths, 0.0), minlength=len(keys))
+    bytes_in = np.bincount(inverse, weights=np.where(is_out, 0.0, lengths), minlength=len(keys))
+
+    if elapsed is None:
+        ts = packets["ts"]
+        elapsed = float(ts.max() - ts.min()) if len(ts) > 1 else 0.0
+    elapsed = max(0.001, elapsed)
+    return {
+        int_to_ip(k): {"bytes_in": float(bi), "bytes_out": float(bo), "_elapsed": elapsed}
+        for k, bi, bo in zip(keys.tolist(), bytes_in.tolist(), bytes_out.tolist())
+    }
+
+
+def sample_pcap(path: str, local_ips: Optional[Iterable[str]] = None,
+                elapsed: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+    """Replay a pcap file through the vectorized engine."""
+    if local_ips is None:
+        from .traffic_monitor import _local_ipv4_addresses
+        local_ips = _local_ipv4_addresses()
+    return aggregate_by_remote(parse_ipv4(read_pcap(path)), local_ips, elapsed)
+
+
+class RawSocketCapture:
+    """Linux AF_PACKET capture into preallocated block buffers.
+
+    Each ``recv_into`` copies one frame straight into a shared bytearray; no
+    Python object is created per packet. ``read_block`` returns a FrameBlock
+    once ``block_frames`` frames were read or ``timeout`` expired.
+    """
+
+    def __init__(self, iface: Optional[str] = None, block_bytes: int = 4 << 20,
+                 block_frames: int = 16384, snaplen: int = 128):
+        if not hasattr(socket, "AF_PACKET"):
+            raise OSError("AF_PACKET not available on this platform")
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if iface:
+            self.sock.bind((iface, 0))
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+        self.block_frames = block_frames
+        # Only headers are needed; longer frames are truncated (MSG_TRUNC gives the real length)
+        self.snaplen = snaplen
+        self._buf = bytearray(max(block_bytes, snaplen * block_frames))
+        self._view = memoryview(self._buf)
+
+    def read_block(self, timeout: float) -> FrameBlock:
+        deadline = time.monotonic() + timeout
+        n = 0
+        pos = 0
+        offsets = np.empty(self.block_frames, dtype=np.int64)
+        caplens = np.empty(self.block_frames, dtype=np.int64)
+        wirelens = np.empty(self.block_frames, dtype=np.uint32)
+        ts = np.empty(self.block_frames, dtype=np.float64)
+        recv = self.sock.recvfrom_into
+        snap = self.snaplen
+        trunc = getattr(socket, "MSG_TRUNC", 0)
+        view = self._view
+        while n < self.block_frames:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.sock.settimeout(remaining)
+            try:
+                size, _addr = recv(view[pos:pos + snap], snap, trunc)
+            except socket.timeout:
+                break
+            offsets[n] = pos
+            caplens[n] = min(size, snap)
+            wirelens[n] = size
+            ts[n] = time.time()
+            pos += snap
+            n += 1
+        buf = np.frombuffer(self._buf, dtype=np.uint8, count=pos).copy()
+        return FrameBlock(buf, offsets[:n], caplens[:n], wirelens[:n], ts[:n], LINKTYPE_ETHERNET)
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def sample_raw_socket(duration_sec: float, iface: Optional[str] = None,
+                      local_ips: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, float]]:
+    """Drop-in replacement for scapy-based ``sample_bandwidth`` (Linux, needs CAP_NET_RAW)."""
+    if local_ips is None:
+        from .traffic_monitor import _local_ipv4_addresses
+        local_ips = _local_ipv4_addresses()
+    cap = RawSocketCapture(iface=iface)
+    start = time.time()
+    parts = []
+    try:
+        end = time.monotonic() + duration_sec
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            parts.append(parse_ipv4(cap.read_block(remaining)))
+    finally:
+        cap.close()
+    packets = np.concatenate(parts) if parts else np.zeros(0, dtype=PACKET_DTYPE)
+    return aggregate_by_remote(packets, local_ips, elapsed=time.time() - start)
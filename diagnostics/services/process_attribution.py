@@ -0,0 +1,303 @@
+"""Tráfico de red por proceso: une los flujos capturados con el PID dueño del socket.
+
+``SocketIndex`` mantiene un índice socket -> PID:
+
+- en Linux lee ``/proc/net/{tcp,udp}{,6}`` (una línea por socket, sin
+  recorrer procesos) y solo busca dueño para los inodos nuevos, mirando
+  ``/proc/<pid>/fd`` primero de los procesos nuevos y de los que ya tenían
+  sockets, y corta en cuanto los resolvió todos: el costo de cada refresco
+  sigue al recambio de sockets, no a la cantidad de procesos;
+- en otros sistemas usa ``psutil.net_connections`` (recorrido completo).
+
+``ProcessTraffic`` recibe bloques de paquetes (``pcap_ingest.PACKET_DTYPE``)
+del colector de tráfico, los agrupa por flujo con NumPy y suma los bytes de
+entrada y salida de cada PID. El índice se refresca solo cuando aparece un
+flujo sin dueño conocido (como mucho cada ``min_refresh`` segundos).
+"""
+import ipaddress
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import psutil
+
+from .pcap_ingest import int_to_ip, ip_to_int
+
+TCP, UDP = 6, 17
+# (protocolo, puerto local, IP remota, puerto remoto)
+Flow = Tuple[int, int, str, int]
+_PROC_NET = (('tcp', TCP), ('tcp6', TCP), ('udp', UDP), ('udp6', UDP))
+_UNSPECIFIED = ('0.0.0.0', '::')
+
+
+def _hex_addr(value: str) -> str:
+    """Dirección de /proc/net (palabras de 32 bits en orden del host) a texto."""
+    if len(value) == 8:
+        return socket.inet_ntoa(struct.pack('=I', int(value, 16)))
+    raw = b''.join(struct.pack('=I', int(value[i:i + 8], 16)) for i in range(0, 32, 8))
+    addr = ipaddress.IPv6Address(raw)
+    # Los sockets dual-stack ven a los clientes IPv4 como ::ffff:a.b.c.d
+    return str(addr.ipv4_mapped or addr)
+
+
+def read_proc_net(root: str = '/proc') -> Dict[int, Tuple[int, str, int, str, int]]:
+    """inodo -> (protocolo, IP local, puerto local, IP remota, puerto remoto)."""
+    sockets = {}
+    for name, proto in _PROC_NET:
+        try:
+            fh = open(os.path.join(root, 'net', name))
+        except OSError:
+            continue
+        with fh:
+            next(fh, None)
+            for line in fh:
+                parts = line.split()
+                if len(parts) < 10 or parts[9] == '0':
+                    continue  # TIME_WAIT y similares ya no tienen dueño
+                laddr, lport = parts[1].split(':')
+                raddr, rport = parts[2].split(':')
+                sockets[int(parts[9])] = (proto, _hex_addr(laddr), int(lport, 16),
+                                          _hex_addr(raddr), int(rport, 16))
+    return sockets
+
+
+class SocketIndex:
+    """Índice socket -> PID refrescado de forma incremental."""
+
+    def __init__(self, root: str = '/proc', use_proc: Optional[bool] = None):
+        self.root = root
+        self.use_proc = os.path.exists(os.path.join(root, 'net', 'tcp')) if use_proc is None else use_proc
+        self._sockets: Dict[int, Tuple[int, str, int, str, int]] = {}
+        self._owner: Dict[int, int] = {}
+        self._pid_inodes: Dict[int, Set[int]] = {}
+        self._known_pids: Set[int] = set()
+        self._by_flow: Dict[Flow, int] = {}
+        self._by_port: Dict[Tuple[int, int], int] = {}
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.scanned_pids = 0
+
+    # --- /proc ----------------------------------------------------------------
+    def _pids(self) -> Set[int]:
+        try:
+            return {int(n) for n in os.listdir(self.root) if n.isdigit()}
+        except OSError:
+            return set()
+
+    def _socket_inodes(self, pid: int) -> Set[int]:
+        fd_dir = os.path.join(self.root, str(pid), 'fd')
+        inodes = set()
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            return inodes  # proceso terminado o de otro usuario
+        for fd in fds:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if target.startswith('socket:['):
+                inodes.add(int(target[8:-1]))
+        return inodes
+
+    def _refresh_proc(self) -> Dict[str, int]:
+        sockets = read_proc_net(self.root)
+        new = sockets.keys() - self._sockets.keys()
+        for inode in self._sockets.keys() - sockets.keys():
+            pid = self._owner.pop(inode, None)
+            if pid is not None:
+                self._pid_inodes.get(pid, set()).discard(inode)
+        alive = self._pids()
+        for pid in [p for p in self._pid_inodes if p not in alive]:
+            for inode in self._pid_inodes.pop(pid):
+                self._owner.pop(inode, None)
+            self._names.pop(pid, None)
+        # Los sockets nuevos suelen ser de procesos nuevos o de los que ya tenían sockets
+        pending = set(new)
+        fresh = alive - self._known_pids
+        order = [*fresh, *(p for p in self._pid_inodes if p in alive and p not in fresh),
+                 *(alive - fresh - self._pid_inodes.keys())]
+        scanned = 0
+        for pid in order:
+            if not pending:
+                break
+            inodes = self._socket_inodes(pid)
+            scanned += 1
+            if not inodes:
+                continue
+            self._pid_inodes[pid] = inodes
+            for inode in inodes & pending:
+                self._owner[inode] = pid
+            pending -= inodes
+        self._sockets = sockets
+        self._known_pids = alive
+        self._by_flow, self._by_port = {}, {}
+        for inode, (proto, _lip, lport, rip, rport) in sockets.items():
+            pid = self._owner.get(inode)
+            if pid is None:
+                continue
+            if rport and rip not in _UNSPECIFIED:
+                self._by_flow[(proto, lport, rip, rport)] = pid
+            else:
+                self._by_port.setdefault((proto, lport), pid)
+        return {'sockets': len(sockets), 'new': len(new), 'unresolved': len(pending), 'scanned_pids': scanned}
+
+    # --- psutil -------------------------------------------------------------
+    def _refresh_psutil(self) -> Dict[str, int]:
+        by_flow, by_port = {}, {}
+        conns = psutil.net_connections(kind='inet')
+        for c in conns:
+            if c.pid is None or not c.laddr:
+                continue
+            proto = TCP if c.type == socket.SOCK_STREAM else UDP
+            if c.raddr:
+                by_flow[(proto, c.laddr.port, c.raddr.ip, c.raddr.port)] = c.pid
+            else:
+                by_port.setdefault((proto, c.laddr.port), c.pid)
+        self._by_flow, self._by_port = by_flow, by_port
+        return {'sockets': len(conns), 'new': len(conns), 'unresolved': 0, 'scanned_pids': 0}
+
+    def refresh(self) -> Dict[str, int]:
+        with self._lock:
+            stats = self._refresh_proc() if self.use_proc else self._refresh_psutil()
+            self.refreshes += 1
+            self.scanned_pids += stats['scanned_pids']
+            return stats
+
+    def lookup(self, proto: int, lport: int, rip: str, rport: int) -> Optional[int]:
+        """PID dueño del flujo (conexión exacta, o socket que escucha/UDP en ese puerto)."""
+        pid = self._by_flow.get((proto, lport, rip, rport))
+        return pid if pid is not None else self._by_port.get((proto, lport))
+
+    def name(self, pid: Optional[int]) -> str:
+        if pid is None:
+            return ''
+        name = self._names.get(pid)
+        if name is None:
+            try:
+                name = psutil.Process(pid).name()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                name = ''
+            self._names[pid] = name
+        return name
+
+
+class ProcessTraffic:
+    """Bytes de entrada/salida por PID a partir de bloques de paquetes capturados."""
+
+    def __init__(self, index: Optional[SocketIndex] = None, min_refresh: float = 1.0, clock=time.monotonic):
+        self.index = index or SocketIndex()
+        self.min_refresh = min_refresh
+        self._clock = clock
+        self._last_refresh: Optional[float] = None
+        # pid (None = sin dueño conocido) -> [bytes in, bytes out]
+        self._totals: Dict[Optional[int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _maybe_refresh(self) -> bool:
+        now = self._clock()
+        if self._last_refresh is not None and now - self._last_refresh < self.min_refresh:
+            return False
+        self._last_refresh = now
+        self.index.refresh()
+        return True
+
+    def flows(self, packets: np.ndarray, local_ips: Iterable[str]) -> List[Tuple[Flow, float, float]]:
+        """Agrupa paquetes TCP/UDP por flujo: ``[(flujo, bytes in, bytes out), ...]``."""
+        if len(packets) == 0:
+            return []
+        local = ip_to_int(local_ips)
+        src_local = np.isin(packets['src'], local)
+        dst_local = np.isin(packets['dst'], local)
+        l4 = (packets['proto'] == TCP) | (packets['proto'] == UDP)
+        out_mask = src_local & ~dst_local & l4
+        in_mask = dst_local & ~src_local & l4
+        if not (out_mask.any() or in_mask.any()):
+            return []
+        cols = [
+            np.concatenate([packets['proto'][out_mask], packets['proto'][in_mask]]),
+            np.concatenate([packets['sport'][out_mask], packets['dport'][in_mask]]),
+            np.concatenate([packets['dst'][out_mask], packets['src'][in_mask]]),
+            np.concatenate([packets['dport'][out_mask], packets['sport'][in_mask]]),
+        ]
+        lengths = np.concatenate([packets['length'][out_mask], packets['length'][in_mask]]).astype(np.float64)
+        is_out = np.concatenate([np.ones(out_mask.sum(), dtype=bool), np.zeros(in_mask.sum(), dtype=bool)])
+        keys, inverse = np.unique(np.stack([c.astype(np.int64) for c in cols], axis=1), axis=0,
+                                  return_inverse=True)
+        inverse = inverse.reshape(-1)
+        b_out = np.bincount(inverse, weights=np.where(is_out, lengths, 0.0), minlength=len(keys))
+        b_in = np.bincount(inverse, weights=np.where(is_out, 0.0, lengths), minlength=len(keys))
+        return [((proto, lport, int_to_ip(rip), rport), bi, bo)
+                for (proto, lport, rip, rport), bi, bo in zip(keys.tolist(), b_in.tolist(), b_out.tolist())]
+
+    def ingest(self, packets: np.ndarray, local_ips: Iterable[str]) -> None:
+        flows = self.flows(packets, local_ips)
+        if not flows:
+            return
+        if self._last_refresh is None:
+            self._maybe_refresh()
+        pids = [self.index.lookup(*flow) for flow, _, _ in flows]
+        # Un flujo sin dueño es un socket que el índice todavía no vio
+        if None in pids and self._maybe_refresh():
+            pids = [self.index.lookup(*flow) if pid is None else pid for (flow, _, _), pid in zip(flows, pids)]
+        with self._lock:
+            for pid, (_, bi, bo) in zip(pids, flows):
+                total = self._totals.setdefault(pid, [0.0, 0.0])
+                total[0] += bi
+                total[1] += bo
+
+    def top(self, n: Optional[int] = 10, by: str = 'total') -> List[Dict]:
+        """Procesos con más tráfico; ``by`` es 'total', 'in' u 'out'. ``pid`` None agrupa lo no atribuido."""
+        if by not in ('total', 'in', 'out'):
+            raise ValueError("by debe ser 'total', 'in' u 'out'")
+        with self._lock:
+            items = [(pid, bi, bo) for pid, (bi, bo) in self._totals.items()]
+        rows = [{'pid': pid, 'name': self.index.name(pid), 'bytes_in': bi, 'bytes_out': bo}
+                for pid, bi, bo in items]
+        key = {'total': lambda r: r['bytes_in'] + r['bytes_out'],
+               'in': lambda r: r['bytes_in'], 'out': lambda r: r['bytes_out']}[by]
+        rows.sort(key=key, reverse=True)
+        return rows[:n] if n else rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+def sample(duration_sec: float = 2.0, iface: Optional[str] = None,
+           local_ips: Optional[Iterable[str]] = None, index: Optional[SocketIndex] = None) -> ProcessTraffic:
+    """Captura ``duration_sec`` segundos y atribuye el tráfico (Linux, requiere CAP_NET_RAW)."""
+    from .pcap_ingest import RawSocketCapture, parse_ipv4
+    if local_ips is None:
+        from .traffic_monitor import _local_ipv4_addresses
+        local_ips = _local_ipv4_addresses()
+    traffic = ProcessTraffic(index or get_process_traffic().index)
+    cap = RawSocketCapture(iface=iface)
+    try:
+        end = time.monotonic() + duration_sec
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            traffic.ingest(parse_ipv4(cap.read_block(remaining)), local_ips)
+    finally:
+        cap.close()
+    return traffic
+
+
+_traffic: Optional[ProcessTraffic] = None
+_traffic_lock = threading.Lock()
+
+
+def get_process_traffic() -> ProcessTraffic:
+    """Acumulador compartido por el proceso (lo alimenta el colector de tráfico)."""
+    global _traffic
+    with _traffic_lock:
+        if _traffic is None:
+            _traffic = ProcessTraffic()
+        return _traffic
@@ -0,0 +1,124 @@
+"""Caché de resultados de escaneo con coalescencia de pedidos (single-flight).
+
+Los escaneos (redes WiFi, dispositivos, resumen del adaptador) lanzan
+procesos del sistema y tardan segundos. Si varios pedidos llegan a la vez
+(tareas en paralelo, varias pestañas abiertas) solo el primero escanea: los
+demás esperan ese mismo escaneo en curso y reciben su resultado. Un
+resultado más nuevo que el TTL de su clave se reutiliza sin escanear;
+``force=True`` ignora el TTL (pero se suma a un escaneo que ya esté en curso,
+que es igual de fresco).
+
+Los errores no se guardan: se propagan a todos los que esperaban ese escaneo
+y el siguiente pedido vuelve a intentar.
+"""
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_TTL = 15.0
+
+
+class _Flight:
+    """Escaneo en curso de una clave: los que llegan tarde esperan ``done``."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ScanCache:
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, default_ttl: float = DEFAULT_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttls: Dict[str, float] = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._entries: Dict[str, tuple] = {}  # clave -> (momento, valor)
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def configure(self, ttls: Dict[str, float]) -> None:
+        """Actualiza el TTL (segundos) de cada clave; 0 = sin caché (igual coalesce)."""
+        with self._lock:
+            self.ttls.update({k: float(v) for k, v in ttls.items()})
+
+    def ttl(self, key: str) -> float:
+        # 'devices:discovery' usa el TTL de 'devices'
+        return self.ttls.get(key, self.ttls.get(key.split(':', 1)[0], self.default_ttl))
+
+    def age(self, key: str) -> Optional[float]:
+        """Segundos desde el último resultado guardado de ``key`` (None si no hay)."""
+        entry = self._entries.get(key)
+        return None if entry is None else self._clock() - entry[0]
+
+    def get(self, key: str, loader: Callable[[], Any], max_age: Optional[float] = None,
+            force: bool = False) -> Any:
+        """Resultado de ``key``: el guardado si tiene menos de ``max_age`` (por
+        defecto el TTL de la clave), el del escaneo en curso, o uno nuevo con ``loader``.
+
+        Devuelve una copia: quien la modifique no altera lo que ven los demás.
+        """
+        max_age = self.ttl(key) if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if not force and entry is not None and self._clock() - entry[0] < max_age:
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                flight.value = loader()
+                with self._lock:
+                    self._entries[key] = (self._clock(), flight.value)
+            except BaseException as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.value)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Descarta el resultado de ``key`` (o todos); no afecta escaneos en curso."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                for k in [k for k in self._entries if k == key or k.startswith(key + ':')]:
+                    del self._entries[k]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                'keys': {k: round(self._clock() - t, 1) for k, (t, _) in self._entries.items()},
+            }
+
+
+_cache: Optional[ScanCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_scan_cache() -> ScanCache:
+    """Caché compartida por proceso (los TTL se configuran desde apps.ready)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScanCache()
+        return _cache
@@ -1,65 +1,85 @@
 import threading
 import time
 import speedtest
-import ping3
 from typing import Dict, Tuple, Optional
 
+from .latency import PUBLIC_TARGET, LatencyProber
+from .speedtest_servers import ServerSelection, get_server_selection
+
 class SpeedTester:
-    """Clase para realizar pruebas de velocidad y latencia"""
+    """Clase para realizar pruebas de velocidad y latencia.
+
+    El servidor de speedtest.net sale de ``ServerSelection`` (cacheado en
+    disco), así que una prueba solo paga la transferencia. Se comparte una
+    instancia por proceso (``get_speed_tester``); las pruebas se serializan.
+    """
     
-    def __init__(self):
+    def __init__(self, servers: Optional[ServerSelection] = None):
         # Crear instancia perezosa para evitar fallar en entornos sin red
         self.st: Optional[speedtest.Speedtest] = None
+        self.servers = servers or get_server_selection()
+        self._lock = threading.Lock()
         self.download_speed = 0
         self.upload_speed = 0
         self.ping = 0
+        self.jitter = 0
+        self.packet_loss = 0
         self.is_testing = False
     
     def run_test(self, callback=None) -> Dict[str, float]:
         """Ejecuta la prueba de velocidad completa"""
-        self.is_testing = True
-        
-        try:
-            # Medir ping
-            self.ping = self._measure_ping()
-            
-            # Medir velocidad de descarga
-            self.download_speed = self._measure_download()
-            
-            # Medir velocidad de subida
-            self.upload_speed = self._measure_upload()
-            
-            result = {
-                "download": self.download_speed,
-                "upload": self.upload_speed,
-                "ping": self.ping
-            }
-            
-            if callback:
-                callback(result)
+        with self._lock:
+            self.is_testing = True
+            try:
+                # Medir ping
+                self.ping = self._measure_ping()
+                
+                # Servidor de la caché (o descubrimiento si venció)
+                self.st = None
+                try:
+                    self.st = self.servers.client()
+                except Exception as e:
+                    print(f"Speed test server error: {e}")
+                
+                # Medir velocidad de descarga
+                self.download_speed = self._measure_download()
+                
+                # Medir velocidad de subida
+                self.upload_speed = self._measure_upload()
                 
-            return result
-        except Exception as e:
-            print(f"Speed test error: {e}")
-            return {"download": 0, "upload": 0, "ping": 0}
-        finally:
-            self.is_testing = False
+                result = {
+                    "download": self.download_speed,
+                    "upload": self.upload_speed,
+                    "ping": self.ping,
+                    "jitter": self.jitter,
+                    "packet_loss": self.packet_loss,
+                }
+                
+                if callback:
+                    callback(result)
+                    
+                return result
+            except Exception as e:
+                print(f"Speed test error: {e}")
+                return {"download": 0, "upload": 0, "ping": 0, "jitter": 0, "packet_loss": 0}
+            finally:
+                self.is_testing = False
     
     def _measure_ping(self) -> float:
-        """Mide la latencia de la conexión"""
+        """Mide la latencia de la conexión (mediana de varias sondas; también jitter y pérdida)"""
         try:
-            # Medir ping a Google DNS
-            latency = ping3.ping('8.8.8.8', timeout=2)
-            return round(latency * 1000, 2) if latency else 0
-        except:
+            stats = LatencyProber([PUBLIC_TARGET], count=10, interval=0.1, timeout=2).probe()[PUBLIC_TARGET]
+        except Exception:
             return 0
+        self.jitter = stats["jitter"] or 0
+        self.packet_loss = stats["loss_pct"]
+        return stats["p50"] or 0
     
     def _measure_download(self) -> float:
         """Mide la velocidad de descarga"""
         try:
             if self.st is None:
-                self.st = speedtest.Speedtest()
-            self.st.get_best_server()
+                self.st = self.servers.client()
             return round(self.st.download() / 1_000_000, 2)  # Convertir a Mbps
         except Exception:
             return 0
@@ -68,7 +88,7 @@ class SpeedTester:
         """Mide la velocidad de subida"""
         try:
             if self.st is None:
-                self.st = speedtest.Speedtest()
+                self.st = self.servers.client()
             return round(self.st.upload() / 1_000_000, 2)  # Convertir a Mbps
         except Exception:
             return 0
@@ -78,3 +98,16 @@ class SpeedTester:
         thread = threading.Thread(target=self.run_test, args=(callback,))
         thread.daemon = True
         thread.start()
+
+
+_tester: Optional[SpeedTester] = None
+_tester_lock = threading.Lock()
+
+
+def get_speed_tester() -> SpeedTester:
+    """Tester compartido por proceso (reutiliza la selección de servidor entre pruebas)."""
+    global _tester
+    with _tester_lock:
+        if _tester is None:
+            _tester = SpeedTester()
+        return _tester
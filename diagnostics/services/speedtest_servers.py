@@ -0,0 +1,217 @@
+"""Selección de servidor de speedtest.net cacheada en disco.
+
+Sin caché, cada prueba descarga la configuración y la lista de servidores y
+mide la latencia de los más cercanos antes de transferir un solo byte: varios
+segundos por prueba. ``ServerSelection`` guarda en un JSON la configuración
+del cliente, el mejor servidor y los candidatos cercanos:
+
+- dentro de ``ttl`` la prueba arranca directo con el servidor guardado;
+- cada ``revalidate_every`` segundos un hilo vuelve a medir solo los
+  candidatos guardados (sin bajar la lista) y actualiza el mejor;
+- vencido el ``ttl``, o si la revalidación falla, se hace el descubrimiento
+  completo otra vez.
+"""
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import speedtest
+
+# Candidatos cercanos que se guardan para revalidar sin bajar la lista
+CANDIDATES = 5
+_FORMAT = 1
+
+
+class CachedSpeedtest(speedtest.Speedtest):
+    """``Speedtest`` que puede arrancar con una configuración ya descargada."""
+
+    def __init__(self, cached_config: Optional[Dict] = None, **kwargs):
+        self._cached_config = cached_config
+        super().__init__(**kwargs)
+
+    def get_config(self):
+        if not self._cached_config:
+            return super().get_config()
+        self.config.update(copy.deepcopy(self._cached_config))
+        client = self.config['client']
+        self.lat_lon = (float(client['lat']), float(client['lon']))
+        return self.config
+
+    def use_server(self, server: Dict) -> None:
+        """Fija el servidor sin medir latencias (lo que haría ``get_best_server``)."""
+        self._best.clear()
+        self._best.update(server)
+        self.results.server = server
+        self.results.ping = server.get('latency', 0)
+
+
+class ServerSelection:
+    def __init__(self, path: Optional[str] = None, ttl: float = 86400, revalidate_every: float = 3600,
+                 factory: Callable[..., CachedSpeedtest] = CachedSpeedtest):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'wifiscan_speedtest_servers.json')
+        self.ttl = ttl
+        self.revalidate_every = revalidate_every
+        self.factory = factory
+        self._entry: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.discoveries = 0
+        self.revalidations = 0
+
+    def configure(self, path: Optional[str] = None, ttl: Optional[float] = None,
+                  revalidate_every: Optional[float] = None) -> None:
+        with self._lock:
+            if path and path != self.path:
+                self.path, self._entry = str(path), None
+            if ttl is not None:
+                self.ttl = float(ttl)
+            if revalidate_every is not None:
+                self.revalidate_every = float(revalidate_every)
+
+    # --- Disco ----------------------------------------------------------------
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if entry.get('format') != _FORMAT or not entry.get('best') or not entry.get('config'):
+            return None
+        return entry
+
+    def _save(self, entry: Dict) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Temporal propio de cada escritura: dos procesos no comparten el mismo .tmp
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(self.path)}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                json.dump(entry, fh)
+            os.replace(tmp, self.path)  # atómico: otro proceso nunca lee un JSON a medias
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        return now - entry['discovered_at'] >= self.ttl
+
+    def entry(self) -> Optional[Dict]:
+        """Selección vigente (memoria o disco), o None si no hay o venció el TTL."""
+        entry, now = self._entry, time.time()
+        # El hilo de fondo corre en un solo proceso: los demás toman de disco lo que
+        # haya revalidado o vuelto a descubrir
+        if entry is None or self._expired(entry, now) or now - entry['validated_at'] >= self.revalidate_every:
+            disk = self._load()
+            if disk is not None and (entry is None or disk['validated_at'] > entry['validated_at']):
+                entry = disk
+        if entry is None or self._expired(entry, now):
+            return None
+        self._entry = entry
+        return entry
+
+    # --- Descubrimiento / revalidación ----------------------------------------
+    def discover(self) -> CachedSpeedtest:
+        """Descubrimiento completo: configuración, lista de servidores y latencias."""
+        st = self.factory(cached_config=None)
+        best = st.get_best_server()
+        now = time.time()
+        entry = {
+            'format': _FORMAT,
+            'config': st.config,
+            'best': best,
+            'candidates': list(st.closest[:CANDIDATES]) or [best],
+            'discovered_at': now,
+            'validated_at': now,
+        }
+        self._save(entry)
+        self._entry = entry
+        self.discoveries += 1
+        return st
+
+    def revalidate(self) -> Dict:
+        """Vuelve a medir solo los candidatos guardados; si falla, descubre de nuevo."""
+        with self._lock:
+            entry = self.entry()
+            if entry is None:
+                return self.discover().best
+            try:
+                st = self.factory(cached_config=entry['config'])
+                best = st.get_best_server(servers=copy.deepcopy(entry['candidates']))
+            except Exception as e:
+                print(f"Speedtest server revalidation error: {e}")
+                return self.discover().best
+            entry = dict(entry, best=best, validated_at=time.time())
+            self._save(entry)
+            self._entry = entry
+            self.revalidations += 1
+            return best
+
+    def client(self) -> CachedSpeedtest:
+        """Instancia lista para ``download``/``upload`` con el mejor servidor."""
+        with self._lock:
+            entry = self.entry()
+            if entry is None:
+                return self.discover()
+            st = self.factory(cached_config=entry['config'])
+            st.use_server(copy.deepcopy(entry['best']))
+            return st
+
+    def status(self) -> Dict:
+        entry = self.entry()
+        if entry is None:
+            return {'cached': False}
+        now = time.time()
+        return {
+            'cached': True,
+            'server': {k: entry['best'].get(k) for k in ('id', 'sponsor', 'name', 'country', 'latency')},
+            'age_seconds': round(now - entry['discovered_at']),
+            'validated_seconds_ago': round(now - entry['validated_at']),
+        }
+
+    # --- Hilo de revalidación -------------------------------------------------
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="speedtest-servers", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        # Sin selección guardada se descubre al arrancar, no en la primera prueba
+        wait = 0 if self.entry() is None else self.revalidate_every
+        while not self._stop.wait(wait):
+            try:
+                self.revalidate()
+            except Exception as e:
+                print(f"Speedtest server discovery error: {e}")
+            wait = self.revalidate_every
+
+
+_selection: Optional[ServerSelection] = None
+_selection_lock = threading.Lock()
+
+
+def get_server_selection() -> ServerSelection:
+    """Selección compartida por proceso (ruta y TTL se configuran desde apps.ready)."""
+    global _selection
+    with _selection_lock:
+        if _selection is None:
+            _selection = ServerSelection()
+        return _selection
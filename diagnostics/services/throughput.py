@@ -0,0 +1,191 @@
+"""Prueba de throughput en la LAN contra este mismo servidor, sin internet.
+
+El servidor expone dos endpoints (``/throughput/download/`` y
+``/throughput/upload/``, ver views.py) y ``ThroughputClient`` abre N
+conexiones HTTP en paralelo contra ellos. Los bytes de todas las conexiones
+se suman en intervalos fijos (por defecto 1 s) y de esa serie salen:
+
+- ``per_second``: Mbps de cada intervalo completo;
+- ``ramp_up_seconds``: lo que tarda en llegar al 90% del régimen (TCP slow
+  start, ajuste de la tasa WiFi);
+- ``steady_mbps``: promedio desde el fin de la rampa: la capacidad del enlace.
+
+Solo usa la biblioteca estándar: el cliente corre desde la notebook con
+``manage.py throughput_test --url http://servidor:8000``.
+"""
+import http.client
+import os
+import statistics
+import threading
+import time
+from typing import Dict, Iterator, List
+from urllib.parse import urlencode, urlsplit
+
+CHUNK = 64 * 1024
+# Datos aleatorios (incompresibles) que se repiten en cada bloque
+_PAYLOAD = os.urandom(CHUNK)
+# Fracción del régimen que marca el fin de la rampa
+RAMP_THRESHOLD = 0.9
+
+
+def payload_stream(max_bytes: int, max_seconds: float, chunk: int = CHUNK) -> Iterator[bytes]:
+    """Bloques de ``chunk`` bytes hasta ``max_bytes`` o ``max_seconds``, lo que ocurra antes."""
+    block = _PAYLOAD[:chunk] if chunk <= CHUNK else _PAYLOAD * (chunk // CHUNK)
+    deadline = time.monotonic() + max_seconds
+    sent = 0
+    while sent < max_bytes and time.monotonic() < deadline:
+        part = block if max_bytes - sent >= len(block) else block[:max_bytes - sent]
+        sent += len(part)
+        yield part
+
+
+def drain(read, chunk: int = CHUNK) -> int:
+    """Lee y descarta hasta fin de stream; devuelve los bytes leídos."""
+    total = 0
+    while True:
+        data = read(chunk)
+        if not data:
+            return total
+        total += len(data)
+
+
+class Meter:
+    """Bytes por intervalo sumados desde varios hilos."""
+
+    def __init__(self, interval: float = 1.0, clock=time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self.start = clock()
+        self.bins: List[int] = []
+        self._lock = threading.Lock()
+
+    def add(self, nbytes: int) -> None:
+        idx = int((self._clock() - self.start) / self.interval)
+        with self._lock:
+            if idx >= len(self.bins):
+                self.bins.extend([0] * (idx + 1 - len(self.bins)))
+            self.bins[idx] += nbytes
+
+    def elapsed(self) -> float:
+        return self._clock() - self.start
+
+
+def summarize(bins: List[int], interval: float = 1.0) -> Dict:
+    """Serie en Mbps, rampa y régimen a partir de bytes por intervalo completo."""
+    series = [round(b * 8 / interval / 1e6, 2) for b in bins]
+    if not series:
+        return {'per_second': [], 'ramp_up_seconds': None, 'steady_mbps': 0.0, 'peak_mbps': 0.0}
+    # Referencia del régimen: mediana de la segunda mitad (robusta a picos)
+    reference = statistics.median(series[len(series) // 2:])
+    ramp = next((i for i, v in enumerate(series) if v >= RAMP_THRESHOLD * reference), 0)
+    steady = series[ramp:]
+    return {
+        'per_second': series,
+        'ramp_up_seconds': round(ramp * interval, 2),
+        'steady_mbps': round(statistics.fmean(steady), 2),
+        'peak_mbps': max(series),
+    }
+
+
+class ThroughputClient:
+    """Cliente multi-conexión de los endpoints de throughput de este servidor."""
+
+    def __init__(self, base_url: str, streams: int = 4, duration: float = 10.0,
+                 interval: float = 1.0, timeout: float = 10.0, upload_request_bytes: int = 16 * 1024 * 1024):
+        parts = urlsplit(base_url if '://' in base_url else f'http://{base_url}')
+        self.scheme = parts.scheme
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.streams = max(1, int(streams))
+        self.duration = float(duration)
+        self.interval = float(interval)
+        self.timeout = timeout
+        self.upload_request_bytes = upload_request_bytes
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    # --- Por conexión -----------------------------------------------------
+    def _download_stream(self, meter: Meter, deadline: float, counts: List[int], i: int) -> None:
+        conn = self._connect()
+        try:
+            # El servidor corta un poco después: el cliente decide cuándo parar
+            query = urlencode({'seconds': self.duration + 2})
+            conn.request('GET', f'{self.prefix}/throughput/download/?{query}')
+            resp = conn.getresponse()
+            if resp.status != 200:
+                raise RuntimeError(f'HTTP {resp.status}')
+            while time.monotonic() < deadline:
+                data = resp.read1(CHUNK)
+                if not data:
+                    break
+                meter.add(len(data))
+                counts[i] += len(data)
+        finally:
+            conn.close()
+
+    def _upload_stream(self, meter: Meter, deadline: float, counts: List[int], i: int) -> None:
+        conn = self._connect()
+        try:
+            # Pedidos sucesivos de tamaño fijo (Content-Length: WSGI no admite chunked)
+            while time.monotonic() < deadline:
+                conn.putrequest('POST', f'{self.prefix}/throughput/upload/')
+                conn.putheader('Content-Type', 'application/octet-stream')
+                conn.putheader('Content-Length', str(self.upload_request_bytes))
+                conn.endheaders()
+                for part in payload_stream(self.upload_request_bytes, self.duration + 2):
+                    if time.monotonic() >= deadline:
+                        return  # se corta a mitad del pedido: el servidor descarta lo parcial
+                    conn.send(part)
+                    meter.add(len(part))
+                    counts[i] += len(part)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    raise RuntimeError(f'HTTP {resp.status}')
+        finally:
+            conn.close()
+
+    # --- Prueba completa --------------------------------------------------
+    def run(self, direction: str = 'download') -> Dict:
+        if direction not in ('download', 'upload'):
+            raise ValueError(f'Dirección desconocida: {direction}')
+        target = self._download_stream if direction == 'download' else self._upload_stream
+        meter = Meter(self.interval)
+        deadline = meter.start + self.duration
+        counts = [0] * self.streams
+        errors: List[str] = []
+
+        def worker(i):
+            try:
+                target(meter, deadline, counts, i)
+            except Exception as e:
+                errors.append(f'stream {i}: {e}')
+
+        threads = [threading.Thread(target=worker, args=(i,), name=f'throughput-{i}', daemon=True)
+                   for i in range(self.streams)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(self.duration + self.timeout)
+        elapsed = min(meter.elapsed(), self.duration) or self.duration
+        # Solo intervalos completos: el último parcial subestimaría la tasa
+        full = int(elapsed / self.interval + 1e-9)
+        total = sum(counts)
+        result = {
+            'direction': direction,
+            'streams': self.streams,
+            'seconds': round(elapsed, 2),
+            'bytes': total,
+            'mbps': round(total * 8 / elapsed / 1e6, 2),
+            'per_stream_mbps': [round(c * 8 / elapsed / 1e6, 2) for c in counts],
+            'errors': errors,
+        }
+        bins = meter.bins[:full]
+        result.update(summarize(bins + [0] * (full - len(bins)), self.interval))
+        return result
+
+    def run_both(self) -> Dict[str, Dict]:
+        return {'download': self.run('download'), 'upload': self.run('upload')}
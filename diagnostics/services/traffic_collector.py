@@ -0,0 +1,277 @@
+"""Continuous per-IP traffic collector with rolling windows.
+
+A background thread captures packets without pause (AF_PACKET blocks via
+``pcap_ingest``, or scapy as a fallback) and adds bytes to a per-remote-IP
+ring buffer of one-second slots. Current rates for the 1 s, 1 min and 15 min
+windows are read from memory, so callers never wait for a capture.
+
+Every ``flush_interval`` seconds the last interval's rates are handed to
+``on_flush`` (the app stores them as ``TrafficSample`` rows); the collector
+itself does not touch the database. ``on_packets`` receives every parsed
+block as well (per-process attribution, ``process_attribution``).
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Rolling windows exposed by ``rates``/``snapshot`` (name -> seconds)
+WINDOWS = {"1s": 1, "1m": 60, "15m": 900}
+
+FlushCallback = Callable[[List[Dict[str, float]]], None]
+PacketCallback = Callable[[np.ndarray, Iterable[str]], None]
+
+
+class RingBuffer:
+    """Bytes in/out for one remote IP, one slot per second.
+
+    ``stamp[slot]`` holds the second a slot belongs to, so slots left over
+    from a previous lap are ignored (and reset on write) without sweeping.
+    """
+
+    __slots__ = ("size", "stamp", "bytes_in", "bytes_out", "last_seen")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.stamp = np.full(size, -1, dtype=np.int64)
+        self.bytes_in = np.zeros(size, dtype=np.float64)
+        self.bytes_out = np.zeros(size, dtype=np.float64)
+        self.last_seen = -1
+
+    def add(self, sec: int, bytes_in: float, bytes_out: float) -> None:
+        slot = sec % self.size
+        if self.stamp[slot] != sec:
+            self.stamp[slot] = sec
+            self.bytes_in[slot] = 0.0
+            self.bytes_out[slot] = 0.0
+        self.bytes_in[slot] += bytes_in
+        self.bytes_out[slot] += bytes_out
+        if sec > self.last_seen:
+            self.last_seen = sec
+
+    def totals(self, first: int, last: int) -> Tuple[float, float]:
+        """Bytes (in, out) for the seconds ``first..last`` inclusive."""
+        mask = (self.stamp >= first) & (self.stamp <= last)
+        return float(self.bytes_in[mask].sum()), float(self.bytes_out[mask].sum())
+
+
+class TrafficCollector:
+    """Long-running capture feeding per-IP ring buffers.
+
+    - ``rates(window)`` returns rows shaped like ``as_mbps`` (ip,
+      download_mbps, upload_mbps) averaged over the last complete
+      ``window`` seconds, busiest first.
+    - ``snapshot()`` returns all windows of ``WINDOWS`` at once.
+    - ``start()``/``stop()`` control the capture thread.
+    """
+
+    def __init__(self, iface: Optional[str] = None, history: int = 900,
+                 flush_interval: float = 60.0, on_flush: Optional[FlushCallback] = None,
+                 local_ips: Optional[Iterable[str]] = None, on_packets: Optional[PacketCallback] = None):
+        self.iface = iface
+        self.history = max(history, max(WINDOWS.values()))
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.on_packets = on_packets
+        self._fixed_local_ips = list(local_ips) if local_ips is not None else None
+        self._buffers: Dict[str, RingBuffer] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at: Optional[float] = None
+        self.engine = ""
+        self._last_flush = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- Ingestion --------------------------------------------------------
+    def local_ips(self) -> List[str]:
+        if self._fixed_local_ips is not None:
+            return self._fixed_local_ips
+        from .traffic_monitor import _local_ipv4_addresses
+        return _local_ipv4_addresses()
+
+    def add(self, ts: float, remote: str, bytes_in: float = 0.0, bytes_out: float = 0.0) -> None:
+        """Account bytes exchanged with ``remote`` at time ``ts``."""
+        with self._lock:
+            buf = self._buffers.get(remote)
+            if buf is None:
+                buf = self._buffers[remote] = RingBuffer(self.history)
+            buf.add(int(ts), bytes_in, bytes_out)
+
+    def ingest(self, packets: np.ndarray, local_ips: Iterable[str]) -> None:
+        """Add a block of parsed packets (``pcap_ingest.PACKET_DTYPE``).
+
+        Packets are grouped by (remote IP, second) with NumPy, so the Python
+        loop runs once per group instead of once per packet.
+        """
+        from .pcap_ingest import int_to_ip, ip_to_int
+        if len(packets) == 0:
+            return
+        if self.on_packets is not None:
+            try:
+                self.on_packets(packets, local_ips)
+            except Exception as e:
+                print(f"Traffic packet hook error: {e}")
+        local = ip_to_int(local_ips)
+        src_local = np.isin(packets["src"], local)
+        dst_local = np.isin(packets["dst"], local)
+        out_mask = src_local & ~dst_local
+        in_mask = dst_local & ~src_local
+        remote = np.concatenate([packets["dst"][out_mask], packets["src"][in_mask]]).astype(np.int64)
+        if remote.size == 0:
+            return
+        secs = np.concatenate([packets["ts"][out_mask], packets["ts"][in_mask]]).astype(np.int64)
+        lengths = np.concatenate([packets["length"][out_mask], packets["length"][in_mask]]).astype(np.float64)
+        is_out = np.concatenate([np.ones(out_mask.sum(), dtype=bool), np.zeros(in_mask.sum(), dtype=bool)])
+
+        keys, inverse = np.unique(np.stack([remote, secs], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        b_out = np.bincount(inverse, weights=np.where(is_out, lengths, 0.0), minlength=len(keys))
+        b_in = np.bincount(inverse, weights=np.where(is_out, 0.0, lengths), minlength=len(keys))
+        with self._lock:
+            for (ip_int, sec), bi, bo in zip(keys.tolist(), b_in.tolist(), b_out.tolist()):
+                ip = int_to_ip(ip_int)
+                buf = self._buffers.get(ip)
+                if buf is None:
+                    buf = self._buffers[ip] = RingBuffer(self.history)
+                buf.add(sec, bi, bo)
+
+    # --- Reading ----------------------------------------------------------
+    def rates(self, window: int = 60, now: Optional[float] = None,
+              top: Optional[int] = None) -> List[Dict[str, float]]:
+        """Average Mbps per remote IP over the last ``window`` complete seconds.
+
+        While the collector has been running for less than ``window`` the
+        average is taken over the time actually observed.
+        """
+        now = time.time() if now is None else now
+        last = int(now) - 1  # the current second is still filling up
+        first = last - window + 1
+        span = window
+        if self.started_at is not None:
+            span = max(1, min(window, last - int(self.started_at) + 1))
+        rows = []
+        with self._lock:
+            for ip, buf in self._buffers.items():
+                if buf.last_seen < first:
+                    continue
+                bytes_in, bytes_out = buf.totals(first, last)
+                if bytes_in == 0 and bytes_out == 0:
+                    continue
+                rows.append({
+                    "ip": ip,
+                    "download_mbps": round(bytes_in * 8.0 / span / 1_000_000, 3),
+                    "upload_mbps": round(bytes_out * 8.0 / span / 1_000_000, 3),
+                })
+        rows.sort(key=lambda r: r["download_mbps"] + r["upload_mbps"], reverse=True)
+        return rows[:top] if top else rows
+
+    def snapshot(self, now: Optional[float] = None, top: Optional[int] = None) -> Dict[str, List[Dict[str, float]]]:
+        now = time.time() if now is None else now
+        return {name: self.rates(sec, now=now, top=top) for name, sec in WINDOWS.items()}
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop IPs idle for longer than the history; returns how many."""
+        horizon = int(time.time() if now is None else now) - self.history
+        with self._lock:
+            idle = [ip for ip, buf in self._buffers.items() if buf.last_seen < horizon]
+            for ip in idle:
+                del self._buffers[ip]
+        return len(idle)
+
+    def flush(self, now: Optional[float] = None) -> List[Dict[str, float]]:
+        """Pass the rates of the last flush interval to ``on_flush``."""
+        now = time.time() if now is None else now
+        self._last_flush = now
+        self.prune(now)
+        rows = self.rates(max(1, int(self.flush_interval)), now=now)
+        if rows and self.on_flush is not None:
+            try:
+                self.on_flush(rows)
+            except Exception as e:
+                print(f"Traffic flush error: {e}")
+        return rows
+
+    # --- Capture thread ---------------------------------------------------
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.time()
+        self._last_flush = self.started_at
+        self._thread = threading.Thread(target=self._run, name="traffic-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _maybe_flush(self) -> None:
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _run(self) -> None:
+        try:
+            self._run_raw()
+        except OSError:
+            # No AF_PACKET (non-Linux) or no CAP_NET_RAW
+            self._run_scapy()
+        except Exception as e:
+            print(f"Traffic collector error: {e}")
+
+    def _run_raw(self) -> None:
+        from .pcap_ingest import RawSocketCapture, parse_ipv4
+        cap = RawSocketCapture(iface=self.iface)
+        self.engine = "raw"
+        local_ips, refreshed = self.local_ips(), time.monotonic()
+        try:
+            while not self._stop.is_set():
+                self.ingest(parse_ipv4(cap.read_block(0.5)), local_ips)
+                if time.monotonic() - refreshed > 60:
+                    local_ips, refreshed = self.local_ips(), time.monotonic()
+                self._maybe_flush()
+        finally:
+            cap.close()
+
+    def _run_scapy(self) -> None:
+        from .traffic_monitor import IP, sniff
+        if sniff is None or IP is None:
+            return
+        self.engine = "scapy"
+
+        def _accumulate(pkt):
+            if IP not in pkt:
+                return
+            layer = pkt[IP]
+            if layer.src in local_ips and layer.dst not in local_ips:
+                self.add(float(pkt.time), layer.dst, bytes_out=len(pkt))
+            elif layer.dst in local_ips and layer.src not in local_ips:
+                self.add(float(pkt.time), layer.src, bytes_in=len(pkt))
+
+        while not self._stop.is_set():
+            local_ips = set(self.local_ips())
+            try:
+                sniff(filter="ip", prn=_accumulate, store=False, timeout=1.0, iface=self.iface)
+            except Exception as e:
+                print(f"Traffic collector error: {e}")
+                return
+            self._maybe_flush()
+
+
+_collector: Optional[TrafficCollector] = None
+_collector_lock = threading.Lock()
+
+
+def get_collector(**kwargs) -> TrafficCollector:
+    """Collector shared by the process; ``kwargs`` only apply on first call."""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = TrafficCollector(**kwargs)
+        return _collector
@@ -23,7 +23,8 @@ def _local_ipv4_addresses() -> List[str]:
     return addrs
 
 
-def sample_bandwidth(duration_sec: int = 5, iface: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+def sample_bandwidth(duration_sec: int = 5, iface: Optional[str] = None,
+                     engine: str = "auto") -> Dict[str, Dict[str, float]]:
     """
     Capture traffic for a short window and estimate per-remote-IP bandwidth.
 
@@ -31,11 +32,23 @@ def sample_bandwidth(duration_sec: int = 5, iface: Optional[str] = None) -> Dict
       - bytes_in: bytes received from that IP
       - bytes_out: bytes sent to that IP
     Values are totals over the capture window (duration_sec).
+
+    engine: "raw" uses the vectorized AF_PACKET reader (pcap_ingest), "scapy"
+    the per-packet sniff callback, "auto" tries raw first and falls back.
     """
     results: Dict[str, Dict[str, float]] = {}
 
     local_ips = set(_local_ipv4_addresses())
 
+    if engine in ("auto", "raw"):
+        try:
+            from .pcap_ingest import sample_raw_socket
+            return sample_raw_socket(duration_sec, iface=iface, local_ips=local_ips)
+        except Exception:
+            # No AF_PACKET (non-Linux) or no CAP_NET_RAW
+            if engine == "raw":
+                return {}
+
     if sniff is None or IP is None:
         return results
 
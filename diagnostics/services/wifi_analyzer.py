@@ -1,225 +1,152 @@
 ﻿import subprocess
-import platform
-import shutil
-import unicodedata
-from typing import List, Dict
+import re
+from typing import List, Dict, Optional
 
-
-def _normalize_text(s: str) -> str:
-    try:
-        s = unicodedata.normalize('NFKD', s)
-        s = ''.join(c for c in s if not unicodedata.combining(c))
-    except Exception:
-        pass
-    return s.lower()
+from . import capabilities, wifi_parsers
+from .capabilities import Capabilities, backend
+from .scan_cache import get_scan_cache
 
 
 class WiFiAnalyzer:
     """Analiza redes WiFi disponibles con soporte para Windows/Linux/macOS.
-    Maneja salidas en distintos idiomas y utilidades alternativas.
+    Maneja salidas en distintos idiomas y utilidades alternativas
+    (el parseo de cada formato está en ``wifi_parsers``).
     """
 
-    def __init__(self):
-        self.os_type = platform.system()
+    def get_available_networks(self, force_refresh: bool = False,
+                               max_age: Optional[float] = None) -> List[Dict]:
+        """Redes visibles; reutiliza un escaneo reciente o en curso (``scan_cache``).
 
-    def get_available_networks(self) -> List[Dict]:
-        networks: List[Dict] = []
-        try:
-            if self.os_type == "Windows":
-                networks = self._scan_windows_wifi()
-            elif self.os_type == "Linux":
-                networks = self._scan_linux_wifi()
-            elif self.os_type == "Darwin":  # macOS
-                networks = self._scan_macos_wifi()
-        except Exception as e:
-            print(f"WiFi scan error: {e}")
-        return networks
-
-    # --- Windows ---------------------------------------------------------
-    def _scan_windows_wifi(self) -> List[Dict]:
-        networks: List[Dict] = []
-        try:
-            result = subprocess.check_output(
-                ["netsh", "wlan", "show", "networks", "mode=bssid"],
-                text=True, encoding="utf-8", errors="ignore"
-            )
-
-            current_ssid = None
-            current_bssid = None
-            current_channel = None
-            current_signal = None
-
-            for raw in result.split('\n'):
-                line = raw.strip()
-                low = _normalize_text(line)
-
-                if low.startswith("ssid"):
-                    if current_ssid and current_bssid and current_channel is not None and current_signal is not None:
-                        networks.append({
-                            "ssid": current_ssid,
-                            "bssid": current_bssid,
-                            "channel": current_channel,
-                            "signal": current_signal,
-                        })
-                    current_ssid = line.split(':', 1)[-1].strip()
-                    current_bssid = None
-                    current_channel = None
-                    current_signal = None
-
-                elif low.startswith("bssid"):
-                    if current_bssid and current_channel is not None and current_signal is not None:
-                        networks.append({
-                            "ssid": current_ssid,
-                            "bssid": current_bssid,
-                            "channel": current_channel,
-                            "signal": current_signal,
-                        })
-                    current_bssid = line.split(':', 1)[-1].strip()
-
-                elif low.startswith("channel") or low.startswith("canal"):
-                    try:
-                        current_channel = int(line.split(':', 1)[-1].strip())
-                    except Exception:
-                        current_channel = None
-
-                elif low.startswith("signal") or low.startswith("senal"):
-                    try:
-                        val = line.split(':', 1)[-1].strip().replace('%', '')
-                        current_signal = int(val)
-                    except Exception:
-                        current_signal = None
-
-            if current_ssid and current_bssid and current_channel is not None and current_signal is not None:
-                networks.append({
-                    "ssid": current_ssid,
-                    "bssid": current_bssid,
-                    "channel": current_channel,
-                    "signal": current_signal,
-                })
-
-        except Exception as e:
-            print(f"Windows WiFi scan error: {e}")
-        return networks
-
-    # --- Linux -----------------------------------------------------------
-    def _scan_linux_wifi(self) -> List[Dict]:
-        networks: List[Dict] = []
-
-        # Try nmcli (no suele requerir root y es estable)
-        if shutil.which("nmcli"):
-            try:
-                out = subprocess.check_output(
-                    ["nmcli", "-t", "-f", "SSID,BSSID,CHAN,SIGNAL", "device", "wifi", "list"],
-                    text=True, encoding="utf-8", errors="ignore"
-                )
-                for row in out.split('\n'):
-                    if not row.strip():
-                        continue
-                    parts = row.split(':')
-                    if len(parts) >= 4:
-                        ssid, bssid, chan, signal = parts[:4]
-                        try:
-                            networks.append({
-                                "ssid": ssid,
-                                "bssid": bssid,
-                                "channel": int(chan or 0),
-                                "signal": int(signal or 0),
-                            })
-                        except Exception:
-                            pass
-                if networks:
-                    return networks
-            except Exception:
-                pass
-
-        # Fallback a iwlist (puede requerir privilegios)
-        def parse_iwlist(txt: str) -> List[Dict]:
-            nets: List[Dict] = []
-            cur: Dict = {}
-            for ln in txt.split('\n'):
-                ln = ln.strip()
-                if "Cell" in ln and "Address" in ln:
-                    if cur:
-                        nets.append(cur)
-                    cur = {"bssid": ln.split('Address:')[-1].strip()}
-                elif "ESSID:" in ln:
-                    cur["ssid"] = ln.split('ESSID:')[-1].strip().strip('"')
-                elif "Channel:" in ln:
-                    try:
-                        cur["channel"] = int(ln.split('Channel:')[-1].strip())
-                    except Exception:
-                        pass
-                elif "Signal level=" in ln:
-                    try:
-                        sig = ln.split('Signal level=')[-1].split(' ')[0]
-                        cur["signal"] = int(sig)
-                    except Exception:
-                        pass
-            if cur:
-                nets.append(cur)
-            return nets
+        ``force_refresh`` escanea aunque haya un resultado dentro del TTL.
+        """
+        return get_scan_cache().get("wifi", self._scan_networks, max_age=max_age, force=force_refresh)
 
-        try:
-            txt = subprocess.check_output(["iwlist", "scan"], text=True, encoding="utf-8", errors="ignore")
-            networks = parse_iwlist(txt)
-            if networks:
-                return networks
-        except Exception:
-            pass
-
-        # Detectar interfaz y reintentar: `iw dev` -> Interface <name>
-        try:
-            iwdev = subprocess.check_output(["iw", "dev"], text=True, encoding="utf-8", errors="ignore")
-            iface = None
-            for ln in iwdev.split('\n'):
-                ln = ln.strip()
-                if ln.startswith("Interface "):
-                    iface = ln.split("Interface ", 1)[1].strip()
-                    break
-            if iface:
-                txt = subprocess.check_output(["iwlist", iface, "scan"], text=True, encoding="utf-8", errors="ignore")
-                networks = parse_iwlist(txt)
-        except Exception as e:
-            print(f"Linux WiFi scan error: {e}")
-
-        return networks
-
-    # --- macOS -----------------------------------------------------------
-    def _scan_macos_wifi(self) -> List[Dict]:
-        networks: List[Dict] = []
-        airport = "/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport"
-        try:
-            out = subprocess.check_output([airport, "-s"], text=True, encoding="utf-8", errors="ignore")
-            lines = out.split('\n')[1:]  # saltar encabezado
-            for ln in lines:
-                if not ln.strip():
-                    continue
-                parts = ln.split()
-                if len(parts) >= 4:
-                    ssid = parts[0]
-                    bssid = parts[1]
-                    try:
-                        channel = int(str(parts[3]).split(',')[0])
-                    except Exception:
-                        channel = 0
-                    try:
-                        signal = int(parts[2])
-                    except Exception:
-                        signal = 0
-                    networks.append({
-                        "ssid": ssid,
-                        "bssid": bssid,
-                        "channel": channel,
-                        "signal": signal,
-                    })
-        except Exception as e:
-            print(f"macOS WiFi scan error: {e}")
-        return networks
+    def _scan_networks(self) -> List[Dict]:
+        # El backend (nmcli, iwlist, netsh, airport...) lo elige el registro
+        # según las utilidades detectadas al arrancar y el último que funcionó
+        networks, _backend = capabilities.dispatch("wifi")
+        return networks or []
 
     # --- Utilidades ------------------------------------------------------
-    def get_channel_analysis(self) -> Dict[int, List[Dict]]:
+    def get_channel_analysis(self, networks: Optional[List[Dict]] = None) -> Dict[int, List[Dict]]:
+        """Redes agrupadas por canal; con ``networks`` usa ese escaneo en lugar de escanear.
+
+        El puntaje de congestión/interferencia está en ``channel_scoring``.
+        """
         channel_usage: Dict[int, List[Dict]] = {}
-        for net in self.get_available_networks():
+        for net in (networks if networks is not None else self.get_available_networks()):
             ch = int(net.get("channel", 0) or 0)
             channel_usage.setdefault(ch, []).append(net)
         return channel_usage
+
+
+def wifi_adapter_summary(force_refresh: bool = False, max_age: Optional[float] = None) -> Dict[str, str]:
+    """Devuelve un dict con interfaz/estado/ssid actual, por OS (cacheado como los escaneos)."""
+    return get_scan_cache().get('adapter', _adapter_summary, max_age=max_age, force=force_refresh)
+
+
+def _adapter_summary() -> Dict[str, str]:
+    resumen = {'interfaz': '-', 'estado': '-', 'ssid': '-'}
+    found, _backend = capabilities.dispatch('adapter')
+    resumen.update(found or {})
+    return resumen
+
+
+# --- Backends -------------------------------------------------------------
+# Cada uno recibe las capacidades detectadas y lanza excepción si su
+# utilidad falla (el registro lo saltea un rato); vacío = probar el siguiente.
+
+def _run(caps: Capabilities, tool: str, *args: str, timeout: float = 30) -> str:
+    return subprocess.check_output([caps.path(tool), *args], text=True, encoding="utf-8",
+                                   errors="ignore", timeout=timeout)
+
+
+def _fields(**values) -> Dict[str, str]:
+    return {k: v.strip() for k, v in values.items() if v and v.strip()}
+
+
+@backend("wifi", "netsh", "Windows", tools=("netsh",))
+def _wifi_netsh(caps: Capabilities) -> List[Dict]:
+    return wifi_parsers.parse_netsh(_run(caps, "netsh", "wlan", "show", "networks", "mode=bssid"))
+
+
+@backend("wifi", "nmcli", "Linux", tools=("nmcli",))
+def _wifi_nmcli(caps: Capabilities) -> List[Dict]:
+    # No suele requerir root y es estable
+    out = _run(caps, "nmcli", "-t", "-f", ",".join(wifi_parsers.NMCLI_FIELDS), "device", "wifi", "list")
+    return wifi_parsers.parse_nmcli(out)
+
+
+@backend("wifi", "iwlist", "Linux", tools=("iwlist",), privileged=True, priority=1)
+def _wifi_iwlist(caps: Capabilities) -> List[Dict]:
+    return wifi_parsers.parse_iwlist(_run(caps, "iwlist", "scan"))
+
+
+def wireless_interfaces(caps: Capabilities) -> List[str]:
+    """Interfaces WiFi según ``iw dev`` (``Interface <nombre>``)."""
+    return re.findall(r"(?m)^\s*Interface\s+(\S+)", _run(caps, "iw", "dev", timeout=8))
+
+
+@backend("wifi", "iw+iwlist", "Linux", tools=("iw", "iwlist"), privileged=True, priority=2)
+def _wifi_iw_iwlist(caps: Capabilities) -> List[Dict]:
+    for iface in wireless_interfaces(caps)[:1]:
+        return wifi_parsers.parse_iwlist(_run(caps, "iwlist", iface, "scan"))
+    return []
+
+
+@backend("wifi", "airport", "Darwin", tools=("airport",))
+def _wifi_airport(caps: Capabilities) -> List[Dict]:
+    return wifi_parsers.parse_airport(_run(caps, "airport", "-s"))
+
+
+@backend("adapter", "netsh", "Windows", tools=("netsh",))
+def _adapter_netsh(caps: Capabilities) -> Dict[str, str]:
+    raw = _run(caps, "netsh", "wlan", "show", "interfaces", timeout=8)
+    # Interfaz, Estado, SSID (multi-idioma aproximado)
+    name = re.search(r"(?im)^\s*(?:Nombre|Name)\s*:\s*(.+)$", raw)
+    state = re.search(r"(?im)^\s*(?:Estado|State)\s*:\s*(.+)$", raw)
+    ssid = re.search(r"(?im)^\s*SSID\s*:\s*(.+)$", raw)
+    return _fields(interfaz=name and name.group(1), estado=state and state.group(1), ssid=ssid and ssid.group(1))
+
+
+@backend("adapter", "nmcli", "Linux", tools=("nmcli",))
+def _adapter_nmcli(caps: Capabilities) -> Dict[str, str]:
+    out = _run(caps, "nmcli", "-t", "-f", "DEVICE,TYPE,STATE,CONNECTION", "device", timeout=8)
+    for line in out.splitlines():
+        parts = wifi_parsers.split_nmcli(line)
+        if len(parts) >= 4 and parts[1] == "wifi":
+            return _fields(interfaz=parts[0], estado=parts[2], ssid=parts[3])
+    return {}
+
+
+@backend("adapter", "ip", "Linux", tools=("ip",), priority=1)
+def _adapter_ip(caps: Capabilities) -> Dict[str, str]:
+    found = {}
+    if caps.has("iwgetid"):
+        try:
+            found = _fields(ssid=_run(caps, "iwgetid", "-r", timeout=8))
+        except subprocess.CalledProcessError:
+            pass  # sin red asociada
+    # Primera interfaz UP que no sea loopback
+    for ln in _run(caps, "ip", "-br", "link", timeout=8).splitlines():
+        cols = ln.split()
+        if len(cols) >= 2 and "UP" in cols[1] and not cols[0].startswith("lo"):
+            found.update(interfaz=cols[0], estado="UP")
+            break
+    return found
+
+
+@backend("adapter", "airport", "Darwin", tools=("airport",))
+def _adapter_airport(caps: Capabilities) -> Dict[str, str]:
+    ssid = re.search(r"(?im)^\s*SSID\s*:\s*(.+)$", _run(caps, "airport", "-I", timeout=8))
+    found = _fields(ssid=ssid and ssid.group(1))
+    if caps.has("ifconfig"):
+        # Heurística: interfaz del bloque con 'status: active'
+        current = None
+        for ln in _run(caps, "ifconfig", timeout=8).splitlines():
+            if not ln.startswith("\t") and ":" in ln:
+                current = ln.split(":", 1)[0]
+            if "status: active" in ln and current:
+                found.update(interfaz=current, estado="active")
+                break
+    return found
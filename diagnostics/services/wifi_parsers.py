@@ -0,0 +1,228 @@
+"""Parsers de las salidas de escaneo WiFi (netsh, nmcli -t, iwlist, airport -s).
+
+Cada formato tiene una expresión regular compilada que recorre el texto
+completo una sola vez (``finditer`` en modo multilínea), en lugar de partir
+línea por línea y normalizar cada una. Las etiquetas localizadas de netsh
+(Señal/Signal/Kanal/Sinal...) están en la propia expresión y aceptan el
+acento compuesto, descompuesto (NFD) o ausente.
+
+Todos devuelven dicts ``{ssid, bssid, channel, signal, security}``; la señal
+queda en la unidad del formato (% en netsh/nmcli, dBm en iwlist/airport).
+"""
+import re
+import unicodedata
+from typing import Callable, Dict, List
+
+# Letras acentuadas de las etiquetas -> letra base (ł no tiene descomposición)
+_ACCENTS = {"ñ": "n", "á": "a", "é": "e", "í": "i", "ó": "o", "ú": "u",
+            "ç": "c", "ã": "a", "õ": "o", "ü": "u", "è": "e", "ê": "e"}
+
+
+def _label(word: str) -> str:
+    """Regex de una etiqueta que admite cada acento compuesto, descompuesto o sin él."""
+    out = []
+    for ch in word:
+        base = _ACCENTS.get(ch.lower())
+        if base is None:
+            out.append(re.escape(ch))
+        else:
+            decomposed = unicodedata.normalize("NFD", ch)
+            out.append(f"(?:{ch}|{decomposed}|{base})")
+    return "".join(out)
+
+
+def _labels(*words: str) -> str:
+    return "|".join(_label(w) for w in sorted(words, key=len, reverse=True))
+
+
+# --- netsh wlan show networks mode=bssid ---------------------------------
+NETSH_LABELS = {
+    "ssid": ("SSID",),
+    "bssid": ("BSSID",),
+    "signal": ("Signal", "Señal", "Sinal", "Segnale", "Sygnał"),
+    "channel": ("Channel", "Canal", "Kanal", "Canale", "Kanał"),
+    "auth": ("Authentication", "Autenticación", "Authentification", "Authentifizierung",
+             "Autenticação", "Autenticazione", "Uwierzytelnianie"),
+}
+
+
+def _fold(label: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", label.lower()) if not unicodedata.combining(c))
+
+
+# etiqueta sin acentos -> clave; la expresión acepta todas las variantes
+_NETSH_KEYS = {_fold(w): key for key, words in NETSH_LABELS.items() for w in words}
+_NETSH_WORDS = [w for words in NETSH_LABELS.values() for w in words]
+# El lookahead de la primera letra descarta rápido las líneas sin etiqueta conocida
+_NETSH_RE = re.compile(
+    r"^[ \t]*(?=[" + "".join(sorted({w[0] for w in _NETSH_WORDS})) + r"])"
+    r"(?P<label>" + _labels(*_NETSH_WORDS) + r")(?:[ \t]+\d+)?[ \t]*:[ \t]*(?P<value>[^\r\n]*)",
+    re.MULTILINE,
+)
+# Hay pocas grafías distintas por salida: se pliegan una vez cada una, no por línea
+_label_keys: Dict[str, str] = {}
+
+
+def _netsh_key(label: str) -> str:
+    key = _label_keys.get(label)
+    if key is None:
+        key = _label_keys[label] = _NETSH_KEYS[_fold(label)]
+    return key
+
+
+_LEADING_INT = re.compile(r"\s*(-?\d+)")
+
+
+def _int(value: str):
+    try:
+        return int(value.rstrip(" \t\r%"))
+    except ValueError:
+        m = _LEADING_INT.match(value)
+        return int(m.group(1)) if m else None
+
+
+def parse_netsh(text: str) -> List[Dict]:
+    networks: List[Dict] = []
+    ssid, auth = None, ""
+    cur = None
+
+    def emit():
+        if cur and cur["channel"] is not None and cur["signal"] is not None:
+            networks.append(cur)
+
+    for m in _NETSH_RE.finditer(text):
+        key = _netsh_key(m.group("label"))
+        value = m.group("value").rstrip()
+        if key == "ssid":
+            emit()
+            ssid, auth, cur = value, "", None
+        elif key == "bssid":
+            emit()
+            cur = {"ssid": ssid or "", "bssid": value.lower(), "channel": None, "signal": None, "security": auth}
+        elif key == "auth":
+            auth = value
+        elif cur is not None:
+            cur[key] = _int(value)
+    emit()
+    return networks
+
+
+# --- nmcli -t -f SSID,BSSID,CHAN,SIGNAL,SECURITY device wifi list --------
+NMCLI_FIELDS = ("SSID", "BSSID", "CHAN", "SIGNAL", "SECURITY")
+# Campo de nmcli -t: ':' separa, '\:' y '\\' son escapes
+_NMCLI_FIELD = r"([^:\\\r\n]*(?:\\.[^:\\\r\n]*)*)"
+_NMCLI_RE = re.compile(r"^" + r":".join([_NMCLI_FIELD] * len(NMCLI_FIELDS)) + r"\r?$", re.MULTILINE)
+_NMCLI_ESCAPE = re.compile(r"\\(.)")
+_NMCLI_SPLIT = re.compile(r"((?:[^:\\]|\\.)*)(:|$)")
+
+
+def split_nmcli(line: str) -> List[str]:
+    """Campos de una línea de ``nmcli -t`` respetando los escapes."""
+    fields = []
+    for m in _NMCLI_SPLIT.finditer(line.rstrip("\r\n")):
+        fields.append(_NMCLI_ESCAPE.sub(r"\1", m.group(1)))
+        if not m.group(2):
+            break
+    return fields
+
+
+def parse_nmcli(text: str) -> List[Dict]:
+    networks: List[Dict] = []
+    unescape = _NMCLI_ESCAPE.sub
+    for ssid, bssid, chan, signal, security in _NMCLI_RE.findall(text):
+        try:
+            channel, sig = int(chan or 0), int(signal or 0)
+        except ValueError:
+            continue
+        networks.append({
+            "ssid": unescape(r"\1", ssid) if "\\" in ssid else ssid,
+            # En el BSSID el único escape posible es '\:'
+            "bssid": bssid.replace("\\:", ":").lower(),
+            "channel": channel,
+            "signal": sig,
+            "security": "" if security == "--" else security,
+        })
+    return networks
+
+
+# --- iwlist scan ------------------------------------------------------------
+_IWLIST_RE = re.compile(
+    r"Cell \d+ - Address: (?P<bssid>[0-9A-Fa-f:]{17})"
+    r"|Channel[:\s](?P<channel>\d+)"
+    r"|Signal level[=:](?P<signal>-?\d+)"
+    r'|ESSID:"(?P<ssid>[^"\r\n]*)"'
+    r"|Encryption key:(?P<key>on|off)"
+    r"|IE: (?:IEEE 802\.11i/)?(?P<wpa>WPA2?)"
+)
+
+
+def parse_iwlist(text: str) -> List[Dict]:
+    networks: List[Dict] = []
+    cur = None
+
+    def emit():
+        if cur is not None:
+            if not cur["security"]:
+                cur["security"] = "WEP" if cur.pop("_key", "off") == "on" else "Open"
+            cur.pop("_key", None)
+            networks.append(cur)
+
+    for m in _IWLIST_RE.finditer(text):
+        kind = m.lastgroup
+        if kind == "bssid":
+            emit()
+            cur = {"ssid": "", "bssid": m.group("bssid").lower(), "channel": 0, "signal": 0, "security": ""}
+        elif cur is None:
+            continue
+        elif kind == "channel":
+            # "Channel:36" y "Frequency:5.18 GHz (Channel 36)" dan lo mismo
+            cur["channel"] = int(m.group("channel"))
+        elif kind == "signal":
+            cur["signal"] = int(m.group("signal"))
+        elif kind == "ssid":
+            cur["ssid"] = m.group("ssid")
+        elif kind == "key":
+            cur["_key"] = m.group("key")
+        elif kind == "wpa":
+            # WPA2 tiene prioridad si la celda anuncia ambos
+            if cur["security"] != "WPA2":
+                cur["security"] = m.group("wpa")
+    emit()
+    return networks
+
+
+# --- airport -s -------------------------------------------------------------
+# El SSID va alineado a la derecha y puede tener espacios: se ancla en el BSSID.
+# Los espacios iniciales se toman sin retroceso ((?=(...))\1, equivalente a
+# *+ en Python < 3.11) para no reintentar sobre ellos en el encabezado.
+_AIRPORT_RE = re.compile(
+    r"^(?=([ \t]*))\1(?P<ssid>[^\r\n]*?)[ \t]*(?<=[ \t])(?P<bssid>[0-9a-fA-F]{1,2}(?::[0-9a-fA-F]{1,2}){5})[ \t]+"
+    r"(?P<rssi>-?\d+)[ \t]+(?P<channel>\d+)(?:,[-+]?\d+)?[ \t]+\S+[ \t]+\S+[ \t]+(?P<security>[^\r\n]*?)[ \t]*\r?$",
+    re.MULTILINE,
+)
+
+
+def parse_airport(text: str) -> List[Dict]:
+    # airport omite los ceros a la izquierda de cada octeto (0:1a:...)
+    return [{
+        "ssid": ssid,
+        "bssid": bssid.lower() if len(bssid) == 17 else ":".join(p.zfill(2) for p in bssid.lower().split(":")),
+        "channel": int(channel),
+        "signal": int(rssi),
+        "security": security,
+    } for _lead, ssid, bssid, rssi, channel, security in _AIRPORT_RE.findall(text)]
+
+
+PARSERS: Dict[str, Callable[[str], List[Dict]]] = {
+    "netsh": parse_netsh,
+    "nmcli": parse_nmcli,
+    "iwlist": parse_iwlist,
+    "airport": parse_airport,
+}
+
+
+def parse(fmt: str, text: str) -> List[Dict]:
+    try:
+        return PARSERS[fmt](text)
+    except KeyError:
+        raise ValueError(f"Formato desconocido: {fmt}")
@@ -0,0 +1,114 @@
+"""Series de señal por BSSID en bloques binarios (``SignalBlock``).
+
+Cada escaneo WiFi agrega a cada BSSID una muestra de 4 bytes (segundos desde
+el inicio del bloque, señal y canal) en el bloque de su ventana fija de
+``BLOCK_SECONDS``. Semanas de cientos de APs son unos miles de filas, y leer
+un rango es traer los bloques que lo cubren y filtrarlos con numpy.
+
+``record()`` se llama desde el job de escaneo WiFi; ``series()`` arma las
+series para graficar (opcionalmente promediadas por intervalo de ``step``
+segundos).
+"""
+from datetime import datetime, timezone as dt_timezone, timedelta
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SignalBlock
+
+# Ventana de cada bloque; el desplazamiento de cada muestra entra en uint16
+BLOCK_SECONDS = 6 * 3600
+SAMPLE = np.dtype([('dt', '<u2'), ('signal', 'i1'), ('channel', 'u1')])
+
+
+def block_start(ts: int) -> int:
+    return ts - ts % BLOCK_SECONDS
+
+
+def _pack(dt: int, signal, channel) -> bytes:
+    sample = np.zeros(1, dtype=SAMPLE)
+    sample['dt'] = dt
+    sample['signal'] = max(-128, min(127, int(signal or 0)))
+    sample['channel'] = max(0, min(255, int(channel or 0)))
+    return sample.tobytes()
+
+
+def record(networks: Iterable[Dict], now: Optional[datetime] = None) -> int:
+    """Agrega una muestra por BSSID al bloque vigente; devuelve cuántos BSSID se registraron."""
+    ts = int((now or timezone.now()).timestamp())
+    start_ts = block_start(ts)
+    start = datetime.fromtimestamp(start_ts, tz=dt_timezone.utc)
+    samples = {}
+    for n in networks:
+        bssid = (n.get('bssid') or '').lower()
+        if bssid:
+            samples[bssid] = (n.get('ssid') or '', _pack(ts - start_ts, n.get('signal'), n.get('channel')))
+    if not samples:
+        return 0
+    with transaction.atomic():
+        blocks = {b.bssid: b for b in SignalBlock.objects.filter(start=start, bssid__in=list(samples))}
+        create, update = [], []
+        for bssid, (ssid, data) in samples.items():
+            block = blocks.get(bssid)
+            if block is None:
+                create.append(SignalBlock(bssid=bssid, ssid=ssid, start=start, count=1, data=data))
+                continue
+            block.data = bytes(block.data) + data
+            block.count += 1
+            block.ssid = ssid or block.ssid
+            update.append(block)
+        if create:
+            SignalBlock.objects.bulk_create(create)
+        if update:
+            SignalBlock.objects.bulk_update(update, ['data', 'count', 'ssid'])
+    return len(samples)
+
+
+def _resample(t, signal, channel, step: int):
+    """Promedio de señal (y último canal) por intervalo de ``step`` segundos."""
+    bins = t // step
+    keys, idx, counts = np.unique(bins, return_inverse=True, return_counts=True)
+    mean = np.bincount(idx, weights=signal) / counts
+    last = np.zeros(len(keys), dtype=np.int64)
+    last[idx] = np.arange(len(idx))  # índice de la última muestra de cada intervalo
+    return keys * step, np.round(mean, 1), channel[last]
+
+
+def series(start: datetime, end: datetime, bssids: Optional[Iterable[str]] = None,
+           step: int = 0) -> Dict[str, Dict]:
+    """``{bssid: {ssid, t, signal, channel}}`` con ``t`` en segundos epoch dentro de [start, end)."""
+    lo, hi = int(start.timestamp()), int(end.timestamp())
+    qs = SignalBlock.objects.filter(
+        start__gte=datetime.fromtimestamp(block_start(lo), tz=dt_timezone.utc),
+        start__lt=end,
+    )
+    if bssids:
+        qs = qs.filter(bssid__in=[b.lower() for b in bssids])
+    parts: Dict[str, Dict] = {}
+    for bssid, ssid, block_at, data in qs.order_by('bssid', 'start').values_list('bssid', 'ssid', 'start', 'data'):
+        arr = np.frombuffer(bytes(data), dtype=SAMPLE)
+        t = arr['dt'].astype(np.int64) + int(block_at.timestamp())
+        mask = (t >= lo) & (t < hi)
+        if not mask.any():
+            continue
+        entry = parts.setdefault(bssid, {'ssid': ssid, 't': [], 'signal': [], 'channel': []})
+        entry['ssid'] = ssid or entry['ssid']
+        entry['t'].append(t[mask])
+        entry['signal'].append(arr['signal'][mask].astype(np.int64))
+        entry['channel'].append(arr['channel'][mask].astype(np.int64))
+    out = {}
+    for bssid, entry in parts.items():
+        t, signal, channel = (np.concatenate(entry[k]) for k in ('t', 'signal', 'channel'))
+        if step > 0:
+            t, signal, channel = _resample(t, signal, channel, step)
+        out[bssid] = {'ssid': entry['ssid'], 't': t.tolist(), 'signal': signal.tolist(),
+                      'channel': channel.tolist()}
+    return out
+
+
+def expired(now: Optional[datetime] = None, days: int = 90):
+    """Bloques que terminaron hace más de ``days`` días (para retention.py)."""
+    cutoff = (now or timezone.now()) - timedelta(days=days) - timedelta(seconds=BLOCK_SECONDS)
+    return SignalBlock.objects.filter(start__lt=cutoff)
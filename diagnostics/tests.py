@@ -0,0 +1,1406 @@
+import asyncio
+import base64
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import numpy as np
+
+from django.db.models import F
+from django.test import Client, LiveServerTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import jobs
+from .models import (Device, Job, KnownDevice, MetricRollup, ScanRun, SignalBlock, SpeedTest, TrafficSample,
+                     WiFiNetwork)
+from . import api, charts, congestion, exports, inventory, retention, rollups, signal_store
+from .services.hostname_resolver import HostnameResolver, UNKNOWN
+from .services import neighbor_table
+from .services import network_scanner
+from .services.network_scanner import HostDiscovery, NetworkScanner, local_subnets
+from .services import pcap_ingest
+from .services.traffic_monitor import as_mbps
+from .services.traffic_collector import TrafficCollector
+from .services.live_feed import LiveFeed
+from .services import wifi_parsers
+from .services import wifi_analyzer
+from .services.wifi_analyzer import WiFiAnalyzer
+from .services import channel_scoring
+from .services.scan_cache import ScanCache
+from .services import command_runner
+from .services import capabilities
+from .services import throughput
+from .services import latency
+from .services import process_attribution
+from .services import interface_rates
+from .services import host_lock
+from . import apps as diagnostics_apps
+from .services.speed_test import SpeedTester
+from .services.speedtest_servers import ServerSelection
+from .management.commands.bench_pcap import _frame
+from .management.commands import bench_wifi_parsers
+
+
+class JobEngineTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.register('test_ok')(lambda params: self.calls.append(params) or {'ok': True})
+        jobs.register('test_fail')(self._boom)
+        # Ejecutar en línea en lugar de en el pool
+        patcher = mock.patch.object(jobs, '_get_executor')
+        self.executor = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.addCleanup(jobs.JOB_HANDLERS.pop, 'test_ok', None)
+        self.addCleanup(jobs.JOB_HANDLERS.pop, 'test_fail', None)
+
+    @staticmethod
+    def _boom(params):
+        raise RuntimeError('sin red')
+
+    def test_submit_reuses_active_job(self):
+        first = jobs.submit('test_ok')
+        second = jobs.submit('test_ok')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(self.executor.submit.call_count, 1)
+
+    def test_different_params_are_not_reused(self):
+        jobs.PARAM_CLEANERS['test_ok'] = dict
+        self.addCleanup(jobs.PARAM_CLEANERS.pop, 'test_ok', None)
+        a = jobs.submit('test_ok', {'n': 1})
+        b = jobs.submit('test_ok', {'n': 2})
+        self.assertNotEqual(a.id, b.id)
+
+    def test_execute_stores_result(self):
+        job = jobs.submit('test_ok')
+        jobs._execute(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.result, {'ok': True})
+        self.assertIsNotNone(job.finished_at)
+
+    def test_recent_done_job_is_reused(self):
+        job = jobs.submit('test_ok')
+        jobs._execute(job.id)
+        self.assertEqual(jobs.submit('test_ok').id, job.id)
+        self.assertNotEqual(jobs.submit('test_ok', reuse=False).id, job.id)
+
+    def test_execute_failure_marks_job_failed(self):
+        job = jobs.submit('test_fail')
+        with mock.patch('traceback.print_exc'):
+            jobs._execute(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'sin red')
+
+    def test_stale_running_job_is_orphaned(self):
+        job = Job.objects.create(kind='test_ok', status='running', worker=jobs.WORKER_ID,
+                                 started_at=timezone.now() - timedelta(hours=1))
+        self.assertTrue(jobs.is_orphan(job))
+        new = jobs.submit('test_ok')
+        self.assertNotEqual(new.id, job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_job_from_dead_process_is_orphaned(self):
+        host = jobs.WORKER_ID.rpartition(':')[0]
+        job = Job.objects.create(kind='test_ok', status='queued', worker=f'{host}:999999')
+        with mock.patch.object(jobs, '_pid_alive', return_value=False):
+            self.assertTrue(jobs.is_orphan(job))
+            self.assertEqual(jobs.fail_orphans(), 1)
+
+    def test_traffic_params_are_validated(self):
+        self.assertEqual(jobs.clean_params('traffic', {'duration_sec': '5'}), {'duration_sec': 5.0})
+        with self.assertRaises(ValueError):
+            jobs.clean_params('traffic', {'duration_sec': '600'})
+        self.assertEqual(jobs.clean_params('speedtest', {'x': 1}), {})
+
+
+class JobViewTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(jobs, '_get_executor')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_does_not_start_job(self):
+        resp = self.client.get('/speedtest/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(Job.objects.exists())
+
+    def test_submit_requires_csrf(self):
+        client = Client(enforce_csrf_checks=True)
+        resp = client.post('/jobs/speedtest/submit/')
+        self.assertEqual(resp.status_code, 403)
+
+    @override_settings(DIAGNOSTICS_API_TOKEN='secreto')
+    def test_submit_with_token_and_params(self):
+        client = Client(enforce_csrf_checks=True)
+        resp = client.post('/jobs/traffic/submit/', {'duration_sec': 4},
+                           HTTP_X_DIAGNOSTICS_TOKEN='secreto')
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(Job.objects.get(pk=resp.json()['id']).params, {'duration_sec': 4.0})
+
+    @override_settings(DIAGNOSTICS_API_TOKEN='secreto')
+    def test_submit_rejects_bad_params(self):
+        resp = self.client.post('/jobs/traffic/submit/', '{"duration_sec": "x"}',
+                                content_type='application/json',
+                                HTTP_AUTHORIZATION='Token secreto')
+        self.assertEqual(resp.status_code, 400)
+
+
+class HostnameResolverTests(TestCase):
+    def make(self, names, **kw):
+        self.lookups = []
+
+        def fake_lookup(ip):
+            self.lookups.append(ip)
+            return names.get(ip, '')
+        return HostnameResolver(lookup=fake_lookup, **kw)
+
+    def test_batch_resolution_and_cache(self):
+        r = self.make({'10.0.0.1': 'router.lan'})
+        self.assertEqual(r.resolve_many(['10.0.0.1', '10.0.0.2', '10.0.0.1']),
+                         {'10.0.0.1': 'router.lan', '10.0.0.2': UNKNOWN})
+        # Segunda vuelta: todo sale de la caché, incluido el negativo
+        r.resolve_many(['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(sorted(self.lookups), ['10.0.0.1', '10.0.0.2'])
+
+    def test_negative_ttl_expires(self):
+        r = self.make({}, negative_ttl=0)
+        r.resolve('10.0.0.9')
+        r.resolve('10.0.0.9')
+        self.assertEqual(self.lookups, ['10.0.0.9', '10.0.0.9'])
+
+    def test_timed_out_lookup_returns_empty_and_caches_later(self):
+        release = threading.Event()
+
+        def slow_lookup(ip):
+            release.wait(5)
+            return 'lento.lan'
+        r = HostnameResolver(lookup=slow_lookup, timeout=0.05)
+        self.assertEqual(r.resolve('10.0.0.3'), '')
+        inflight = r._inflight['10.0.0.3']
+        release.set()
+        inflight.result(5)
+        self.assertEqual(r.cached('10.0.0.3'), 'lento.lan')
+
+
+PROC_ARP_FIXTURE = """IP address       HW type     Flags       HW address            Mask     Device
+192.168.1.1      0x1         0x2         aa:bb:cc:00:00:01     *        wlan0
+192.168.1.20     0x1         0x0         00:00:00:00:00:00     *        wlan0
+192.168.1.30     0x1         0x6         aa:bb:cc:00:00:30     *        wlan0
+192.168.1.40     0x1         0x2         00:00:00:00:00:00     *        wlan0
+"""
+
+
+class NeighborTableTests(TestCase):
+    def write_arp(self, text):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_read_proc_arp_filters_incomplete_entries(self):
+        devices = neighbor_table.read_proc_arp(self.write_arp(PROC_ARP_FIXTURE))
+        self.assertEqual([d['ip'] for d in devices], ['192.168.1.1', '192.168.1.30'])
+        self.assertEqual(devices[0]['mac'], 'aa:bb:cc:00:00:01')
+        self.assertEqual(devices[0]['iface'], 'wlan0')
+
+    def test_parse_neigh_event(self):
+        parse = neighbor_table.parse_neigh_event
+        ev = parse('192.168.1.5 dev wlan0 lladdr AA:BB:CC:DD:EE:FF extern_learn REACHABLE')
+        self.assertEqual((ev['event'], ev['ip'], ev['mac'], ev['iface']),
+                         ('add', '192.168.1.5', 'aa:bb:cc:dd:ee:ff', 'wlan0'))
+        self.assertEqual(parse('Deleted 192.168.1.5 dev wlan0 lladdr aa:bb:cc:dd:ee:ff STALE')['event'], 'remove')
+        self.assertEqual(parse('miss 192.168.1.9 dev eth0 INCOMPLETE')['event'], 'remove')
+        self.assertEqual(parse('192.168.1.7 dev eth0 lladdr aa:bb:cc:dd:ee:01 router STALE')['event'], 'add')
+        self.assertIsNone(parse('fe80::1 dev eth0 lladdr aa:bb:cc:dd:ee:01 STALE'))
+        self.assertIsNone(parse(''))
+
+    def test_apply_event_updates_table_and_notifies(self):
+        table = neighbor_table.NeighborTable(proc_path=self.write_arp(PROC_ARP_FIXTURE))
+        table.snapshot()
+        seen = []
+        table.add_listener(lambda event, dev: seen.append((event, dev['ip'])))
+        parse = neighbor_table.parse_neigh_event
+        self.assertTrue(table.apply_event(parse('192.168.1.50 dev wlan0 lladdr aa:bb:cc:00:00:50 REACHABLE')))
+        # Mismo MAC: sin cambios
+        self.assertFalse(table.apply_event(parse('192.168.1.50 dev wlan0 lladdr aa:bb:cc:00:00:50 STALE')))
+        self.assertTrue(table.apply_event(parse('Deleted 192.168.1.1 dev wlan0 lladdr aa:bb:cc:00:00:01 STALE')))
+        self.assertFalse(table.apply_event(parse('192.168.1.99 dev wlan0 FAILED')))
+        self.assertEqual(sorted(d['ip'] for d in table.devices()), ['192.168.1.30', '192.168.1.50'])
+        self.assertEqual(seen, [('add', '192.168.1.50'), ('remove', '192.168.1.1')])
+
+    def test_snapshot_resync_reports_differences(self):
+        path = self.write_arp(PROC_ARP_FIXTURE)
+        table = neighbor_table.NeighborTable(proc_path=path)
+        table.snapshot()
+        seen = []
+        table.add_listener(lambda event, dev: seen.append((event, dev['ip'])))
+        with open(path, 'w') as fh:
+            fh.write(PROC_ARP_FIXTURE.replace('192.168.1.30', '192.168.1.31'))
+        table.snapshot()
+        self.assertEqual(sorted(seen), [('add', '192.168.1.31'), ('remove', '192.168.1.30')])
+
+
+class HostDiscoveryTests(TestCase):
+    def fake_addrs(self, *pairs, docker=()):
+        def addrs(items):
+            return [mock.Mock(family=socket.AF_INET, address=a, netmask=m) for a, m in items]
+        return mock.patch('psutil.net_if_addrs', return_value={'eth0': addrs(pairs), 'docker0': addrs(docker)})
+
+    def test_local_subnets_from_interfaces(self):
+        with self.fake_addrs(('10.1.2.3', '255.255.252.0'), ('127.0.0.1', '255.0.0.0'),
+                             ('169.254.1.1', '255.255.0.0'), ('172.16.5.5', '255.0.0.0'),
+                             docker=[('172.17.0.1', '255.255.0.0')]):
+            nets = [str(n) for n in local_subnets()]
+            # per_subnet pide un rango mayor o una interfaz virtual explícitamente
+            configured = [str(n) for n in local_subnets(configured=['10.1.0.0/22', '172.17.0.0/24'])]
+        # Recortadas a /24 y sin el bridge de docker (un /16 son ~512 s de barrido)
+        self.assertEqual(nets, ['10.1.2.0/24', '172.16.5.0/24'])
+        self.assertEqual(configured, ['10.1.0.0/22', '172.16.5.0/24', '172.17.0.0/24'])
+
+    def test_loopback_sweep_finds_hosts(self):
+        # 127/8 entero responde en Linux; sirve de banco de pruebas sin red
+        discovery = HostDiscovery(timeout=1.0, icmp=False)
+        with mock.patch.object(network_scanner, '_local_addresses', return_value={'127.0.0.1'}):
+            found = discovery.discover(['127.0.0.0/29'])
+        self.assertEqual(sorted(d['ip'] for d in found),
+                         ['127.0.0.2', '127.0.0.3', '127.0.0.4', '127.0.0.5', '127.0.0.6'])
+
+    def test_per_subnet_overrides(self):
+        discovery = HostDiscovery(per_subnet={'10.0.0.5/22': {'timeout': 3}})
+        self.assertEqual(discovery.per_subnet, {'10.0.0.0/22': {'timeout': 3}})
+
+    def test_scanner_merges_discovered_hosts(self):
+        discovery = mock.Mock()
+        discovery.discover.return_value = [{'ip': '10.0.0.9', 'mac': '', 'hostname': '', 'method': 'tcp'}]
+        resolver = HostnameResolver(lookup=lambda ip: 'equipo.lan')
+        scanner = NetworkScanner(resolver=resolver, discovery=discovery)
+        with mock.patch.object(scanner, '_scan_linux', return_value=[{'ip': '10.0.0.1', 'mac': 'aa', 'hostname': ''}]), \
+                mock.patch.object(scanner, 'os_type', 'Linux'):
+            devices = scanner.get_connected_devices(force_refresh=True)
+        self.assertEqual(sorted(d['ip'] for d in devices), ['10.0.0.1', '10.0.0.9'])
+        self.assertTrue(all(d['hostname'] == 'equipo.lan' for d in devices))
+
+
+class PcapIngestTests(TestCase):
+    LOCAL = '192.168.1.10'
+
+    def write_pcap(self, frames, linktype=pcap_ingest.LINKTYPE_ETHERNET):
+        fd, path = tempfile.mkstemp(suffix='.pcap')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        pcap_ingest.write_pcap(path, frames, linktype)
+        return path
+
+    def test_parse_ipv4_fields_and_filters(self):
+        vlan = _frame('8.8.8.8', self.LOCAL, 10, 53, 4000)
+        vlan = vlan[:12] + b'\x81\x00\x00\x05' + vlan[12:]
+        arp = b'\xff' * 12 + b'\x08\x06' + b'\x00' * 28
+        path = self.write_pcap([(1.0, _frame(self.LOCAL, '1.1.1.1', 100, 5000, 443)),
+                                (1.5, arp), (2.0, vlan)])
+        block = pcap_ingest.read_pcap(path)
+        self.assertEqual(len(block), 3)
+        pkts = pcap_ingest.parse_ipv4(block)
+        self.assertEqual(len(pkts), 2)
+        self.assertEqual(pcap_ingest.int_to_ip(pkts['src'][0]), self.LOCAL)
+        self.assertEqual((pkts['sport'][0], pkts['dport'][0], pkts['proto'][0]), (5000, 443, 6))
+        self.assertEqual(pcap_ingest.int_to_ip(pkts['src'][1]), '8.8.8.8')
+        self.assertEqual(pkts['dport'][1], 4000)
+        self.assertEqual(pkts['ts'].tolist(), [1.0, 2.0])
+
+    def test_aggregate_matches_sample_bandwidth_format(self):
+        out = _frame(self.LOCAL, '1.1.1.1', 100, 5000, 443)
+        inc = _frame('1.1.1.1', self.LOCAL, 500, 443, 5000)
+        lan = _frame(self.LOCAL, '192.168.1.11', 50, 1, 2)
+        path = self.write_pcap([(0.0, out), (0.5, inc), (1.0, inc), (2.0, lan)])
+        stats = pcap_ingest.sample_pcap(path, local_ips=[self.LOCAL, '192.168.1.11'])
+        self.assertEqual(list(stats), ['1.1.1.1'])
+        self.assertEqual(stats['1.1.1.1']['bytes_out'], len(out))
+        self.assertEqual(stats['1.1.1.1']['bytes_in'], 2 * len(inc))
+        self.assertEqual(stats['1.1.1.1']['_elapsed'], 2.0)
+        row = as_mbps(stats)[0]
+        self.assertEqual(row['ip'], '1.1.1.1')
+        self.assertAlmostEqual(row['download_mbps'], round(2 * len(inc) * 8 / 2.0 / 1e6, 3))
+
+
+class TrafficCollectorTests(TestCase):
+    LOCAL = '192.168.1.10'
+    NOW = 1_700_000_000.0
+
+    def packets(self, *rows):
+        # (ts, src, dst, length)
+        pkts = np.zeros(len(rows), dtype=pcap_ingest.PACKET_DTYPE)
+        for i, (ts, src, dst, length) in enumerate(rows):
+            pkts[i]['ts'] = ts
+            pkts[i]['src'] = pcap_ingest.ip_to_int([src])[0]
+            pkts[i]['dst'] = pcap_ingest.ip_to_int([dst])[0]
+            pkts[i]['length'] = length
+        return pkts
+
+    def test_rolling_windows(self):
+        collector = TrafficCollector(local_ips=[self.LOCAL])
+        now = self.NOW + 0.5
+        collector.ingest(self.packets(
+            (now - 1.0, '1.1.1.1', self.LOCAL, 125_000),   # último segundo completo
+            (now - 1.2, self.LOCAL, '1.1.1.1', 125_000),
+            (now - 30, '2.2.2.2', self.LOCAL, 6_000_000),  # dentro del último minuto
+            (now - 600, '3.3.3.3', self.LOCAL, 90_000_000),
+            (now - 0.1, '4.4.4.4', self.LOCAL, 1_000),     # segundo en curso: no cuenta aún
+            (now - 1, self.LOCAL, '192.168.1.10', 500),    # local<->local
+        ), [self.LOCAL])
+        snap = collector.snapshot(now=now)
+        self.assertEqual(snap['1s'], [{'ip': '1.1.1.1', 'download_mbps': 1.0, 'upload_mbps': 1.0}])
+        self.assertEqual([r['ip'] for r in snap['1m']], ['2.2.2.2', '1.1.1.1'])
+        self.assertEqual(snap['1m'][0]['download_mbps'], 0.8)
+        self.assertEqual([r['ip'] for r in snap['15m']], ['3.3.3.3', '2.2.2.2', '1.1.1.1'])
+        self.assertEqual(snap['15m'][0]['download_mbps'], 0.8)
+
+    def test_ring_reuses_slots_and_prunes_idle_ips(self):
+        collector = TrafficCollector(local_ips=[self.LOCAL])
+        collector.add(self.NOW - 901, '1.1.1.1', bytes_in=1_000_000)
+        collector.add(self.NOW - 1, '1.1.1.1', bytes_in=125_000)  # mismo slot, otra vuelta
+        collector.add(self.NOW - 2000, '5.5.5.5', bytes_in=10)
+        self.assertEqual(collector.rates(900, now=self.NOW)[0]['download_mbps'], round(1 / 900, 3))
+        self.assertEqual(collector.prune(now=self.NOW), 1)
+        self.assertEqual([r['ip'] for r in collector.rates(900, now=self.NOW)], ['1.1.1.1'])
+
+    def test_flush_appends_samples(self):
+        TrafficSample.objects.create(ip='9.9.9.9', download_mbps=1, upload_mbps=1)
+        collector = TrafficCollector(local_ips=[self.LOCAL], flush_interval=60,
+                                     on_flush=jobs.store_traffic_samples)
+        collector.add(self.NOW - 10, '1.1.1.1', bytes_in=750_000)
+        rows = collector.flush(now=self.NOW)
+        self.assertEqual(rows[0]['download_mbps'], 0.1)
+        self.assertEqual(sorted(TrafficSample.objects.values_list('ip', flat=True)), ['1.1.1.1', '9.9.9.9'])
+
+    def test_views_read_running_collector(self):
+        collector = TrafficCollector(local_ips=[self.LOCAL])
+        collector.add(timezone.now().timestamp() - 5, '1.1.1.1', bytes_in=7_500_000)
+        client = Client()
+        with mock.patch('diagnostics.views._live_collector', return_value=collector):
+            resp = client.get('/traffic/live/?window=1m')
+            self.assertEqual(resp.json()['samples'][0]['download_mbps'], 1.0)
+            self.assertContains(client.get('/traffic/?window=1m'), '1.1.1.1')
+        with mock.patch('diagnostics.views._live_collector', return_value=None):
+            self.assertEqual(client.get('/traffic/live/').status_code, 503)
+
+
+class RollupTests(TestCase):
+    def make_speedtests(self, values, when):
+        objs = []
+        for i, v in enumerate(values):
+            obj = SpeedTest.objects.create(download_mbps=v, upload_mbps=v / 10, ping_ms=20)
+            SpeedTest.objects.filter(pk=obj.pk).update(created_at=when + timedelta(seconds=i))
+            obj.refresh_from_db()
+            objs.append(obj)
+        return objs
+
+    def test_record_is_incremental_and_matches_rebuild(self):
+        when = timezone.now() - timedelta(days=2)
+        objs = self.make_speedtests([float(v) for v in range(1, 101)], when)
+        rollups.record('speedtest', objs[:50])
+        rollups.record('speedtest', objs[50:])
+        start, end = when - timedelta(days=1), timezone.now()
+        stats = rollups.summary('speedtest', 'download_mbps', start, end, granularity='day')
+        self.assertEqual((stats['count'], stats['min'], stats['max'], stats['mean']), (100, 1.0, 100.0, 50.5))
+        # Percentiles aproximados: error relativo acotado por el histograma
+        self.assertAlmostEqual(stats['p50'], 50, delta=50 * 0.03)
+        self.assertAlmostEqual(stats['p95'], 95, delta=95 * 0.03)
+        self.assertEqual(MetricRollup.objects.filter(granularity='minute', metric='ping_ms').count(),
+                         len({rollups.truncate(o.created_at, 'minute') for o in objs}))
+
+        MetricRollup.objects.all().delete()
+        self.assertEqual(rollups.rebuild('speedtest'), 100)
+        self.assertEqual(rollups.summary('speedtest', 'download_mbps', start, end, granularity='day'), stats)
+
+    def test_traffic_rollups_per_ip(self):
+        jobs.store_traffic_samples([
+            {'ip': '1.1.1.1', 'download_mbps': 10, 'upload_mbps': 1},
+            {'ip': '2.2.2.2', 'download_mbps': 2, 'upload_mbps': 1},
+        ])
+        jobs.store_traffic_samples([{'ip': '1.1.1.1', 'download_mbps': 20, 'upload_mbps': 1}])
+        start, end = timezone.now() - timedelta(hours=1), timezone.now() + timedelta(minutes=1)
+        top = rollups.top_ips(start, end, granularity='hour')
+        self.assertEqual([(t['ip'], t['count'], t['mean']) for t in top], [('1.1.1.1', 2, 15.0), ('2.2.2.2', 1, 2.0)])
+        total = rollups.summary('traffic', 'download_mbps', start, end, granularity='minute')
+        self.assertEqual(total['count'], 3)
+
+    def test_report_endpoints_use_granularity(self):
+        self.make_speedtests([10.0, 30.0], timezone.now() - timedelta(days=200))
+        rollups.rebuild('speedtest')
+        client = Client()
+        resp = client.get('/report/?days=365&granularity=day')
+        self.assertEqual(resp.context['granularity'], 'day')
+        self.assertEqual(resp.context['speed_stats'][0]['mean'], 20.0)
+        csv_text = b''.join(client.get('/report.csv?days=365&granularity=day').streaming_content).decode()
+        self.assertIn('speedtest,download_mbps,,2,20.0', csv_text)
+        self.assertEqual(client.get('/report.csv?days=0&granularity=day').status_code, 400)
+        self.assertEqual(client.get('/chart/speed.png?days=365').status_code, 200)
+
+
+class RetentionTests(TestCase):
+    def test_prune_in_batches_respects_policy(self):
+        now = timezone.now()
+        old, recent = now - timedelta(days=40), now - timedelta(days=2)
+        for when in [old] * 7 + [recent] * 2:
+            obj = TrafficSample.objects.create(ip='1.1.1.1', download_mbps=1, upload_mbps=1)
+            TrafficSample.objects.filter(pk=obj.pk).update(created_at=when)
+        MetricRollup.objects.create(granularity='minute', bucket=now - timedelta(days=10),
+                                    source='traffic', metric='download_mbps', count=1)
+        MetricRollup.objects.create(granularity='day', bucket=now - timedelta(days=900),
+                                    source='traffic', metric='download_mbps', count=1)
+        policy = dict(retention.DEFAULT_RETENTION, raw_days=30)
+        dry = retention.prune(now=now, policy=policy, dry_run=True)
+        self.assertEqual(dry['TrafficSample'], 7)
+        self.assertEqual(TrafficSample.objects.count(), 9)
+
+        counts = retention.prune(now=now, policy=policy, batch_size=3)
+        self.assertEqual(counts['TrafficSample'], 7)
+        self.assertEqual(counts['MetricRollup[minute]'], 1)
+        self.assertEqual(TrafficSample.objects.count(), 2)
+        # Los rollups diarios no vencen con la política por defecto
+        self.assertEqual(MetricRollup.objects.filter(granularity='day').count(), 1)
+
+
+    def test_scan_runs_expire_with_their_rows(self):
+        now = timezone.now()
+        old_run = ScanRun.objects.create(kind='wifi', started_at=now - timedelta(days=40), row_count=1)
+        WiFiNetwork.objects.create(ssid='a', bssid='aa', scan_run=old_run)
+        ScanRun.objects.filter(pk=old_run.pk).update(created_at=now - timedelta(days=40))
+        WiFiNetwork.objects.filter(scan_run=old_run).update(created_at=now - timedelta(days=40))
+        new_run = ScanRun.objects.create(kind='devices', started_at=now, row_count=3)
+        counts = retention.prune(now=now, policy=dict(retention.DEFAULT_RETENTION, raw_days=30))
+        self.assertEqual((counts['ScanRun'], counts['WiFiNetwork']), (1, 1))
+        self.assertEqual(list(ScanRun.objects.values_list('id', flat=True)), [new_run.id])
+
+class ScanRunTests(TestCase):
+    def scan(self, devices):
+        with mock.patch('diagnostics.services.network_scanner.NetworkScanner.get_connected_devices',
+                        return_value=devices), \
+                self.settings(DIAGNOSTICS_HOST_DISCOVERY={'enabled': False}):
+            return jobs.JOB_HANDLERS['devices']({})
+
+    def test_device_scans_are_recorded_as_runs_with_diff(self):
+        first = self.scan([{'ip': '10.0.0.1', 'mac': 'aa', 'hostname': ''},
+                           {'ip': '10.0.0.2', 'mac': 'bb', 'hostname': ''}])
+        second = self.scan([{'ip': '10.0.0.1', 'mac': 'aa', 'hostname': ''},
+                            {'ip': '10.0.0.3', 'mac': '', 'hostname': ''}])
+        self.assertEqual(first['diff'], {'added': ['aa', 'bb'], 'changed': [], 'removed': []})
+        self.assertEqual(second['diff'], {'added': ['10.0.0.3'], 'changed': [], 'removed': ['bb']})
+        run = ScanRun.objects.get(pk=second['scan_run'])
+        self.assertEqual((run.kind, run.row_count), ('devices', 2))
+        # El historial vive en el inventario: una fila por equipo, no por escaneo
+        self.assertEqual(Device.objects.count(), 0)
+        self.assertEqual(KnownDevice.objects.count(), 3)
+
+    def test_dashboard_reads_latest_run(self):
+        self.scan([{'ip': '10.0.0.1', 'mac': 'aa', 'hostname': ''}])
+        self.scan([{'ip': '10.0.0.1', 'mac': 'aa', 'hostname': ''},
+                   {'ip': '10.0.0.2', 'mac': 'bb', 'hostname': ''},
+                   {'ip': '10.0.0.3', 'mac': 'cc', 'hostname': ''}])
+        with self.assertNumQueries(3):
+            resp = Client().get('/')
+        self.assertEqual(resp.context['devices_count'], 3)
+        self.assertEqual(resp.context['wifi_count'], 0)
+
+
+@override_settings(DIAGNOSTICS_CHART_CACHE='default')
+class SpeedChartCacheTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        caches['default'].clear()
+        charts._recent.clear()
+        SpeedTest.objects.create(download_mbps=50, upload_mbps=10, ping_ms=20)
+
+    def test_chart_is_rendered_once_and_revalidated_with_304(self):
+        client = Client()
+        with mock.patch.object(charts, 'render', return_value=b'png-1') as render:
+            first = client.get('/chart/speed.png')
+            second = client.get('/chart/speed.png')
+            self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.content, b'png-1')
+        self.assertEqual(second.content, b'png-1')
+        etag = first['ETag']
+        self.assertTrue(first.has_header('Last-Modified'))
+        self.assertEqual(client.get('/chart/speed.png', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Otro rango u otro SpeedTest cambian la clave
+        self.assertNotEqual(client.get('/chart/speed.png?days=7', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        SpeedTest.objects.create(download_mbps=60, upload_mbps=10, ping_ms=20)
+        self.assertEqual(client.get('/chart/speed.png', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(client.get('/chart/speed.png?days=0').status_code, 400)
+
+    def test_prerender_fills_cache_for_recent_params(self):
+        with mock.patch.object(charts, 'render', return_value=b'png') as render:
+            charts.get_chart({'days': '7'})
+            SpeedTest.objects.create(download_mbps=60, upload_mbps=10, ping_ms=20)
+            self.assertEqual(charts.prerender(), 2)
+            self.assertEqual(render.call_count, 3)
+            charts.get_chart({})
+            charts.get_chart({'days': '7'})
+            self.assertEqual(render.call_count, 3)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        for i in range(5):
+            obj = TrafficSample.objects.create(ip=f'10.0.0.{i % 2}', download_mbps=i, upload_mbps=1)
+            TrafficSample.objects.filter(pk=obj.pk).update(created_at=now - timedelta(days=i * 10))
+        SpeedTest.objects.create(download_mbps=80, upload_mbps=20, ping_ms=9)
+
+    def test_keyset_batches_cover_all_rows_once(self):
+        TrafficSample.objects.update(created_at=timezone.now())  # empates en created_at
+        seen = [r['id'] for batch in exports.keyset_batches(TrafficSample.objects.all(), batch_size=2)
+                for r in batch]
+        self.assertEqual(seen, sorted(TrafficSample.objects.values_list('id', flat=True), reverse=True))
+
+    def test_csv_streams_everything_without_cap(self):
+        resp = Client().get('/report.csv')
+        self.assertTrue(resp.streaming)
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'created_at,type,metric1,metric2,metric3')
+        self.assertEqual(len(lines), 1 + 6)
+
+    def test_filters_and_gzip_ndjson(self):
+        import gzip
+        resp = Client().get('/report.ndjson?type=traffic&ip=10.0.0.0&days=25&gzip=1')
+        self.assertEqual(resp['Content-Type'], 'application/gzip')
+        self.assertIn('reporte.ndjson.gz', resp['Content-Disposition'])
+        rows = [json.loads(line) for line in
+                gzip.decompress(b''.join(resp.streaming_content)).decode().splitlines()]
+        # ip 10.0.0.0 = i par (0, 20 días, 40 días); solo 0 y 20 caen en 25 días
+        self.assertEqual([(r['type'], r['ip'], r['download_mbps']) for r in rows],
+                         [('traffic', '10.0.0.0', 0.0), ('traffic', '10.0.0.0', 2.0)])
+        self.assertEqual(Client().get('/report.csv?type=foo').status_code, 400)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        base = timezone.now().replace(minute=30, second=0, microsecond=0) - timedelta(hours=5)
+        # Dos tests por hora, con un empate exacto de created_at al inicio
+        for i, minutes in enumerate([0, 0, 30, 60, 90, 120, 150]):
+            obj = SpeedTest.objects.create(download_mbps=10 * i, upload_mbps=1, ping_ms=5)
+            SpeedTest.objects.filter(pk=obj.pk).update(created_at=base + timedelta(minutes=minutes))
+        self.client = Client()
+
+    def pages(self, url):
+        items, cursor = [], None
+        while True:
+            resp = self.client.get(url + (f'&cursor={cursor}' if cursor else ''))
+            self.assertEqual(resp.status_code, 200)
+            body = resp.json()
+            items.append(body)
+            cursor = body['next']
+            if not cursor:
+                return items
+
+    def test_keyset_pages_cover_all_rows(self):
+        pages = self.pages('/api/speedtests/?limit=2&fields=download_mbps')
+        ids = [r['id'] for p in pages for r in p['results']]
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(len(set(ids)), 7)
+        self.assertEqual(set(pages[0]['results'][0]), {'created_at', 'id', 'download_mbps'})
+        asc = [r['id'] for p in self.pages('/api/speedtests/?limit=3&order=asc') for r in p['results']]
+        self.assertEqual(asc, sorted(asc, key=lambda pk: (SpeedTest.objects.get(pk=pk).created_at, pk)))
+
+    def test_columnar_and_filters(self):
+        inventory.apply_scan([{'ip': '10.0.0.1', 'mac': 'aa'}, {'ip': '10.0.0.2', 'mac': 'bb'}])
+        body = self.client.get('/api/devices/?format=columnar&ip=10.0.0.2&fields=ip,mac,present').json()
+        self.assertEqual(body['fields'], ['last_seen', 'id', 'ip', 'mac', 'present'])
+        self.assertEqual((body['data']['mac'], body['data']['present']), (['bb'], [True]))
+        self.assertEqual(self.client.get('/api/devices/?fields=password').status_code, 400)
+        self.assertEqual(self.client.get('/api/nada/').status_code, 404)
+        self.assertEqual(self.client.get('/api/speedtests/?cursor=zzz').status_code, 400)
+        # JSON válido con tipos equivocados también es un cursor inválido, no un 500
+        for raw in (['2024-01-01T00:00:00+00:00', [1]], ['2024-01-01T00:00:00+00:00', True],
+                    [1, 1], ['2024-01-01T00:00:00', 1], {'t': 1}):
+            cursor = base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip('=')
+            resp = self.client.get(f'/api/speedtests/?cursor={cursor}')
+            self.assertEqual((resp.status_code, resp.json()['error']), (400, 'cursor inválido'), raw)
+        self.assertEqual(self.client.get('/api/speedtests/?cursor=' + api.encode_cursor(timezone.now(), 0)).status_code, 200)
+
+    def test_device_inventory_pages_by_last_seen(self):
+        now = timezone.now().replace(minute=10, second=0, microsecond=0)
+        for i in range(5):
+            inventory.apply_scan([{'ip': f'10.0.0.{i}', 'mac': f'm{i}'}], now=now + timedelta(minutes=i))
+        pages = self.pages('/api/devices/?limit=2')
+        keys = [r['key'] for p in pages for r in p['results']]
+        self.assertEqual(keys, ['m4', 'm3', 'm2', 'm1', 'm0'])
+        self.assertEqual(self.client.get('/api/devices/?bucket=hour').json()['results'][0]['count'], 5)
+
+    def test_bucketed_pages(self):
+        total = SpeedTest.objects.count()
+        pages = self.pages('/api/speedtests/?bucket=hour&limit=1&fields=download_mbps')
+        buckets = [r for p in pages for r in p['results']]
+        self.assertEqual(sum(b['count'] for b in buckets), total)
+        self.assertEqual(len({b['bucket'] for b in buckets}), len(buckets))
+        self.assertIn('download_mbps_avg', buckets[0])
+        asc = [r for p in self.pages('/api/speedtests/?bucket=hour&limit=2&order=asc') for r in p['results']]
+        self.assertEqual(sum(b['count'] for b in asc), total)
+
+
+class LiveFeedTests(TestCase):
+    def setUp(self):
+        self.polls = 0
+        self.table = neighbor_table.NeighborTable(proc_path='/nonexistent')
+        self.feed = LiveFeed(interval=3600, rates_source=self._rates, queue_size=3,
+                             neighbor_table=self.table)
+
+    def _rates(self):
+        self.polls += 1
+        return {'1s': [{'ip': '1.1.1.1', 'download_mbps': 1.0, 'upload_mbps': 0.5}]}
+
+    def test_single_producer_fans_out(self):
+        subs = [self.feed.subscribe() for _ in range(5)]
+        self.assertTrue(self.feed.running)
+        while self.polls == 0:
+            threading.Event().wait(0.01)
+        for sub in subs:
+            sub.get(timeout=0)
+        self.table.apply_event({'event': 'add', 'ip': '10.0.0.9', 'mac': 'aa:bb', 'iface': 'eth0'})
+        self.feed.poll_traffic()
+        for sub in subs:
+            events = sub.get(timeout=0)
+            self.assertEqual([e['type'] for e in events], ['device', 'traffic'])
+            self.assertEqual(events[0]['device']['ip'], '10.0.0.9')
+        # Una lectura del colector por intervalo, no una por cliente
+        self.assertEqual(self.polls, 2)
+        for sub in subs:
+            self.feed.unsubscribe(sub)
+        self.assertFalse(self.feed.running)
+        self.assertEqual(self.table._listeners, [])
+
+    def test_subscriber_arriving_while_last_leaves_keeps_producer(self):
+        first = self.feed.subscribe()
+        # Los dos cambios quedan esperando la decisión de arranque/parada
+        with self.feed._lifecycle:
+            leaving = threading.Thread(target=self.feed.unsubscribe, args=(first,))
+            leaving.start()
+            while self.feed.subscriber_count:
+                threading.Event().wait(0.01)
+            box = []
+            arriving = threading.Thread(target=lambda: box.append(self.feed.subscribe()))
+            arriving.start()
+            while not self.feed.subscriber_count:
+                threading.Event().wait(0.01)
+        leaving.join(2)
+        arriving.join(2)
+        self.assertTrue(self.feed.running)
+        self.feed.poll_traffic()
+        self.assertEqual(box[0].get(timeout=0)[-1]['type'], 'traffic')
+        self.feed.unsubscribe(box[0])
+        self.assertFalse(self.feed.running)
+
+    def test_slow_client_drops_oldest(self):
+        sub = self.feed.subscribe()
+        sub.get(timeout=1)
+        for i in range(5):
+            self.feed.publish('tick', {'n': i})
+        self.assertEqual([e['n'] for e in sub.get(timeout=0)], [2, 3, 4])
+        self.assertEqual(sub.dropped, 2)
+        self.feed.unsubscribe(sub)
+
+    def test_async_subscription_wakes_from_other_thread(self):
+        async def run():
+            sub = self.feed.subscribe(loop=asyncio.get_running_loop())
+            try:
+                first = await sub.aget(timeout=1)
+                threading.Timer(0.05, self.feed.publish, args=('tick', {'n': 1})).start()
+                second = await sub.aget(timeout=2)
+                return first, second
+            finally:
+                self.feed.unsubscribe(sub)
+        first, second = asyncio.run(run())
+        self.assertEqual(first[0]['type'], 'traffic')
+        self.assertEqual(second[0]['n'], 1)
+
+    @override_settings(DIAGNOSTICS_LIVE_FEED={'keepalive': 0.05, 'wsgi_max_seconds': 0.3})
+    def test_sse_view_streams_events(self):
+        with mock.patch('diagnostics.views.get_live_feed', return_value=self.feed):
+            resp = self.client.get('/events/')
+            self.assertEqual(resp['Content-Type'], 'text/event-stream')
+            body = b''.join(resp.streaming_content).decode()
+        self.assertIn('event: traffic', body)
+        data = json.loads(body.split('event: traffic\ndata: ', 1)[1].split('\n', 1)[0])
+        self.assertEqual(data['windows']['1s'][0]['ip'], '1.1.1.1')
+        self.assertEqual(self.feed.subscriber_count, 0)
+
+
+class WiFiParserTests(TestCase):
+    def test_recorded_outputs_match_expected(self):
+        checked = 0
+        for fmt, path in bench_wifi_parsers.corpus_files():
+            expected_path = path[:-4] + '.json'
+            if not os.path.exists(expected_path):
+                continue
+            with open(expected_path, encoding='utf-8') as fh:
+                expected = json.load(fh)
+            with self.subTest(path=os.path.basename(path)):
+                self.assertEqual(wifi_parsers.parse(fmt, bench_wifi_parsers.read_corpus(path)), expected)
+            checked += 1
+        self.assertGreaterEqual(checked, 8)
+
+    def test_dense_outputs_keep_every_bssid(self):
+        expected = {n['bssid'] for n in bench_wifi_parsers._networks(520, 1)}
+        for fmt in wifi_parsers.PARSERS:
+            with self.subTest(fmt=fmt):
+                path = os.path.join(bench_wifi_parsers.CORPUS_DIR, f'{fmt}_dense.txt')
+                nets = wifi_parsers.parse(fmt, bench_wifi_parsers.read_corpus(path))
+                self.assertEqual(len(nets), 520)
+                self.assertEqual({n['bssid'] for n in nets}, expected)
+                self.assertTrue(all(n['channel'] > 0 for n in nets))
+
+    def test_nmcli_escapes(self):
+        self.assertEqual(wifi_parsers.split_nmcli(r'wlan0:wifi:connected:Cafe\: Guest'),
+                         ['wlan0', 'wifi', 'connected', 'Cafe: Guest'])
+        nets = wifi_parsers.parse_nmcli('Back\\\\slash\\:x:AA\\:BB\\:CC\\:DD\\:EE\\:FF:6:50:WPA2\n')
+        self.assertEqual(nets[0]['ssid'], 'Back\\slash:x')
+        self.assertEqual(nets[0]['bssid'], 'aa:bb:cc:dd:ee:ff')
+
+    def test_analyzer_uses_parsers(self):
+        text = bench_wifi_parsers.read_corpus(os.path.join(bench_wifi_parsers.CORPUS_DIR, 'nmcli.txt'))
+        caps = capabilities.probe('Linux', which=lambda cmd: f'/usr/bin/{cmd}' if cmd == 'nmcli' else None)
+        with mock.patch('diagnostics.services.wifi_analyzer.subprocess.check_output', return_value=text) as run:
+            nets, used = capabilities.registry.dispatch('wifi', caps)
+        self.assertEqual(used, 'nmcli')
+        self.assertIn('SSID,BSSID,CHAN,SIGNAL,SECURITY', run.call_args[0][0])
+        self.assertEqual(nets[3], {'ssid': 'Cafe: Guest', 'bssid': 'f4:92:bf:00:aa:01',
+                                   'channel': 149, 'signal': 55, 'security': 'WPA3'})
+
+
+class ChannelScoringTests(TestCase):
+    def by_channel(self, result):
+        return {r['channel']: r for r in result['channels']}
+
+    def test_overlap_in_24ghz(self):
+        rows = self.by_channel(channel_scoring.score_channels([1, 1, 6], [-40, -40, -40]))
+        self.assertEqual(rows[1]['congestion'], 2.0)
+        self.assertEqual(rows[3]['congestion'], 1.25)  # 50% con cada red del canal 1 y 25% con la del 6
+        self.assertEqual(rows[6]['congestion'], 1.0)
+        self.assertEqual(rows[11]['congestion'], 0.0)
+        self.assertEqual(rows[11]['networks'], 0)
+
+    def test_5ghz_width_blocks(self):
+        result = channel_scoring.score_channels([36], [-50], width_5ghz=80)
+        rows = self.by_channel(result)
+        self.assertEqual([rows[c]['congestion'] for c in (36, 40, 44, 48, 52)], [1.0, 1.0, 1.0, 1.0, 0.0])
+        self.assertEqual(result['best']['5'], 52)
+        rows = self.by_channel(channel_scoring.score_channels([36], [-50], width_5ghz=20))
+        self.assertEqual(rows[40]['congestion'], 0.0)
+        self.assertEqual(channel_scoring.score_channels([36], [-50], avoid_dfs=True)['best']['5'], 149)
+
+    def test_signal_weight_and_units(self):
+        rows = self.by_channel(channel_scoring.score_channels([1, 6], [-95, 100]))
+        self.assertEqual(rows[1]['congestion'], 0.0)  # en el piso de ruido no pesa
+        self.assertEqual(rows[6]['congestion'], 1.0)  # 100% = -50 dBm
+        self.assertGreater(rows[6]['interference_dbm'], rows[1]['interference_dbm'])
+
+    def test_unknown_signal_is_not_strong(self):
+        self.assertEqual(channel_scoring.signal_to_dbm([0, None, -60, 50]).tolist(),
+                         [channel_scoring.NOISE_FLOOR_DBM, channel_scoring.NOISE_FLOOR_DBM, -60.0, -75.0])
+        rows = self.by_channel(channel_scoring.score_channels([1, 6], [0, -40]))
+        # Sin dato de señal la red se cuenta, pero no congestiona como si fuera 0 dBm
+        self.assertEqual((rows[1]['congestion'], rows[1]['networks']), (0.0, 1.0))
+        self.assertEqual(rows[6]['congestion'], 1.0)
+
+    def test_history_average_and_recommendation(self):
+        # Canal 1 ocupado en los dos escaneos, 6 en uno y 11 libre
+        result = channel_scoring.score_channels([1, 6, 1], [-40, -40, -40], scan_ids=[7, 7, 9])
+        rows = self.by_channel(result)
+        self.assertEqual(result['scans'], 2)
+        self.assertEqual(rows[6]['congestion'], 0.5)
+        self.assertEqual(rows[6]['congestion_peak'], 1.0)
+        self.assertEqual(result['best']['2.4'], 11)
+
+    def test_from_stored_scans_without_scanning(self):
+        run = ScanRun.objects.create(kind='wifi', started_at=timezone.now(), row_count=2)
+        WiFiNetwork.objects.create(ssid='a', bssid='aa', channel=1, signal=90, scan_run=run)
+        WiFiNetwork.objects.create(ssid='b', bssid='bb', channel=6, signal=90, scan_run=run)
+        with mock.patch('diagnostics.services.wifi_analyzer.WiFiAnalyzer.get_available_networks') as scan:
+            body = self.client.get('/wifi/channels/').json()
+            self.assertEqual(body['best']['2.4'], 11)
+            self.assertEqual(body['scan_run'], run.id)
+            self.assertEqual(self.client.get('/wifi/channels/?days=1').json()['scans'], 1)
+            self.assertEqual(self.client.get('/wifi/channels/?run=999').status_code, 404)
+            self.assertContains(self.client.get('/wifi/'), 'Canal recomendado')
+        scan.assert_not_called()
+
+
+class ScanCacheTests(TestCase):
+    def setUp(self):
+        self.now = [100.0]
+        self.cache = ScanCache(ttls={'wifi': 10}, clock=lambda: self.now[0])
+
+    def test_concurrent_callers_share_one_scan(self):
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def slow_scan():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return [{'bssid': 'aa'}]
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get('wifi', slow_scan)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        while self.cache.coalesced < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [[{'bssid': 'aa'}]] * 5)
+        # Cada uno recibe su propia copia
+        results[0][0]['bssid'] = 'zz'
+        self.assertEqual(self.cache.get('wifi', slow_scan), [{'bssid': 'aa'}])
+
+    def test_ttl_force_refresh_and_errors(self):
+        values = iter([1, 2, 3])
+        self.assertEqual(self.cache.get('wifi', lambda: next(values)), 1)
+        self.now[0] += 9
+        self.assertEqual(self.cache.get('wifi', lambda: next(values)), 1)
+        self.assertEqual(self.cache.get('wifi', lambda: next(values), force=True), 2)
+        self.now[0] += 10
+        self.assertEqual(self.cache.get('wifi', lambda: next(values)), 3)
+        self.assertEqual(self.cache.get('wifi', lambda: 0, max_age=0), 0)
+
+        def boom():
+            raise RuntimeError('sin adaptador')
+        with self.assertRaises(RuntimeError):
+            self.cache.get('adapter', boom)
+        self.assertIsNone(self.cache.age('adapter'))
+        # El TTL de 'devices:discovery' sale de 'devices' (o el de por defecto)
+        self.cache.configure({'devices': 60})
+        self.assertEqual(self.cache.ttl('devices:discovery'), 60)
+
+    def test_scan_job_refresh_param(self):
+        self.assertEqual(jobs.clean_params('wifi', {}), {})
+        self.assertEqual(jobs.clean_params('devices', {'refresh': 'true'}), {'refresh': True})
+        self.assertEqual(jobs.clean_params('wifi', {'refresh': '0'}), {})
+        with mock.patch('diagnostics.services.wifi_analyzer.WiFiAnalyzer.get_available_networks',
+                        return_value=[]) as scan, \
+                mock.patch('diagnostics.services.wifi_analyzer.wifi_adapter_summary', return_value={}):
+            jobs.JOB_HANDLERS['wifi']({'refresh': True})
+        scan.assert_called_once_with(force_refresh=True)
+
+
+class CommandRunnerTests(TestCase):
+    @staticmethod
+    def sleeper(seconds):
+        return [sys.executable, '-c', f'import time; time.sleep({seconds}); print("listo")']
+
+    def test_results_arrive_in_completion_order_concurrently(self):
+        commands = [('lento', self.sleeper(0.6)), ('rapido', self.sleeper(0.05)), ('medio', self.sleeper(0.3))]
+        started = timezone.now()
+        results = list(command_runner.run_concurrently(commands, timeout=5))
+        elapsed = (timezone.now() - started).total_seconds()
+        self.assertEqual([r['title'] for r in results], ['rapido', 'medio', 'lento'])
+        self.assertEqual([r['index'] for r in results], [1, 2, 0])
+        self.assertTrue(all(r['ok'] and r['output'] == 'listo' for r in results))
+        # La latencia total es la del más lento, no la suma
+        self.assertLess(elapsed, sum(r['elapsed_ms'] for r in results) / 1000)
+
+    def test_timeout_and_missing_binary(self):
+        slow = command_runner.run_command('colgado', self.sleeper(5), timeout=0.2)
+        self.assertTrue(slow['timed_out'])
+        self.assertLess(slow['elapsed_ms'], 2000)
+        missing = command_runner.run_command('nada', ['no-existe-este-comando'])
+        self.assertFalse(missing['ok'])
+        self.assertTrue(missing['output'].startswith('<error>'))
+
+    def test_page_streams_each_output(self):
+        commands = [('uno', self.sleeper(0)), ('dos', [sys.executable, '-c', 'print("<b>")'])]
+        with mock.patch('diagnostics.views._diagnostic_commands', return_value=(commands, ['iw dev'])):
+            resp = Client().get('/diagnostics/')
+        self.assertTrue(resp.streaming)
+        chunks = [c.decode('utf-8') for c in resp.streaming_content]
+        # cabecera, una parte por comando, resumen y cierre
+        self.assertEqual(len(chunks), 5)
+        body = ''.join(chunks)
+        self.assertIn('pending-0', chunks[0])
+        self.assertIn('&lt;b&gt;', body)
+        self.assertIn('2 comandos en', body)
+        self.assertTrue(body.rstrip().endswith('</html>'))
+
+
+class CapabilityRegistryTests(TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.registry = capabilities.BackendRegistry(retry_after=60, clock=lambda: self.now[0])
+        self.calls = []
+        self.caps = capabilities.probe('Linux', which=lambda cmd: None if cmd in ('iwlist', 'netsh') else f'/bin/{cmd}')
+        self.caps.net_admin = False
+
+    def add(self, name, result, os_name='Linux', **opts):
+        def fn(caps):
+            self.calls.append(name)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        self.registry.register('wifi', name, fn, os_name, **opts)
+
+    def test_probe_detects_tools(self):
+        self.assertTrue(self.caps.has('nmcli', 'ip'))
+        self.assertFalse(self.caps.has('iwlist'))
+        self.assertEqual(self.caps.path('nmcli'), '/bin/nmcli')
+        self.assertIn('iwlist', self.caps.as_dict()['missing'])
+
+    def test_dispatch_skips_unavailable_and_remembers_last_working(self):
+        self.add('nmcli', OSError('nmcli roto'), tools=('nmcli',))
+        self.add('iwlist', [{'bssid': 'x'}], tools=('iwlist',))           # no instalado
+        self.add('netsh', [{'bssid': 'x'}], os_name='Windows')            # otro SO
+        self.add('iw', [], tools=('iw',), priority=1)                     # sin resultados
+        self.add('ip', [{'bssid': 'aa'}], tools=('ip',), priority=2)
+        self.assertEqual(self.registry.dispatch('wifi', self.caps), ([{'bssid': 'aa'}], 'ip'))
+        self.assertEqual(self.calls, ['nmcli', 'iw', 'ip'])
+        # El que funcionó va primero y el que falló se saltea sin relanzarlo
+        self.calls.clear()
+        self.registry.dispatch('wifi', self.caps)
+        self.assertEqual(self.calls, ['ip'])
+        status = self.registry.status(self.caps)['wifi']
+        self.assertEqual(status['last_working'], 'ip')
+        self.assertEqual(status['failing'], {'nmcli': 'nmcli roto'})
+        # Pasado retry_after se vuelve a probar
+        self.now[0] += 61
+        self.assertEqual([b.name for b in self.registry.candidates('wifi', self.caps)], ['ip', 'nmcli', 'iw'])
+
+    def test_privileged_backends_go_last_without_privileges(self):
+        self.add('scan', [1], tools=('iw',), privileged=True)
+        self.add('cache', [2], tools=('ip',), priority=5)
+        self.assertEqual(self.registry.dispatch('wifi', self.caps)[1], 'cache')
+        self.caps.net_admin = True
+        self.registry.reset()
+        self.assertEqual(self.registry.dispatch('wifi', self.caps)[1], 'scan')
+
+    def test_adapter_summary_uses_registered_backend(self):
+        caps = capabilities.probe('Linux', which=lambda cmd: f'/usr/bin/{cmd}' if cmd == 'nmcli' else None)
+        out = 'lo:loopback:unmanaged:\nwlp2s0:wifi:connected:Cafe\\: Guest\n'
+        with mock.patch('diagnostics.services.wifi_analyzer.subprocess.check_output', return_value=out), \
+                mock.patch('diagnostics.services.capabilities.get_capabilities', return_value=caps):
+            resumen = wifi_analyzer._adapter_summary()
+        self.assertEqual(resumen, {'interfaz': 'wlp2s0', 'estado': 'connected', 'ssid': 'Cafe: Guest'})
+
+
+class ThroughputTests(LiveServerTestCase):
+    def test_summarize_ramp_and_steady_state(self):
+        mb = 1_000_000 / 8  # bytes de 1 Mbps durante 1 s
+        result = throughput.summarize([int(v * mb) for v in (10, 50, 95, 100, 98, 102, 100)])
+        self.assertEqual(result['per_second'], [10, 50, 95, 100, 98, 102, 100])
+        self.assertEqual(result['ramp_up_seconds'], 2.0)
+        self.assertEqual(result['steady_mbps'], 99.0)
+        self.assertEqual(throughput.summarize([])['steady_mbps'], 0.0)
+
+    def test_download_endpoint_limits(self):
+        resp = Client().get('/throughput/download/', {'bytes': 100000})
+        self.assertEqual(len(b''.join(resp.streaming_content)), 100000)
+        self.assertEqual(Client().get('/throughput/download/', {'seconds': 'x'}).status_code, 400)
+        resp = Client().post('/throughput/upload/', data=b'x' * 5000, content_type='application/octet-stream')
+        self.assertEqual(resp.json()['bytes'], 5000)
+
+    def test_multi_stream_client_against_live_server(self):
+        client = throughput.ThroughputClient(self.live_server_url, streams=2, duration=1.2, interval=0.4,
+                                             upload_request_bytes=1024 * 1024)
+        for direction in ('download', 'upload'):
+            r = client.run(direction)
+            self.assertEqual(r['errors'], [])
+            self.assertEqual(len(r['per_second']), 3)
+            self.assertTrue(all(v > 0 for v in r['per_stream_mbps']))
+            self.assertGreater(r['steady_mbps'], 0)
+
+
+class LatencyProberTests(TestCase):
+    def closed_port(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_summary_percentiles_jitter_and_loss(self):
+        stats = latency.summarize([10, 12, None, 11, 15, None, 10, 20, 12, 10])
+        self.assertEqual((stats['sent'], stats['received'], stats['loss_pct']), (10, 8, 20.0))
+        self.assertEqual((stats['min'], stats['max'], stats['p50']), (10, 20, 11.5))
+        self.assertEqual(stats['avg'], 12.5)
+        # |12-10| |11-12| |15-11| |10-15| |20-10| |12-20| |10-12| -> 32 / 7
+        self.assertEqual(stats['jitter'], 4.57)
+        self.assertGreaterEqual(stats['p99'], stats['p95'])
+        self.assertIsNone(latency.summarize([None, None])['avg'])
+
+    def test_targets_and_defaults(self):
+        self.assertEqual(latency.parse_target('10.0.0.1:22'), ('10.0.0.1', 22))
+        self.assertEqual(latency.parse_target('router.lan'), ('router.lan', None))
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with open(path, 'w') as fh:
+            fh.write('Iface\tDestination\tGateway\tFlags\n'
+                     'eth0\t0001A8C0\t00000000\t0001\n'
+                     'eth0\t00000000\t0101A8C0\t0003\n')
+        self.assertEqual(latency.default_gateway(path), '192.168.1.1')
+
+    def test_concurrent_tcp_and_udp_fallback(self):
+        port = self.closed_port()
+        prober = latency.LatencyProber([f'127.0.0.1:{port}', '127.0.0.1'], count=5, interval=0.01,
+                                       timeout=0.5, method='udp')
+        result = prober.probe()
+        # host:puerto siempre por TCP (RST cuenta como respuesta); el resto por UDP
+        self.assertEqual(result[f'127.0.0.1:{port}']['method'], 'tcp')
+        self.assertEqual(result['127.0.0.1']['method'], 'udp')
+        for stats in result.values():
+            self.assertEqual((stats['sent'], stats['loss_pct']), (5, 0.0))
+            self.assertLessEqual(stats['min'], stats['p50'])
+
+    def test_icmp_without_permission_falls_back_to_tcp(self):
+        with mock.patch('diagnostics.services.latency._open_icmp_socket', return_value=(None, False)):
+            result = latency.LatencyProber(['127.0.0.1'], count=2, interval=0.01, timeout=0.5,
+                                           tcp_port=self.closed_port()).probe()
+        self.assertEqual(result['127.0.0.1']['method'], 'tcp')
+        self.assertEqual(result['127.0.0.1']['received'], 2)
+
+    def test_monitor_keeps_a_window(self):
+        monitor = latency.LatencyMonitor(latency.LatencyProber(['x']), window=3)
+        monitor.record({'x': ('icmp', [1.0, 2.0])})
+        monitor.record({'x': ('icmp', [None, 4.0])})
+        snap = monitor.snapshot()['x']
+        self.assertEqual((snap['sent'], snap['received'], snap['method']), (3, 2, 'icmp'))
+        self.assertEqual(monitor.rounds, 2)
+        self.assertEqual(jobs.clean_params('latency', {'targets': '10.0.0.1, 8.8.8.8', 'count': '5'}),
+                         {'targets': ['10.0.0.1', '8.8.8.8'], 'count': 5, 'method': 'auto'})
+
+    def test_latency_monitor_defaults_skip_public_target(self):
+        with mock.patch.object(latency, 'default_gateway', return_value='192.168.1.1'), \
+                mock.patch.object(latency, 'dns_servers', return_value=['192.168.1.1', '1.1.1.1']):
+            self.assertEqual(latency.default_targets(public=False), ['192.168.1.1', '1.1.1.1'])
+            self.assertEqual(latency.default_targets()[-1], latency.PUBLIC_TARGET)
+
+
+class FakeSpeedtest:
+    """Imita la parte de speedtest.Speedtest que usa ServerSelection."""
+    created = []
+
+    def __init__(self, cached_config=None):
+        self.config = cached_config or {'client': {'lat': '-25.3', 'lon': '-57.6'}}
+        self.downloaded_config = cached_config is None
+        self.closest = [{'id': str(i), 'url': f'http://s{i}/upload.php', 'latency': 10.0 + i} for i in range(8)]
+        self.probed = None
+        self.best = None
+        FakeSpeedtest.created.append(self)
+
+    def get_best_server(self, servers=None):
+        self.probed = servers if servers is not None else self.closest
+        self.best = dict(self.probed[-1] if servers is not None else self.probed[0])
+        return self.best
+
+    def use_server(self, server):
+        self.best = server
+
+    def download(self):
+        return 50_000_000
+
+    def upload(self):
+        return 10_000_000
+
+
+class SpeedtestServerCacheTests(TestCase):
+    def setUp(self):
+        FakeSpeedtest.created = []
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.remove(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def selection(self, **kwargs):
+        return ServerSelection(self.path, factory=FakeSpeedtest, **kwargs)
+
+    def test_discovery_is_cached_on_disk(self):
+        first = self.selection().client()
+        self.assertTrue(first.downloaded_config)
+        # Otra instancia (otro proceso/reinicio) arranca directo con el servidor guardado
+        second = self.selection().client()
+        self.assertFalse(second.downloaded_config)
+        self.assertIsNone(second.probed)
+        self.assertEqual(second.best['id'], '0')
+        with open(self.path) as fh:
+            self.assertEqual(len(json.load(fh)['candidates']), 5)
+
+    def test_ttl_expiry_and_revalidation(self):
+        sel = self.selection(ttl=60)
+        sel.client()
+        best = sel.revalidate()
+        # Solo se re-miden los candidatos guardados, con la configuración guardada
+        self.assertEqual(len(FakeSpeedtest.created[-1].probed), 5)
+        self.assertFalse(FakeSpeedtest.created[-1].downloaded_config)
+        self.assertEqual((best['id'], sel.revalidations, sel.discoveries), ('4', 1, 1))
+        self.assertEqual(sel.client().best['id'], '4')
+        with mock.patch('diagnostics.services.speedtest_servers.time.time', return_value=time.time() + 61):
+            sel.client()
+        self.assertEqual(sel.discoveries, 2)
+
+    def test_workers_pick_up_revalidation_from_disk(self):
+        owner, worker = self.selection(revalidate_every=60), self.selection(revalidate_every=60)
+        owner.client()
+        self.assertEqual(worker.client().best['id'], '0')
+        later = time.time() + 61
+        with mock.patch('diagnostics.services.speedtest_servers.time.time', return_value=later):
+            owner.revalidate()
+            # El worker sin hilo no descubre ni revalida: lee lo que guardó el dueño
+            self.assertEqual(worker.client().best['id'], '4')
+        self.assertEqual((worker.discoveries, worker.revalidations), (0, 0))
+        # Cada escritura usa su propio temporal y no deja restos
+        leftovers = [f for f in os.listdir(os.path.dirname(self.path))
+                     if f.startswith(f'.{os.path.basename(self.path)}.')]
+        self.assertEqual(leftovers, [])
+
+    def test_shared_tester_reuses_selection(self):
+        tester = SpeedTester(servers=self.selection())
+        with mock.patch.object(tester, '_measure_ping', return_value=12.5):
+            first = tester.run_test()
+            tester.run_test()
+        self.assertEqual((first['download'], first['upload'], first['ping']), (50.0, 10.0, 12.5))
+        self.assertEqual([st.downloaded_config for st in FakeSpeedtest.created], [True, False])
+
+
+class DeviceInventoryTests(TestCase):
+    def scan(self, devices, minutes):
+        return inventory.apply_scan(devices, now=timezone.now().replace(microsecond=0) + timedelta(minutes=minutes))
+
+    def test_presence_history_and_fallback_key(self):
+        self.scan([{'ip': '10.0.0.1', 'mac': 'AA', 'hostname': 'tv'}, {'ip': '10.0.0.9', 'mac': ''}], 0)
+        diff = self.scan([{'ip': '10.0.0.9', 'mac': 'cc'}], 5)
+        # El equipo visto solo por IP conserva su fila al aparecer su MAC
+        self.assertEqual(diff, {'added': [], 'changed': ['cc'], 'removed': ['aa']})
+        self.assertFalse(KnownDevice.objects.filter(key='10.0.0.9').exists())
+        diff = self.scan([{'ip': '10.0.0.5', 'mac': 'aa', 'hostname': ''}, {'ip': '10.0.0.9', 'mac': 'cc'}], 10)
+        self.assertEqual(diff['added'], ['aa'])
+        tv = KnownDevice.objects.get(key='aa')
+        self.assertEqual((tv.ip, tv.hostname, tv.present), ('10.0.0.5', 'tv', True))
+        self.assertEqual(len(tv.presence), 2)
+        self.assertEqual(tv.presence[0][1] - tv.presence[0][0], 0)
+        self.assertIsNone(tv.presence[1][1])
+        self.assertEqual(inventory.presence_seconds(KnownDevice.objects.get(key='cc')), 600)
+
+    def test_unchanged_scan_writes_one_update(self):
+        devices = [{'ip': f'10.0.0.{i}', 'mac': f'm{i}'} for i in range(20)]
+        self.scan(devices, 0)
+        # SELECT + UPDATE de last_seen, más el savepoint de la transacción
+        with self.assertNumQueries(4):
+            self.assertEqual(self.scan(devices, 1), {'added': [], 'changed': [], 'removed': []})
+        self.assertEqual(KnownDevice.objects.filter(last_seen__gt=F('first_seen')).count(), 20)
+
+
+class SignalStoreTests(TestCase):
+    def setUp(self):
+        # Inicio de un bloque, para que las muestras caigan en dos bloques seguidos
+        ts = signal_store.block_start(int(time.time())) - signal_store.BLOCK_SECONDS
+        self.t0 = datetime.fromtimestamp(ts, tz=dt_timezone.utc)
+
+    def at(self, seconds):
+        return self.t0 + timedelta(seconds=seconds)
+
+    def test_samples_pack_into_one_block_per_bssid_and_window(self):
+        for i, sig in enumerate([-50, -55, -60]):
+            signal_store.record([{'bssid': 'AA:01', 'ssid': 'casa', 'signal': sig, 'channel': 36},
+                                 {'bssid': 'aa:02', 'ssid': 'vecino', 'signal': 80, 'channel': 6},
+                                 {'bssid': '', 'ssid': 'oculta', 'signal': 10, 'channel': 1}],
+                                now=self.at(i * 60))
+        signal_store.record([{'bssid': 'aa:01', 'ssid': 'casa', 'signal': -200, 'channel': 40}],
+                            now=self.at(signal_store.BLOCK_SECONDS + 30))
+        self.assertEqual(SignalBlock.objects.count(), 3)
+        block = SignalBlock.objects.get(bssid='aa:01', start=self.t0)
+        self.assertEqual((block.count, len(block.data)), (3, 3 * signal_store.SAMPLE.itemsize))
+
+        out = signal_store.series(self.at(60), self.at(signal_store.BLOCK_SECONDS + 60), ['AA:01'])
+        base = int(self.t0.timestamp())
+        self.assertEqual(list(out), ['aa:01'])
+        self.assertEqual(out['aa:01']['t'], [base + 60, base + 120, base + signal_store.BLOCK_SECONDS + 30])
+        # La señal fuera de rango se recorta a int8
+        self.assertEqual(out['aa:01']['signal'], [-55, -60, -128])
+        self.assertEqual(out['aa:01']['channel'], [36, 36, 40])
+
+    def test_step_averages_and_view(self):
+        for i, sig in enumerate([-50, -60, -70, -80]):
+            signal_store.record([{'bssid': 'aa:01', 'signal': sig, 'channel': 1 + i}], now=self.at(i * 30))
+        out = signal_store.series(self.t0, self.at(3600), step=60)['aa:01']
+        self.assertEqual(out['signal'], [-55.0, -75.0])
+        self.assertEqual(out['channel'], [2, 4])
+        resp = Client().get('/wifi/signal/', {'days': 2, 'bssid': 'aa:01', 'step': 60})
+        self.assertEqual(resp.json()['series']['aa:01']['signal'], [-55.0, -75.0])
+        self.assertEqual(Client().get('/wifi/signal/', {'step': 'x'}).status_code, 400)
+        policy = dict(retention.DEFAULT_RETENTION, signal_days=1)
+        self.assertEqual(retention.prune(now=self.at(3 * 86400), policy=policy)['SignalBlock'], 1)
+
+
+def _proc_hex(ip):
+    return '%08X' % struct.unpack('=I', socket.inet_aton(ip))[0]
+
+
+class ProcessAttributionTests(TestCase):
+    LOCAL = '192.168.1.10'
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.root, 'net'))
+        self.sockets = {}
+        self.set_sockets()
+
+    def set_sockets(self, **rows):
+        # inodo -> (proto, puerto local, ip remota, puerto remoto)
+        self.sockets.update({int(k[1:]): v for k, v in rows.items()})
+        for name, proto in (('tcp', 6), ('udp', 17)):
+            lines = ['  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode']
+            for inode, (p, lport, rip, rport) in self.sockets.items():
+                if p == proto:
+                    lines.append(f'   0: {_proc_hex(self.LOCAL)}:{lport:04X} {_proc_hex(rip)}:{rport:04X} 01 '
+                                 f'00000000:00000000 00:00000000 00000000  1000        0 {inode} 1 0')
+            with open(os.path.join(self.root, 'net', name), 'w') as fh:
+                fh.write('\n'.join(lines) + '\n')
+
+    def add_process(self, pid, *inodes):
+        fd_dir = os.path.join(self.root, str(pid), 'fd')
+        os.makedirs(fd_dir, exist_ok=True)
+        for n, inode in enumerate(inodes, start=len(os.listdir(fd_dir))):
+            os.symlink(f'socket:[{inode}]', os.path.join(fd_dir, str(n)))
+
+    def packets(self, *rows):
+        # (src, sport, dst, dport, length)
+        pkts = np.zeros(len(rows), dtype=pcap_ingest.PACKET_DTYPE)
+        for i, (src, sport, dst, dport, length) in enumerate(rows):
+            pkts[i]['src'] = pcap_ingest.ip_to_int([src])[0]
+            pkts[i]['dst'] = pcap_ingest.ip_to_int([dst])[0]
+            pkts[i]['proto'], pkts[i]['sport'], pkts[i]['dport'], pkts[i]['length'] = 6, sport, dport, length
+        return pkts
+
+    def test_index_refresh_follows_socket_churn(self):
+        for pid in (10, 11, 12, 13):
+            self.add_process(pid)
+        self.set_sockets(i501=(6, 40000, '1.1.1.1', 443))
+        self.add_process(12, 501)
+        index = process_attribution.SocketIndex(self.root)
+        self.assertEqual(index.refresh()['unresolved'], 0)
+        self.assertEqual(index.lookup(6, 40000, '1.1.1.1', 443), 12)
+        # Sin sockets nuevos no se recorre ningún proceso
+        self.assertEqual(index.refresh()['scanned_pids'], 0)
+        # Un socket nuevo de un proceso que ya tenía sockets: solo se mira ese (y el proceso nuevo)
+        self.add_process(20)
+        self.add_process(12, 502)
+        self.set_sockets(i502=(17, 5353, '0.0.0.0', 0))
+        self.assertEqual(index.refresh()['scanned_pids'], 2)
+        self.assertEqual(index.lookup(17, 5353, '8.8.8.8', 53), 12)
+
+    def test_traffic_is_attributed_to_pids(self):
+        self.set_sockets(i601=(6, 40000, '1.1.1.1', 443), i602=(6, 40001, '2.2.2.2', 443))
+        self.add_process(30, 601)
+        self.add_process(31, 602)
+        clock = mock.Mock(return_value=0.0)
+        traffic = process_attribution.ProcessTraffic(process_attribution.SocketIndex(self.root), clock=clock)
+        collector = TrafficCollector(local_ips=[self.LOCAL], on_packets=traffic.ingest)
+        collector.ingest(self.packets(
+            ('1.1.1.1', 443, self.LOCAL, 40000, 1500),
+            ('1.1.1.1', 443, self.LOCAL, 40000, 1500),
+            (self.LOCAL, 40000, '1.1.1.1', 443, 100),
+            (self.LOCAL, 40001, '2.2.2.2', 443, 700),
+            ('3.3.3.3', 443, self.LOCAL, 40002, 50),
+        ), [self.LOCAL])
+        rows = traffic.top(None)
+        self.assertEqual([(r['pid'], r['bytes_in'], r['bytes_out']) for r in rows],
+                         [(30, 3000.0, 100.0), (31, 0.0, 700.0), (None, 50.0, 0.0)])
+        self.assertEqual([r['pid'] for r in traffic.top(1, by='out')], [31])
+        # El socket que faltaba aparece: se refresca el índice al pasar min_refresh
+        self.set_sockets(i603=(6, 40002, '3.3.3.3', 443))
+        self.add_process(32, 603)
+        clock.return_value = 5.0
+        traffic.ingest(self.packets(('3.3.3.3', 443, self.LOCAL, 40002, 50)), [self.LOCAL])
+        self.assertEqual(traffic.top(None)[-1]['pid'], 32)
+
+    def test_processes_view_requires_collector(self):
+        with mock.patch('diagnostics.views._live_collector', return_value=None):
+            self.assertEqual(Client().get('/traffic/processes/').status_code, 503)
+        collector = TrafficCollector(local_ips=[self.LOCAL], on_packets=lambda *a: None)
+        with mock.patch('diagnostics.views._live_collector', return_value=collector):
+            self.assertEqual(Client().get('/traffic/processes/?by=x').status_code, 400)
+            self.assertEqual(Client().get('/traffic/processes/').json()['running'], True)
+
+
+class InterfaceRatesTests(TestCase):
+    def sampler(self, readings, **kwargs):
+        clock = mock.Mock(side_effect=[t for t, _ in readings] + [readings[-1][0]] * 10)
+        counters = mock.Mock(side_effect=[c for _, c in readings])
+        sampler = interface_rates.InterfaceRates(counters=counters, clock=clock, **kwargs)
+        for _ in readings:
+            sampler.sample()
+        return sampler
+
+    def test_counter_wrap_and_reset(self):
+        self.assertEqual(interface_rates.counter_delta(2 ** 32 - 100, 400), 500)
+        self.assertEqual(interface_rates.counter_delta(2 ** 64 - 5, 5), 10)
+        # Volver atrás más de medio rango es un reinicio, no una vuelta
+        self.assertEqual(interface_rates.counter_delta(1_000_000_000, 10), 0)
+        with self.assertRaises(ValueError):
+            interface_rates.InterfaceRates(interval=0.05)
+
+    def test_rates_ring_and_history(self):
+        readings = [(100.0 + i, {'eth0': (i * 125_000, i * 12_500), **({'wlan0': (0, 0)} if i < 2 else {})})
+                    for i in range(6)]
+        readings[3] = (103.0, {'eth0': (2 ** 32 - 1, 37_500)})  # cruce de vuelta en 32 bits
+        readings[4] = (104.0, {'eth0': (124_999, 50_000)})
+        readings[5] = (105.0, {'eth0': (249_999, 62_500)})
+        sampler = self.sampler(readings, history=3)
+        cur = sampler.current()
+        self.assertEqual((cur['eth0']['rx_mbps'], cur['eth0']['tx_mbps']), (1.0, 0.1))
+        self.assertEqual(cur['wlan0']['rx_bps'], 0.0)
+        hist = sampler.history()
+        # Buffer de 3: quedan las últimas tres tasas en orden
+        self.assertEqual(hist['eth0']['t'], [103.0, 104.0, 105.0])
+        self.assertEqual(hist['eth0']['rx_mbps'][1:], [1.0, 1.0])
+        self.assertEqual(sampler.history(1.5)['eth0']['t'], [104.0, 105.0])
+        self.assertEqual(list(sampler.history(nic='wlan0')), ['wlan0'])
+
+    def test_view_reports_sampler(self):
+        sampler = self.sampler([(1.0, {'lo': (0, 0)}), (2.0, {'lo': (1_000_000, 0)})])
+        with mock.patch('diagnostics.views.get_interface_rates', return_value=sampler):
+            body = Client().get('/traffic/interfaces/').json()
+            self.assertEqual(body['current']['lo']['rx_mbps'], 8.0)
+            self.assertEqual(Client().get('/traffic/interfaces/?seconds=x').status_code, 400)
+
+
+class BackgroundTaskTests(TestCase):
+    def test_host_lock_allows_one_owner(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(host_lock.release, 'prueba')
+        self.assertTrue(host_lock.acquire('prueba', directory))
+        self.assertTrue(host_lock.acquire('prueba', directory))
+        # Otro proceso no puede tomarlo mientras este lo tenga
+        code = ('import sys; sys.path.insert(0, %r); from diagnostics.services import host_lock; '
+                'sys.exit(0 if host_lock.acquire("prueba", %r) else 3)') % (os.getcwd(), directory)
+        self.assertEqual(subprocess.run([sys.executable, '-c', code]).returncode, 3)
+        host_lock.release('prueba')
+        self.assertEqual(subprocess.run([sys.executable, '-c', code]).returncode, 0)
+
+    def test_only_server_processes_run_background_tasks(self):
+        cases = [
+            (['manage.py', 'test'], {}, False),
+            (['manage.py', 'runserver'], {'RUN_MAIN': 'true'}, True),
+            (['/venv/bin/gunicorn', 'wifiscan_web.wsgi'], {}, True),
+            (['/venv/bin/pytest'], {}, False),
+            (['/venv/bin/celery', 'worker'], {}, False),
+        ]
+        for argv, env, expected in cases:
+            with mock.patch.object(sys, 'argv', argv), mock.patch.dict(os.environ, env):
+                self.assertEqual(diagnostics_apps._is_server_process(), expected, argv)
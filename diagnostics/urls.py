@@ -1,16 +1,30 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('speedtest/', views.speedtest_view, name='speedtest'),
     path('devices/', views.devices_view, name='devices'),
     path('wifi/', views.wifi_view, name='wifi'),
+    path('wifi/channels/', views.wifi_channels, name='wifi_channels'),
+    path('wifi/signal/', views.wifi_signal, name='wifi_signal'),
     path('traffic/', views.traffic_view, name='traffic'),
+    path('traffic/live/', views.traffic_live, name='traffic_live'),
+    path('traffic/processes/', views.traffic_processes, name='traffic_processes'),
+    path('traffic/interfaces/', views.traffic_interfaces, name='traffic_interfaces'),
+    path('events/', views.live_events, name='live_events'),
+    path('latency/', views.latency_view, name='latency'),
+    path('throughput/download/', views.throughput_download, name='throughput_download'),
+    path('throughput/upload/', views.throughput_upload, name='throughput_upload'),
     path('report/', views.report_view, name='report'),
     path('report.csv', views.report_csv, name='report_csv'),
+    path('report.ndjson', views.report_ndjson, name='report_ndjson'),
     path('signup/', views.signup, name='signup'),
     path('chart/speed.png', views.speed_chart_image, name='speed_chart_image'),
     path('diagnostics/', views.diagnostics_info, name='diagnostics_info'),
     path('comandos/', views.diagnostics_info, name='comandos_utiles'),
+    path('jobs/<str:kind>/submit/', views.job_submit, name='job_submit'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
+    path('api/', api.api_index, name='api_index'),
+    path('api/<str:resource>/', api.resource_list, name='api_resource'),
 ]
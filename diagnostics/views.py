@@ -1,48 +1,36 @@
-﻿from django.shortcuts import render, redirect
-from django.http import JsonResponse, HttpResponse
+﻿from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.csrf import csrf_exempt
+from django.middleware.csrf import CsrfViewMiddleware
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.utils import timezone
 from datetime import timedelta
-import platform, subprocess, shutil, re
+import hmac, json, time
 from datetime import timedelta
-from .models import SpeedTest, Device, WiFiNetwork, TrafficSample
+from .models import SpeedTest, TrafficSample, Job, ScanRun
+from . import charts, congestion, exports, inventory, jobs, rollups, signal_store
+from .services.network_scanner import NetworkScanner
+from .services.traffic_collector import WINDOWS, get_collector
+from .services.process_attribution import get_process_traffic
+from .services.interface_rates import get_interface_rates
+from .services.live_feed import get_live_feed
+from .services import command_runner, throughput
+from .services.latency import get_latency_monitor
+from .services.capabilities import get_capabilities, registry as capability_registry
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from io import BytesIO
-import math
-
-# Renderizado de grÃ¡ficos en servidor (PNG)
-try:
-    import matplotlib
-    matplotlib.use('Agg')  # backend sin GUI
-    import matplotlib.pyplot as plt
-except Exception:
-    matplotlib = None
-    plt = None
-
-# Importar servicios (logica original)
-from .services.network_scanner import NetworkScanner
-from .services.speed_test import SpeedTester
-from .services.wifi_analyzer import WiFiAnalyzer
-from .services.traffic_monitor import sample_bandwidth, as_mbps
-
 
 def dashboard(request):
     last_speed = SpeedTest.objects.order_by('-created_at').first()
-    # Contar dispositivos/redes de la "última tanda" por marca de tiempo, tolerancia ±5 min
-    last_device = Device.objects.order_by('-created_at').first()
-    if last_device:
-        t = last_device.created_at
-        devices_count = Device.objects.filter(created_at__gte=t - timedelta(minutes=5),
-                                              created_at__lte=t + timedelta(minutes=5)).count()
-    else:
-        devices_count = 0
-    last_wifi = WiFiNetwork.objects.order_by('-created_at').first()
-    if last_wifi:
-        t2 = last_wifi.created_at
-        wifi_count = WiFiNetwork.objects.filter(created_at__gte=t2 - timedelta(minutes=5),
-                                                created_at__lte=t2 + timedelta(minutes=5)).count()
-    else:
-        wifi_count = 0
+    # Resumen precalculado del último escaneo de cada tipo
+    device_run = ScanRun.latest_of('devices')
+    wifi_run = ScanRun.latest_of('wifi')
+    devices_count = device_run.row_count if device_run else 0
+    wifi_count = wifi_run.row_count if wifi_run else 0
     # Valores seguros para JS (nÃºmeros, sin filtros en template)
     speed_dl = float(getattr(last_speed, 'download_mbps', 0) or 0)
     speed_ul = float(getattr(last_speed, 'upload_mbps', 0) or 0)
@@ -51,99 +39,383 @@ def dashboard(request):
         'last_speed': last_speed,
         'devices_count': devices_count,
         'wifi_count': wifi_count,
+        'device_run': device_run,
+        'wifi_run': wifi_run,
         'speed_dl': speed_dl,
         'speed_ul': speed_ul,
         'speed_ping': speed_ping,
     })
 
 
+def _job_page(request, kind, template, extra=None):
+    """Página de una tarea en segundo plano.
+
+    Un GET no lanza trabajo: muestra el último resultado y, si hay una tarea
+    en curso, la sigue. La ejecución se pide con el botón (POST a
+    /jobs/<kind>/submit/).
+    """
+    last = jobs.last_done(kind)
+    ctx = {
+        'kind': kind,
+        'job': jobs.active_job(kind, jobs.clean_params(kind, {})),
+        'last_result': last.result if last else None,
+        'last_finished': last.finished_at if last else None,
+    }
+    ctx.update(extra or {})
+    return render(request, template, ctx)
+
+
 def speedtest_view(request):
-    # Ejecutar prueba con tolerancia a entornos sin red (evitar 500/403)
-    try:
-        tester = SpeedTester()
-        tester.run_test()
-        obj = SpeedTest.objects.create(
-            download_mbps=getattr(tester, 'download_speed', 0) or 0,
-            upload_mbps=getattr(tester, 'upload_speed', 0) or 0,
-            ping_ms=getattr(tester, 'ping', 0) or 0,
-        )
-        ctx = {'speed': obj}
-    except Exception as e:
-        obj = SpeedTest.objects.create(download_mbps=0, upload_mbps=0, ping_ms=0)
-        ctx = {'speed': obj, 'error': str(e)}
-    return render(request, 'diagnostics/speedtest.html', ctx)
+    return _job_page(request, 'speedtest', 'diagnostics/speedtest.html')
 
 
 def devices_view(request):
-    scanner = NetworkScanner()
-    devices = scanner.get_connected_devices()
-    # Limpiar capturas de hoy para no acumular
-    Device.objects.filter(created_at__date=timezone.now().date()).delete()
-    Device.objects.bulk_create([
-        Device(ip=d.get('ip', ''), mac=d.get('mac', ''), hostname=d.get('hostname', ''))
-        for d in devices
-    ])
-    return render(request, 'diagnostics/devices.html', {'devices': devices})
+    # Si el monitor de vecinos está activo se muestra la tabla en memoria al instante
+    live = NetworkScanner().get_live_devices()
+    return _job_page(request, 'devices', 'diagnostics/devices.html', {
+        'devices': live, 'inventory': inventory.listing(),
+    })
 
 
 def wifi_view(request):
-    analyzer = WiFiAnalyzer()
-    nets = analyzer.get_available_networks()
-    # Limpiar capturas de hoy para no acumular
-    WiFiNetwork.objects.filter(created_at__date=timezone.now().date()).delete()
-    WiFiNetwork.objects.bulk_create([
-        WiFiNetwork(
-            ssid=n.get('ssid', ''), bssid=n.get('bssid', ''),
-            signal=int(n.get('signal', 0)), channel=int(n.get('channel', 0)),
-            security=n.get('security', ''),
-        ) for n in nets
-    ])
-    summary = _wifi_adapter_summary()
-    return render(request, 'diagnostics/wifi.html', {'networks': nets, 'resumen': summary})
+    # Recomendación de canal sobre el último escaneo guardado (sin escanear)
+    channels = congestion.for_run()
+    best = channels['best'] if channels else {}
+    return _job_page(request, 'wifi', 'diagnostics/wifi.html', {
+        'channels': channels, 'best_24': best.get('2.4'), 'best_5': best.get('5'),
+    })
+
+
+def wifi_channels(request):
+    """Congestión por canal en JSON: ?run=<id> (un escaneo), ?days=/start=/end=
+    (promedio de los escaneos del rango) o, sin parámetros, el último escaneo.
+    """
+    if request.GET.get('run'):
+        run = ScanRun.objects.filter(kind='wifi', pk=request.GET['run']).first() \
+            if request.GET['run'].isdigit() else None
+        if run is None:
+            return JsonResponse({'error': 'Escaneo WiFi inexistente'}, status=404)
+        return JsonResponse(congestion.for_run(run))
+    if any(request.GET.get(k) for k in ('days', 'start', 'end')):
+        try:
+            start, end, _ = rollups.parse_range(request.GET)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(congestion.for_range(start, end))
+    result = congestion.for_run()
+    if result is None:
+        return JsonResponse({'error': 'Todavía no hay escaneos WiFi guardados'}, status=404)
+    return JsonResponse(result)
+
+
+def wifi_signal(request):
+    """Señal por BSSID en JSON para graficar: ?bssid= (repetible), days=/start=/end=
+    y step= (segundos por punto; 0 devuelve cada muestra).
+    """
+    try:
+        start, end, _ = rollups.parse_range(request.GET)
+        step = int(request.GET.get('step') or 0)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if step < 0:
+        return JsonResponse({'error': 'step no puede ser negativo'}, status=400)
+    return JsonResponse({
+        'start': start.isoformat(), 'end': end.isoformat(), 'step': step,
+        'series': signal_store.series(start, end, request.GET.getlist('bssid'), step=step),
+    })
+
+
+def _live_collector():
+    collector = get_collector()
+    return collector if collector.running else None
+
+
+def _traffic_window(request):
+    window = request.GET.get('window', '1m')
+    return window if window in WINDOWS else '1m'
 
 
 def traffic_view(request):
-    # Tomar una muestra corta (2s)
-    raw = sample_bandwidth(duration_sec=2.0)
-    samples_list = as_mbps(raw)
-    # Guardar top 10 si hay datos
-    if samples_list:
-        # Limpiar capturas de hoy para no acumular
-        TrafficSample.objects.filter(created_at__date=timezone.now().date()).delete()
-        objs = [
-            TrafficSample(
-                ip=s.get('ip', ''),
-                download_mbps=float(s.get('download_mbps', 0.0)),
-                upload_mbps=float(s.get('upload_mbps', 0.0)),
-            ) for s in samples_list[:10]
-        ]
-        if objs:
-            TrafficSample.objects.bulk_create(objs)
-    return render(request, 'diagnostics/traffic.html', {'samples': samples_list})
+    # Con el colector continuo activo, las tasas se leen de memoria al instante
+    collector = _live_collector()
+    window = _traffic_window(request)
+    extra = {'window': window, 'live': None}
+    if collector is not None:
+        extra['live'] = collector.snapshot()[window]
+    return _job_page(request, 'traffic', 'diagnostics/traffic.html', extra)
+
+
+def traffic_live(request):
+    """Tasas actuales del colector por ventana (1s, 1m, 15m), en JSON."""
+    collector = _live_collector()
+    if collector is None:
+        return JsonResponse({'running': False, 'samples': []}, status=503)
+    window = _traffic_window(request)
+    return JsonResponse({
+        'running': True,
+        'engine': collector.engine,
+        'window': window,
+        'samples': collector.rates(WINDOWS[window]),
+    })
+
+
+def traffic_processes(request):
+    """Procesos con más tráfico desde que arrancó el colector: ?top=N&by=total|in|out."""
+    collector = _live_collector()
+    if collector is None or collector.on_packets is None:
+        return JsonResponse({'running': False, 'processes': []}, status=503)
+    try:
+        top = int(request.GET.get('top') or 10)
+    except ValueError:
+        return JsonResponse({'error': 'top debe ser entero'}, status=400)
+    try:
+        rows = get_process_traffic().top(max(1, min(top, 100)), by=request.GET.get('by') or 'total')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'running': True, 'processes': rows})
+
+
+def traffic_interfaces(request):
+    """Tasa actual e historial por interfaz (DIAGNOSTICS_INTERFACE_RATES):
+    ?seconds=N limita el historial, ?iface= elige una interfaz.
+    """
+    try:
+        seconds = float(request.GET['seconds']) if request.GET.get('seconds') else None
+    except ValueError:
+        return JsonResponse({'error': 'seconds debe ser numérico'}, status=400)
+    sampler = get_interface_rates()
+    return JsonResponse({
+        'running': sampler.running,
+        'interval': sampler.interval,
+        'current': sampler.current(),
+        'history': sampler.history(seconds, nic=request.GET.get('iface') or None),
+    })
+
+
+def _sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def _live_options():
+    opts = {'interval': 2, 'queue_size': 100, 'keepalive': 15, 'wsgi_max_seconds': 300}
+    opts.update(getattr(settings, 'DIAGNOSTICS_LIVE_FEED', {}))
+    return opts
+
+
+async def _live_stream_async(feed, keepalive):
+    import asyncio
+    sub = feed.subscribe(loop=asyncio.get_running_loop())
+    try:
+        yield 'retry: 3000\n\n'
+        while not sub.closed:
+            events = await sub.aget(timeout=keepalive)
+            if not events:
+                yield ': keepalive\n\n'
+            for event in events:
+                yield _sse(event)
+    finally:
+        feed.unsubscribe(sub)
+
+
+def _live_stream_sync(feed, keepalive, max_seconds):
+    # Bajo WSGI cada cliente ocupa un hilo: se corta a los max_seconds y el
+    # navegador reconecta solo (EventSource)
+    sub = feed.subscribe()
+    deadline = timezone.now() + timedelta(seconds=max_seconds)
+    try:
+        yield 'retry: 3000\n\n'
+        while not sub.closed and timezone.now() < deadline:
+            events = sub.get(timeout=keepalive)
+            if not events:
+                yield ': keepalive\n\n'
+            for event in events:
+                yield _sse(event)
+    finally:
+        feed.unsubscribe(sub)
+
+
+def live_events(request):
+    """Server-Sent Events con las tasas de tráfico (cada ``interval`` s) y las
+    altas/bajas de dispositivos.
+
+    Todos los clientes comparten un único productor (services/live_feed.py):
+    abrir más pestañas no lanza más capturas. Con ASGI (uvicorn/daphne) el
+    stream es asíncrono; con WSGI se corta cada ``wsgi_max_seconds``.
+    """
+    opts = _live_options()
+    feed = get_live_feed(interval=opts['interval'], queue_size=opts['queue_size'])
+    if isinstance(request, ASGIRequest):
+        stream = _live_stream_async(feed, opts['keepalive'])
+    else:
+        stream = _live_stream_sync(feed, opts['keepalive'], opts['wsgi_max_seconds'])
+    resp = StreamingHttpResponse(stream, content_type='text/event-stream')
+    resp['Cache-Control'] = 'no-cache'
+    resp['X-Accel-Buffering'] = 'no'  # sin buffer en nginx
+    return resp
+
+
+def latency_view(request):
+    """JSON con latencia/jitter/pérdida por destino del monitor continuo
+    (DIAGNOSTICS_LATENCY_MONITOR); para una medición puntual está la tarea ``latency``."""
+    monitor = get_latency_monitor()
+    return JsonResponse({
+        'running': monitor.running,
+        'rounds': monitor.rounds,
+        'period': monitor.period,
+        'targets': monitor.snapshot(),
+    })
+
+
+def _throughput_options():
+    opts = {'max_seconds': 30, 'max_bytes': 4 * 1024 ** 3}
+    opts.update(getattr(settings, 'DIAGNOSTICS_THROUGHPUT', {}))
+    return opts
+
+
+def _float_param(request, name, default, upper):
+    try:
+        value = float(request.GET.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} debe ser numérico')
+    if value <= 0:
+        raise ValueError(f'{name} debe ser positivo')
+    return min(value, upper)
+
+
+def throughput_download(request):
+    """Datos aleatorios durante ``?seconds=`` (o hasta ``?bytes=``) para medir la LAN.
+
+    Lo consume ``services/throughput.ThroughputClient`` con varias
+    conexiones en paralelo; ambos topes los limita DIAGNOSTICS_THROUGHPUT.
+    """
+    opts = _throughput_options()
+    try:
+        seconds = _float_param(request, 'seconds', 10, opts['max_seconds'])
+        size = int(_float_param(request, 'bytes', opts['max_bytes'], opts['max_bytes']))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    resp = StreamingHttpResponse(throughput.payload_stream(size, seconds), content_type='application/octet-stream')
+    resp['Cache-Control'] = 'no-store'
+    resp['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+@csrf_exempt
+@require_POST
+def throughput_upload(request):
+    """Recibe y descarta el cuerpo; no cambia estado, por eso no pide CSRF."""
+    started = time.perf_counter()
+    received = throughput.drain(request.read)
+    seconds = time.perf_counter() - started
+    return JsonResponse({'bytes': received, 'seconds': round(seconds, 3),
+                         'mbps': round(received * 8 / seconds / 1e6, 2) if seconds else 0})
+
+
+def _api_token_ok(request):
+    """True si la petición trae el token de ``DIAGNOSTICS_API_TOKEN`` (scripts)."""
+    expected = getattr(settings, 'DIAGNOSTICS_API_TOKEN', '')
+    if not expected:
+        return False
+    given = request.headers.get('X-Diagnostics-Token', '')
+    auth = request.headers.get('Authorization', '')
+    if not given and auth.startswith('Token '):
+        given = auth[len('Token '):].strip()
+    return bool(given) and hmac.compare_digest(given, expected)
+
+
+def _request_params(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ValueError('JSON inválido')
+        if not isinstance(data, dict):
+            raise ValueError('Se esperaba un objeto JSON')
+        return data
+    return request.POST.dict()
+
+
+@csrf_exempt
+@require_POST
+def job_submit(request, kind):
+    """Encola una tarea (speedtest, devices, wifi, traffic) y devuelve su estado.
+
+    Desde las páginas se usa el token CSRF de la sesión; los scripts se
+    autentican con el header ``X-Diagnostics-Token`` (o ``Authorization:
+    Token ...``) igual a ``DIAGNOSTICS_API_TOKEN``.
+    """
+    if not _api_token_ok(request):
+        rejected = CsrfViewMiddleware(lambda r: None).process_view(request, None, (), {})
+        if rejected is not None:
+            return rejected
+    if kind not in jobs.JOB_HANDLERS:
+        return JsonResponse({'error': f'Tipo de tarea desconocido: {kind}'}, status=404)
+    try:
+        params = jobs.clean_params(kind, _request_params(request))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    job = jobs.submit(kind, params)
+    return JsonResponse(job.as_dict(), status=202)
+
+
+def job_status(request, job_id):
+    """Estado y resultado de una tarea, para polling desde las páginas."""
+    job = get_object_or_404(Job, pk=job_id)
+    if jobs.is_orphan(job):
+        jobs.fail_orphans()
+        job.refresh_from_db()
+    return JsonResponse(job.as_dict())
 
 
 def report_view(request):
     last_tests = SpeedTest.objects.order_by('-created_at')[:10]
     last_traffic = TrafficSample.objects.order_by('-created_at')[:10]
-    return render(request, 'diagnostics/report.html', {
+    ctx = {
         'last_tests': last_tests,
         'last_traffic': last_traffic,
+    }
+    try:
+        start, end, granularity = rollups.parse_range(request.GET)
+    except ValueError as e:
+        messages.error(request, f'Parámetros de reporte inválidos: {e}')
+        start, end = timezone.now() - timedelta(days=30), timezone.now()
+        granularity = rollups.pick_granularity(start, end)
+    # Historial completo desde los rollups, sin recorrer filas crudas
+    ctx.update({
+        'start': start,
+        'end': end,
+        'granularity': granularity,
+        'days': request.GET.get('days', '30'),
+        'range_choices': [('1', 'Último día'), ('7', '7 días'), ('30', '30 días'),
+                          ('90', '90 días'), ('365', 'Un año')],
+        'speed_stats': [
+            dict(metric=m, **rollups.summary('speedtest', m, start, end, granularity=granularity))
+            for m in rollups.SOURCES['speedtest'][1]
+        ],
+        'top_ips': rollups.top_ips(start, end, granularity=granularity),
     })
+    return render(request, 'diagnostics/report.html', ctx)
 
 
 def report_csv(request):
-    import csv
-    from io import StringIO
-    buff = StringIO()
-    writer = csv.writer(buff)
-    writer.writerow(['created_at', 'type', 'metric1', 'metric2', 'metric3'])
-    for s in SpeedTest.objects.order_by('-created_at')[:50]:
-        writer.writerow([s.created_at.isoformat(), 'speedtest', s.download_mbps, s.upload_mbps, s.ping_ms])
-    for t in TrafficSample.objects.order_by('-created_at')[:50]:
-        writer.writerow([t.created_at.isoformat(), 'traffic', t.ip, t.download_mbps, t.upload_mbps])
-    resp = HttpResponse(buff.getvalue(), content_type='text/csv; charset=utf-8')
-    resp['Content-Disposition'] = 'attachment; filename="reporte.csv"'
-    return resp
+    """Exporta el reporte en CSV, en streaming.
+
+    Filtros: ?start=/&end= (AAAA-MM-DD) o ?days=, ?type=speedtest,traffic,
+    ?ip= (repetible), ?granularity= para exportar rollups y ?gzip=1.
+    """
+    return _report_export(request, 'csv')
+
+
+def report_ndjson(request):
+    """Igual que report_csv, un objeto JSON por línea."""
+    return _report_export(request, 'ndjson')
+
+
+def _report_export(request, fmt):
+    try:
+        return exports.export_response(request.GET, fmt)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain; charset=utf-8')
 
 
 def signup(request):
@@ -160,258 +432,95 @@ def signup(request):
     return render(request, 'registration/signup.html', {'form': form})
 
 
-def diagnostics_info(request):
-    """Página de diagnóstico: muestra salida cruda de comandos usados para escaneos."""
-    os_name = platform.system()
-    info = []
-    resumen = {
-        'interfaz': '-',
-        'estado': '-',
-        'ssid': '-',
-    }
-
-    def run(cmd):
-        try:
-            out = subprocess.check_output(cmd, text=True, encoding='utf-8', errors='ignore', timeout=8)
-            return out.strip()
-        except Exception as e:
-            return f"<error> {e}"
-
-    def set_if_nonempty(key, value):
-        v = (value or '').strip()
-        if v:
-            resumen[key] = v
-
-    if os_name == 'Windows':
-        # Resumen Wi‑Fi
-        raw = run(['netsh', 'wlan', 'show', 'interfaces'])
-        if raw and not raw.startswith('<error>'):
-            # Interfaz, Estado, SSID (multi-idioma aproximado)
-            m = re.search(r"(?im)^\s*Nombre\s*:\s*(.+)$|^\s*Name\s*:\s*(.+)$", raw)
-            set_if_nonempty('interfaz', (m.group(1) or m.group(2)) if m else '')
-            m = re.search(r"(?im)^\s*Estado\s*:\s*(.+)$|^\s*State\s*:\s*(.+)$", raw)
-            set_if_nonempty('estado', (m.group(1) or m.group(2)) if m else '')
-            m = re.search(r"(?im)^\s*SSID\s*:\s*(.+)$", raw)
-            set_if_nonempty('ssid', m.group(1) if m else '')
-
-        # Comandos útiles
-        info.append(('arp -a', run(['arp', '-a'])))
-        info.append(('netsh wlan show networks mode=bssid', run(['netsh', 'wlan', 'show', 'networks', 'mode=bssid'])))
-        info.append(('ipconfig', run(['ipconfig'])))
-    elif os_name == 'Linux':
-        # Resumen Wi‑Fi
-        if shutil.which('nmcli'):
-            out = run(['nmcli', '-t', '-f', 'DEVICE,TYPE,STATE,CONNECTION', 'device'])
-            # Buscar interfaz wifi conectada
-            for line in (out or '').splitlines():
-                parts = line.split(':')
-                if len(parts) >= 4 and parts[1] == 'wifi':
-                    set_if_nonempty('interfaz', parts[0])
-                    set_if_nonempty('estado', parts[2])
-                    set_if_nonempty('ssid', parts[3])
-                    break
+# Comandos útiles por SO: (título, utilidad de services/capabilities.TOOLS, argumentos)
+DIAGNOSTIC_COMMANDS = {
+    'Windows': [
+        ('arp -a', 'arp', ['-a']),
+        ('netsh wlan show networks mode=bssid', 'netsh', ['wlan', 'show', 'networks', 'mode=bssid']),
+        ('ipconfig', 'ipconfig', []),
+    ],
+    'Linux': [
+        ('nmcli device wifi list', 'nmcli', ['-t', '-f', 'SSID,BSSID,CHAN,SIGNAL', 'device', 'wifi', 'list']),
+        ('iw dev', 'iw', ['dev']),
+        ('iwlist scan', 'iwlist', ['scan']),
+        ('ip addr', 'ip', ['addr']),
+    ],
+    'Darwin': [
+        ('airport -s', 'airport', ['-s']),
+        ('ifconfig', 'ifconfig', []),
+    ],
+}
+# Marca donde se insertan las salidas a medida que terminan
+_STREAM_SLOT = '<!--diagnostics-stream-->'
+
+
+def _diagnostic_commands(caps):
+    """(título, argv) de los comandos cuya utilidad está instalada, y los títulos faltantes."""
+    commands, missing = [], []
+    for title, tool, args in DIAGNOSTIC_COMMANDS.get(caps.os_name, []):
+        if caps.has(tool):
+            commands.append((title, [caps.path(tool), *args]))
         else:
-            # iwgetid para SSID si existe
-            if shutil.which('iwgetid'):
-                ss = run(['iwgetid', '-r'])
-                set_if_nonempty('ssid', ss)
-            # ip -br link para interfaz UP
-            link = run(['ip', '-br', 'link'])
-            # Elegir la primera interfaz UP que no sea lo/eth tun
-            if link and not link.startswith('<error>'):
-                for ln in link.splitlines():
-                    cols = ln.split()
-                    if len(cols) >= 2 and 'UP' in cols[1]:
-                        iface = cols[0]
-                        if not iface.startswith('lo'):
-                            set_if_nonempty('interfaz', iface)
-                            set_if_nonempty('estado', 'UP')
-                            break
-
-        # Comandos útiles
-        if shutil.which('nmcli'):
-            info.append(('nmcli device wifi list', run(['nmcli', '-t', '-f', 'SSID,BSSID,CHAN,SIGNAL', 'device', 'wifi', 'list'])))
-        info.append(('iw dev', run(['iw', 'dev'])))
-        info.append(('iwlist scan', run(['iwlist', 'scan'])))
-        info.append(('ip addr', run(['ip', 'addr'])))
-    elif os_name == 'Darwin':
-        # Resumen Wi‑Fi
-        airport_bin = '/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport'
-        raw = run([airport_bin, '-I'])
-        if raw and not raw.startswith('<error>'):
-            m = re.search(r"(?im)^\s*agrCtlRSSI|.*$", raw)
-            # SSID y estado
-            m = re.search(r"(?im)^\s*SSID\s*:\s*(.+)$", raw)
-            set_if_nonempty('ssid', m.group(1) if m else '')
-            # interfaz
-            raw_ifconfig = run(['ifconfig'])
-            if raw_ifconfig and not raw_ifconfig.startswith('<error>'):
-                # Heurística: interfaz en líneas 'status: active' previas
-                current = None
-                for ln in raw_ifconfig.splitlines():
-                    if not ln.startswith('\t') and ':' in ln:
-                        current = ln.split(':', 1)[0]
-                    if 'status: active' in ln and current:
-                        set_if_nonempty('interfaz', current)
-                        set_if_nonempty('estado', 'active')
-                        break
-
-        # Comandos útiles
-        info.append(('airport -s', run(['/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport', '-s'])))
-        info.append(('ifconfig', run(['ifconfig'])))
-
-    return render(request, 'diagnostics/diagnostics.html', {
-        'os_name': os_name,
-        'info': info,
-        'resumen': resumen,
-    })
+            missing.append(title)
+    return commands, missing
+
+
+def _diagnostics_stream(head, tail, commands, timeout):
+    yield head
+    started = time.perf_counter()
+    summed = 0.0
+    for result in command_runner.run_concurrently(commands, timeout):
+        summed += result['elapsed_ms']
+        yield render_to_string('diagnostics/_command_output.html', {'r': result})
+    if commands:
+        yield render_to_string('diagnostics/_command_output.html', {'summary': {
+            'count': len(commands),
+            'total_ms': round((time.perf_counter() - started) * 1000, 1),
+            'summed_ms': round(summed, 1),
+        }})
+    yield tail
 
 
-def _wifi_adapter_summary():
-    """Devuelve un dict con interfaz/estado/ssid actual, por OS."""
-    def run(cmd):
-        try:
-            out = subprocess.check_output(cmd, text=True, encoding='utf-8', errors='ignore', timeout=8)
-            return out.strip()
-        except Exception:
-            return ''
-
-    resumen = {'interfaz': '-', 'estado': '-', 'ssid': '-'}
-    def set_if_nonempty(key, value):
-        v = (value or '').strip()
-        if v:
-            resumen[key] = v
-
-    os_name = platform.system()
-    if os_name == 'Windows':
-        raw = run(['netsh', 'wlan', 'show', 'interfaces'])
-        if raw:
-            m = re.search(r"(?im)^\s*Nombre\s*:\s*(.+)$|^\s*Name\s*:\s*(.+)$", raw)
-            set_if_nonempty('interfaz', (m.group(1) or m.group(2)) if m else '')
-            m = re.search(r"(?im)^\s*Estado\s*:\s*(.+)$|^\s*State\s*:\s*(.+)$", raw)
-            set_if_nonempty('estado', (m.group(1) or m.group(2)) if m else '')
-            m = re.search(r"(?im)^\s*SSID\s*:\s*(.+)$", raw)
-            set_if_nonempty('ssid', m.group(1) if m else '')
-    elif os_name == 'Linux':
-        if shutil.which('nmcli'):
-            out = run(['nmcli', '-t', '-f', 'DEVICE,TYPE,STATE,CONNECTION', 'device'])
-            for line in (out or '').splitlines():
-                parts = line.split(':')
-                if len(parts) >= 4 and parts[1] == 'wifi':
-                    set_if_nonempty('interfaz', parts[0])
-                    set_if_nonempty('estado', parts[2])
-                    set_if_nonempty('ssid', parts[3])
-                    break
-        else:
-            if shutil.which('iwgetid'):
-                ss = run(['iwgetid', '-r'])
-                set_if_nonempty('ssid', ss)
-            link = run(['ip', '-br', 'link'])
-            if link:
-                for ln in link.splitlines():
-                    cols = ln.split()
-                    if len(cols) >= 2 and 'UP' in cols[1]:
-                        iface = cols[0]
-                        if not iface.startswith('lo'):
-                            set_if_nonempty('interfaz', iface)
-                            set_if_nonempty('estado', 'UP')
-                            break
-    elif os_name == 'Darwin':
-        airport_bin = '/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport'
-        raw = run([airport_bin, '-I'])
-        if raw:
-            m = re.search(r"(?im)^\s*SSID\s*:\s*(.+)$", raw)
-            set_if_nonempty('ssid', m.group(1) if m else '')
-        raw_ifconfig = run(['ifconfig'])
-        if raw_ifconfig:
-            current = None
-            for ln in raw_ifconfig.splitlines():
-                if not ln.startswith('\t') and ':' in ln:
-                    current = ln.split(':', 1)[0]
-                if 'status: active' in ln and current:
-                    set_if_nonempty('interfaz', current)
-                    set_if_nonempty('estado', 'active')
-                    break
-    return resumen
+def diagnostics_info(request):
+    """Página de diagnóstico: muestra salida cruda de comandos usados para escaneos.
 
+    Los comandos corren en paralelo (services/command_runner.py) y cada
+    salida se envía apenas termina, con su duración: la página tarda lo que
+    el comando más lento, no la suma de todos.
+    """
+    caps = get_capabilities()
+    commands, missing = _diagnostic_commands(caps)
+    page = render_to_string('diagnostics/diagnostics.html', {
+        'os_name': caps.os_name,
+        'commands': [title for title, _ in commands],
+        'missing': missing,
+        'caps': caps.as_dict(),
+        'backends': capability_registry.status(caps),
+        'stream_slot': mark_safe(_STREAM_SLOT),
+    }, request=request)
+    head, _, tail = page.partition(_STREAM_SLOT)
+    timeout = float(getattr(settings, 'DIAGNOSTICS_COMMAND_TIMEOUT', 8))
+    resp = StreamingHttpResponse(_diagnostics_stream(head, tail, commands, timeout),
+                                 content_type='text/html; charset=utf-8')
+    resp['X-Accel-Buffering'] = 'no'
+    return resp
 
 
+@condition(etag_func=lambda request: charts.etag_for(request.GET),
+           last_modified_func=lambda request: charts.last_modified())
 def speed_chart_image(request):
     """PNG con evolución (últimos 20) + resumen de promedios/medianas.
-    Si matplotlib no está disponible, devuelve un PNG mínimo.
+    Con ?days=, ?start= o ?granularity= grafica el rango pedido desde los rollups.
+
+    El PNG sale de la caché de gráficos (charts.py), indexada por el último
+    SpeedTest y los parámetros; con If-None-Match/If-Modified-Since se
+    responde 304 sin renderizar.
     """
-    last_tests = list(SpeedTest.objects.order_by("-created_at")[:20])
-    last_tests.reverse()
-
-    if not last_tests:
-        if not plt:
-            pixel = BytesIO()
-            pixel.write(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\x0cIDAT\x08\x99c```\xf8\xff\x9f\x01\x00\x06\x05\x02\x15\x9d\x82\x8b\x0d\x00\x00\x00\x00IEND\xaeB`\x82")
-            return HttpResponse(pixel.getvalue(), content_type="image/png")
-        buf = BytesIO()
-        fig, ax = plt.subplots(figsize=(6, 3))
-        ax.text(0.5, 0.5, "Sin datos", ha="center", va="center", fontsize=12)
-        ax.axis("off")
-        fig.tight_layout()
-        fig.savefig(buf, format="png", dpi=150)
-        plt.close(fig)
-        buf.seek(0)
-        return HttpResponse(buf.getvalue(), content_type="image/png")
-
-    xs = list(range(1, len(last_tests) + 1))
-    dls = [float(getattr(s, "download_mbps", 0) or 0) for s in last_tests]
-    uls = [float(getattr(s, "upload_mbps", 0) or 0) for s in last_tests]
-    pings = [float(getattr(s, "ping_ms", 0) or 0) for s in last_tests]
-
-    if not plt:
-        pixel = BytesIO()
-        pixel.write(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\x0cIDAT\x08\x99c```\xf8\xff\x9f\x01\x00\x06\x05\x02\x15\x9d\x82\x8b\x0d\x00\x00\x00\x00IEND\xaeB`\x82")
-        return HttpResponse(pixel.getvalue(), content_type="image/png")
-
-    import statistics as stats
-    def smean(v):
-        try:
-            return stats.mean(v)
-        except Exception:
-            return 0.0
-    def smedian(v):
-        try:
-            return stats.median(v)
-        except Exception:
-            return 0.0
-
-    dl_mean, dl_med = smean(dls), smedian(dls)
-    ul_mean, ul_med = smean(uls), smedian(uls)
-    pg_mean, pg_med = smean(pings), smedian(pings)
-
-    from matplotlib.gridspec import GridSpec
-    buf = BytesIO()
-    fig = plt.figure(figsize=(9, 4))
-    gs = GridSpec(1, 2, width_ratios=[3, 2])
-    ax = fig.add_subplot(gs[0, 0])
-    ax.plot(xs, dls, "-o", color="#0d6efd", label="Descarga (Mbps)")
-    ax.plot(xs, uls, "-o", color="#198754", label="Subida (Mbps)")
-    ax.set_xlabel("Muestras recientes")
-    ax.set_ylabel("Mbps")
-    ax.set_title(f"Evolución últimos {len(xs)} Speed Tests")
-    ax.grid(True, linestyle=":", alpha=0.5)
-    ax.legend(loc="lower right")
-
-    ax2 = fig.add_subplot(gs[0, 1])
-    ax2.axis("off")
-    start = last_tests[0].created_at
-    end = last_tests[-1].created_at
-    lines = [
-        f"Rango: {start:%d/%m %H:%M} → {end:%d/%m %H:%M}",
-        f"N = {len(xs)}",
-        f"Bajada: media {dl_mean:.2f} | mediana {dl_med:.2f}",
-        f"Subida: media {ul_mean:.2f} | mediana {ul_med:.2f}",
-        f"Ping:   media {pg_mean:.2f} | mediana {pg_med:.2f}",
-    ]
-    ax2.text(0.02, 0.98, "\n".join(lines), va="top", ha="left", fontsize=11)
-
-    fig.tight_layout()
-    fig.savefig(buf, format="png", dpi=150)
-    plt.close(fig)
-    buf.seek(0)
-    return HttpResponse(buf.getvalue(), content_type="image/png")
+    try:
+        png = charts.get_chart(request.GET)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain; charset=utf-8')
+    resp = HttpResponse(png, content_type="image/png")
+    # El navegador revalida siempre; si no cambió, recibe 304
+    resp['Cache-Control'] = 'no-cache'
+    return resp
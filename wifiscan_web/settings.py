@@ -67,3 +67,116 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Tareas en segundo plano (diagnostics/jobs.py)
+DIAGNOSTICS_JOB_WORKERS = 2
+# Una tarea en cola/en curso por más tiempo se considera huérfana
+DIAGNOSTICS_JOB_STALE_SECONDS = 600
+# Un resultado más reciente que esto se reutiliza en lugar de relanzar la tarea
+DIAGNOSTICS_JOB_REUSE_SECONDS = 30
+# Token para que scripts encolen tareas sin sesión/CSRF (vacío = deshabilitado)
+DIAGNOSTICS_API_TOKEN = os.environ.get('DIAGNOSTICS_API_TOKEN', '')
+# Monitor de vecinos (Linux): mantiene la tabla ARP en memoria con `ip monitor neigh`
+DIAGNOSTICS_NEIGHBOR_MONITOR = True
+# Locks que eligen un solo proceso por equipo para las tareas de fondo (services/host_lock.py)
+DIAGNOSTICS_LOCK_DIR = BASE_DIR / '.cache' / 'locks'
+# Barrido activo de hosts antes de leer la tabla ARP (services/network_scanner.HostDiscovery).
+# per_subnet ajusta timeout/concurrency por CIDR, p. ej. {'10.0.0.0/22': {'timeout': 1.0}}.
+# Sin entrada se barre el /24 de cada interfaz y se omiten las virtuales (docker0, virbr0...)
+DIAGNOSTICS_HOST_DISCOVERY = {
+    'enabled': True,
+    'timeout': 1.0,
+    'concurrency': 128,
+    'per_subnet': {},
+}
+# Colector de tráfico continuo (services/traffic_collector.py): captura sin pausa
+# con ventanas de 1s/1min/15min y guarda el top por IP en TrafficSample cada flush_interval.
+# Requiere CAP_NET_RAW. Con varios workers corre solo en el que toma el lock del equipo
+# (DIAGNOSTICS_LOCK_DIR); /traffic/live/ responde 503 en los demás
+DIAGNOSTICS_TRAFFIC_COLLECTOR = {
+    'enabled': False,
+    'iface': None,
+    'flush_interval': 60,
+    'top_n': 10,
+    # Atribuye los flujos capturados a procesos (services/process_attribution.py)
+    'processes': True,
+}
+# Retención (diagnostics/retention.py, comando prune_diagnostics): días que se guardan
+# las filas crudas y cada granularidad de rollup; None = sin límite
+DIAGNOSTICS_RETENTION = {
+    'raw_days': 30,
+    'jobs_days': 7,
+    'minute_days': 7,
+    'hour_days': 180,
+    'day_days': None,
+    # Bloques de señal por BSSID (diagnostics/signal_store.py)
+    'signal_days': 90,
+}
+# Caché de PNG de gráficos (diagnostics/charts.py): en disco para que sobreviva reinicios
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'charts': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'charts',
+    },
+}
+DIAGNOSTICS_CHART_CACHE = 'charts'
+DIAGNOSTICS_CHART_CACHE_SECONDS = 86400
+# Canal en vivo /events/ (Server-Sent Events, services/live_feed.py): un productor por
+# proceso; interval = segundos entre tasas de tráfico, queue_size = eventos por cliente
+DIAGNOSTICS_LIVE_FEED = {
+    'interval': 2,
+    'queue_size': 100,
+    'keepalive': 15,
+    'wsgi_max_seconds': 300,
+}
+# Caché de escaneos (services/scan_cache.py): segundos que se reutiliza el último resultado
+# de cada escaneo; los pedidos simultáneos comparten un único escaneo en curso
+DIAGNOSTICS_SCAN_CACHE = {
+    'wifi': 15,
+    'devices': 15,
+    'adapter': 30,
+}
+# Timeout (segundos) de cada comando de la página /diagnostics/; corren en paralelo
+DIAGNOSTICS_COMMAND_TIMEOUT = 8
+# Prueba de throughput LAN (/throughput/download|upload/, comando throughput_test):
+# topes por conexión para que un cliente no deje el servidor transfiriendo indefinidamente
+DIAGNOSTICS_THROUGHPUT = {
+    'max_seconds': 30,
+    'max_bytes': 4 * 1024 ** 3,
+}
+# Tasas por interfaz (services/interface_rates.py, /traffic/interfaces/): lectura de
+# contadores cada interval segundos (0.1 a 10) y history muestras por interfaz
+DIAGNOSTICS_INTERFACE_RATES = {
+    'enabled': True,
+    'interval': 1.0,
+    'history': 600,
+}
+# Monitor de latencia continuo (services/latency.py, /latency/): cada period segundos
+# count sondas por destino; targets vacío = gateway y DNS del sistema (sin destinos
+# públicos). Con varios workers corre solo en el que toma el lock del equipo
+DIAGNOSTICS_LATENCY_MONITOR = {
+    'enabled': False,
+    'targets': [],
+    'period': 10,
+    'count': 5,
+    'window': 360,
+    'method': 'auto',
+}
+# Selección de servidor de speedtest.net (services/speedtest_servers.py): se guarda en
+# disco por ttl segundos y un hilo re-mide los candidatos cada revalidate_every
+# (con background, en un solo proceso por equipo; los demás leen el archivo)
+DIAGNOSTICS_SPEEDTEST_SERVERS = {
+    'path': BASE_DIR / '.cache' / 'speedtest_servers.json',
+    'ttl': 86400,
+    'revalidate_every': 3600,
+    'background': True,
+}
+# Puntaje de congestión por canal (diagnostics/congestion.py): ancho asumido para las
+# redes de 5 GHz (20/40/80/160 MHz) y si se evitan los canales DFS al recomendar
+DIAGNOSTICS_CHANNEL_SCORING = {
+    'width_5ghz': 80,
+    'avoid_dfs': False,
+}